@@ -1,18 +1,35 @@
 import os
+import re
+import json
+import base64
+import math
+import heapq
+import atexit
+import pickle
+import struct
 import hashlib
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict, Optional
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, TypedDict
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import RedirectResponse
+import httpx
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field, validator
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError, DuplicateKeyError
-from bson import ObjectId
+from pydantic import BaseModel, Field, ValidationError, validator
+from pymongo import AsyncMongoClient, MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError, DuplicateKeyError, BulkWriteError, OperationFailure
+from bson import Binary, ObjectId
 from typing import List
 
 try:
@@ -24,6 +41,8 @@ except Exception:
     # If python-dotenv isn't installed yet, continue with system envs
     pass
 
+logger = logging.getLogger(__name__)
+
 
 def _get_mongo_client() -> MongoClient:
     uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
@@ -35,6 +54,87 @@ def _get_database(client: MongoClient):
     return client[db_name]
 
 
+def _get_async_mongo_client() -> AsyncMongoClient:
+    uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+    return AsyncMongoClient(uri)
+
+
+# -----------------------------
+# Shared async clients (opened/closed by the lifespan hook)
+# -----------------------------
+_async_clients: Dict[str, Any] = {}
+
+
+def _http() -> httpx.AsyncClient:
+    """Pooled AsyncClient shared by all async handlers (Firecrawl, etc.)."""
+    client = _async_clients.get("http")
+    if client is None:
+        client = _async_clients["http"] = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "200")),
+                max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "50")),
+            ),
+        )
+    return client
+
+
+def _openai():
+    """Shared AsyncOpenAI client (one connection pool for all answers), or None when not configured."""
+    if "openai" not in _async_clients:
+        client = None
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            try:
+                from openai import AsyncOpenAI  # type: ignore
+
+                client = AsyncOpenAI(api_key=api_key)
+            except Exception:
+                client = None
+        _async_clients["openai"] = client
+    return _async_clients["openai"]
+
+
+def _adb():
+    """Async handle on the same database as `database`, for use inside async handlers."""
+    db = _async_clients.get("db")
+    if db is None:
+        client = _async_clients["mongo"] = _get_async_mongo_client()
+        db = _async_clients["db"] = _get_database(client)
+    return db
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _http()
+    _openai()
+    _adb()
+    # background workers start here rather than at import, so importing the module (bench.py, tools) stays inert
+    corpus_generation.start()
+    if vector_outbox is not None:
+        vector_outbox.start()
+    if lexical_index is not None:
+        lexical_index.start(database)
+    if vector_index is not None:
+        vector_index.start(database)
+    await crawl_manager.resume()
+    agent_jobs.start()
+    try:
+        yield
+    finally:
+        await crawl_manager.shutdown()
+        http = _async_clients.pop("http", None)
+        if http is not None:
+            await http.aclose()
+        llm = _async_clients.pop("openai", None)
+        if llm is not None:
+            await llm.close()
+        _async_clients.pop("db", None)
+        client = _async_clients.pop("mongo", None)
+        if client is not None:
+            await client.close()
+
+
 class NoteCreate(BaseModel):
     text: str
     source_url: Optional[str] = None
@@ -48,7 +148,7 @@ class NoteCreate(BaseModel):
         return trimmed
 
 
-app = FastAPI(title="Note Taker API")
+app = FastAPI(title="Note Taker API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -66,6 +166,7 @@ def ensure_indexes(db):
         # documents
         db.documents.create_index([("hash", 1)], unique=True, name="uniq_hash")
         db.documents.create_index([("captured_at", -1)], name="captured_desc")
+        db.documents.create_index([("captured_at", -1), ("_id", -1)], name="captured_id_desc")
         db.documents.create_index([("day_bucket", -1)], name="day_bucket")
         db.documents.create_index([("captured_hour", 1)], name="captured_hour")
         db.documents.create_index([("topics.primary", 1), ("captured_at", -1)], name="topic_time")
@@ -77,20 +178,54 @@ def ensure_indexes(db):
             # text index can fail on some deployments; ignore
             pass
 
+        try:
+            db.notes.create_index([("text", "text")], name="notes_text")
+        except Exception:
+            pass
+        db.notes.create_index([("created_at", -1), ("_id", -1)], name="notes_created_id")
+
         # doc_chunks
         db.doc_chunks.create_index([("doc_id", 1), ("idx", 1)], name="doc_idx")
         db.doc_chunks.create_index([("captured_at", -1)], name="chunk_time")
+        db.doc_chunks.create_index([("captured_at", -1), ("_id", -1)], name="chunk_time_id")
         db.doc_chunks.create_index([("day_bucket", -1)], name="chunk_day")
         db.doc_chunks.create_index([("topics.primary", 1)], name="chunk_topic")
+        db.doc_chunks.create_index([("created_at", 1)], name="chunk_created")
+        try:
+            db.doc_chunks.create_index([("text", "text")], name="chunk_text")
+        except Exception:
+            pass
 
         # topics
         db.topics.create_index([("slug", 1)], unique=True, name="topic_slug")
         db.topics.create_index([("parent_id", 1)], name="topic_parent")
+        db.topics.create_index([("search", 1)], name="topic_search")
 
         # sessions, daily_rollups, agent_runs
         db.sessions.create_index([("start_at", 1), ("end_at", 1)], name="session_range")
         db.daily_rollups.create_index([("date", -1)], name="day_desc")
+        try:
+            # one rollup per (date, granularity); day rollups have no granularity
+            db.daily_rollups.create_index([("date", 1), ("granularity", 1)], unique=True, name="rollup_key")
+        except Exception:
+            pass
         db.agent_runs.create_index([("status", 1), ("started_at", -1)], name="run_status_time")
+        db.crawls.create_index([("status", 1), ("queued_at", -1)], name="crawl_status_time")
+
+        # vector_outbox: reconcile looks up queued points, topic renames patch queued payloads
+        db.vector_outbox.create_index([("col", 1), ("pid", 1)], name="outbox_col_pid")
+        db.vector_outbox.create_index([("attempts", 1)], name="outbox_attempts")
+        db.vector_outbox.create_index([("payload.doc_id", 1)], name="outbox_doc", sparse=True)
+        db.vector_outbox.create_index([("payload.topics_primary", 1)], name="outbox_topic", sparse=True)
+
+        # embedding_cache: _id is "<model>:<sha256>", expire entries unused for the TTL
+        try:
+            ttl = int(float(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "30")) * 86400)
+            if ttl > 0:
+                db.embedding_cache.create_index([("last_used_at", 1)], expireAfterSeconds=ttl, name="emb_ttl")
+        except Exception:
+            # TTL changed since the index was created; keep the existing one
+            pass
     except Exception:
         # Keep API boot resilient in dev
         pass
@@ -108,7 +243,6 @@ def health_check() -> Dict[str, str]:
         raise HTTPException(status_code=500, detail=str(error))
 
 
-import httpx
 import time
 
 """
@@ -229,40 +363,33 @@ def _domain_from_url(url: Optional[str]) -> Optional[str]:
         return None
 
 
-def create_document_and_chunks(db, payload: DocumentIngest) -> Dict[str, Any]:
-    now = datetime.utcnow().replace(tzinfo=timezone.utc)
+def _build_document(payload: DocumentIngest, now: datetime) -> Dict[str, Any]:
+    """Mongo document for an ingest payload (no _id yet)."""
     captured_at = payload.captured_at or now
     if captured_at.tzinfo is None:
         captured_at = captured_at.replace(tzinfo=timezone.utc)
-    day_bucket = _start_of_day_utc(captured_at)
-    captured_hour = captured_at.hour
-
     cleaned_text = payload.cleaned_text
-    content_hash = payload.hash or _sha256_hex(cleaned_text)
-    tokens = payload.tokens if payload.tokens is not None else _token_count(cleaned_text)
     canonical = payload.canonical_url or payload.source_url
-    domain = _domain_from_url(canonical)
-
-    doc: Dict[str, Any] = {
+    return {
         "source_url": payload.source_url,
         "canonical_url": canonical,
-        "domain": domain,
+        "domain": _domain_from_url(canonical),
         "title": payload.title,
         "content_type": payload.content_type or "web",
         "lang": payload.lang,
         "raw_html": payload.raw_html,
         "raw_markdown": payload.raw_markdown,
         "cleaned_text": cleaned_text,
-        "tokens": tokens,
-        "hash": content_hash,
+        "tokens": payload.tokens if payload.tokens is not None else _token_count(cleaned_text),
+        "hash": payload.hash or _sha256_hex(cleaned_text),
         "summary": (payload.summary.dict() if payload.summary else None),
-        "topics": payload.topics,
+        "topics": _normalize_topics(payload.topics),
         "entities": [e.dict() for e in (payload.entities or [])],
         "tags": payload.tags or [],
-        "embedding": payload.embedding,
+        **_encode_embedding(payload.embedding),
         "captured_at": captured_at,
-        "captured_hour": captured_hour,
-        "day_bucket": day_bucket,
+        "captured_hour": captured_at.hour,
+        "day_bucket": _start_of_day_utc(captured_at),
         "published_at": payload.published_at,
         "processed_at": payload.processed_at or now,
         "created_at": now,
@@ -272,10 +399,63 @@ def create_document_and_chunks(db, payload: DocumentIngest) -> Dict[str, Any]:
         "metadata": payload.metadata or {},
     }
 
+
+def _chunk_topics(doc: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Chunks carry their document's primary topic (for the chunk_topic index and Qdrant filters)."""
+    primary = (doc.get("topics") or {}).get("primary")
+    return {"primary": primary} if primary else None
+
+
+def _build_chunk_docs(doc_id: ObjectId, doc: Dict[str, Any], chunks: List[DocumentIngestChunk], now: datetime) -> List[Dict[str, Any]]:
+    chunk_docs: List[Dict[str, Any]] = []
+    for ch in chunks:
+        ctokens = ch.tokens if ch.tokens is not None else _token_count(ch.text)
+        chunk_docs.append(
+            {
+                "doc_id": doc_id,
+                "idx": ch.idx,
+                "text": ch.text,
+                "tokens": ctokens,
+                "section": ch.section,
+                "char_start": ch.char_start,
+                "char_end": ch.char_end,
+                **_encode_embedding(ch.embedding),
+                "topics": _chunk_topics(doc),
+                "captured_at": doc["captured_at"],
+                "captured_hour": doc["captured_hour"],
+                "day_bucket": doc["day_bucket"],
+                "created_at": now,
+            }
+        )
+    return chunk_docs
+
+
+def _doc_point_payload(doc_id: ObjectId, doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "doc_id": str(doc_id),
+        "type": "doc",
+        "source_url": doc.get("source_url"),
+        "canonical_url": doc.get("canonical_url"),
+        "domain": doc.get("domain"),
+        "title": doc.get("title"),
+        "topics_primary": ((doc.get("topics") or {}).get("primary") if doc.get("topics") else None),
+        "captured_at": doc["captured_at"].isoformat(),
+        "day_bucket_str": doc["day_bucket"].date().isoformat(),
+        "captured_hour": doc["captured_hour"],
+    }
+
+
+def create_document_and_chunks(db, payload: DocumentIngest) -> Dict[str, Any]:
+    now = datetime.utcnow().replace(tzinfo=timezone.utc)
+    doc = _build_document(payload, now)
+    content_hash = doc["hash"]
+
     duplicate = False
     try:
         res = db.documents.insert_one(doc)
         doc_id = res.inserted_id
+        _rollup_record_docs(db, [doc])
+        _topics_record_docs(db, [doc])
     except DuplicateKeyError:
         duplicate = True
         existing = db.documents.find_one({"hash": content_hash}, {"_id": 1})
@@ -286,56 +466,29 @@ def create_document_and_chunks(db, payload: DocumentIngest) -> Dict[str, Any]:
     chunk_ids: List[str] = []
     inserted_chunks_for_qdrant: List[Dict[str, Any]] = []
     if payload.chunks:
-        chunk_docs: List[Dict[str, Any]] = []
-        for ch in payload.chunks:
-            ctokens = ch.tokens if ch.tokens is not None else _token_count(ch.text)
-            chunk_docs.append(
-                {
-                    "doc_id": doc_id,
-                    "idx": ch.idx,
-                    "text": ch.text,
-                    "tokens": ctokens,
-                    "section": ch.section,
-                    "char_start": ch.char_start,
-                    "char_end": ch.char_end,
-                    "embedding": ch.embedding,
-                    "topics": None,
-                    "captured_at": captured_at,
-                    "captured_hour": captured_hour,
-                    "day_bucket": day_bucket,
-                    "created_at": now,
-                }
-            )
+        chunk_docs = _build_chunk_docs(doc_id, doc, payload.chunks, now)
         if chunk_docs:
             r = db.doc_chunks.insert_many(chunk_docs)
             chunk_ids = [str(i) for i in r.inserted_ids]
-            # align inserted ids back to docs for qdrant payload
-            for _id, chdoc in zip(r.inserted_ids, chunk_docs):
-                tmp = dict(chdoc)
-                tmp["_id"] = _id
-                inserted_chunks_for_qdrant.append(tmp)
+            # insert_many sets _id on each dict, so they go straight to qdrant
+            inserted_chunks_for_qdrant = chunk_docs
+            if lexical_index is not None:
+                lexical_index.add_chunks(chunk_docs)
+            if vector_index is not None:
+                vector_index.add_chunks(chunk_docs, [c.embedding for c in payload.chunks])
+    if not duplicate or chunk_ids:
+        corpus_generation.bump()
 
     # Qdrant upserts (best-effort)
     try:
-        if qdrant_mgr and getattr(qdrant_mgr, 'enabled', False):
+        if qdrant_mgr and getattr(qdrant_mgr, 'configured', False):
             # doc-level
             if payload.embedding:
-                q_payload = {
-                    "doc_id": str(doc_id),
-                    "type": "doc",
-                    "source_url": payload.source_url,
-                    "canonical_url": canonical,
-                    "domain": domain,
-                    "title": payload.title,
-                    "topics_primary": ((payload.topics or {}).get("primary") if payload.topics else None),
-                    "captured_at": captured_at.isoformat(),
-                    "day_bucket_str": day_bucket.date().isoformat(),
-                    "captured_hour": captured_hour,
-                }
-                qdrant_mgr.upsert_doc(doc_id, payload.embedding, q_payload)
+                qdrant_mgr.upsert_doc(doc_id, payload.embedding, _doc_point_payload(doc_id, doc))
             # chunk-level
             if inserted_chunks_for_qdrant:
-                qdrant_mgr.upsert_chunks(doc_id, inserted_chunks_for_qdrant)
+                # Mongo may hold a compact copy only; Qdrant gets the vectors as received
+                qdrant_mgr.upsert_chunks(doc_id, inserted_chunks_for_qdrant, [c.embedding for c in payload.chunks])
     except Exception:
         pass
 
@@ -347,6 +500,98 @@ def create_document_and_chunks(db, payload: DocumentIngest) -> Dict[str, Any]:
     }
 
 
+def create_documents_bulk(db, payloads: List[DocumentIngest]) -> List[Dict[str, Any]]:
+    """Insert many documents with unordered batched writes.
+
+    Duplicate hashes (against the collection or earlier items in the same
+    request) are reported per item with the existing id and their chunks are
+    skipped. All chunk vectors go to Qdrant in large batched upserts.
+    """
+    batch_size = max(1, int(os.getenv("BULK_INSERT_BATCH", "500")))
+    now = datetime.utcnow().replace(tzinfo=timezone.utc)
+    docs = [_build_document(p, now) for p in payloads]
+    results: List[Dict[str, Any]] = [{"index": i} for i in range(len(docs))]
+
+    dup_idx: List[int] = []
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start:start + batch_size]
+        try:
+            db.documents.insert_many(batch, ordered=False)
+        except BulkWriteError as bwe:
+            for err in bwe.details.get("writeErrors", []):
+                i = start + int(err.get("index", 0))
+                if err.get("code") == 11000:
+                    dup_idx.append(i)
+                else:
+                    results[i]["error"] = err.get("errmsg") or "write failed"
+
+    if dup_idx:
+        hashes = list({docs[i]["hash"] for i in dup_idx})
+        existing = {d["hash"]: d["_id"] for d in db.documents.find({"hash": {"$in": hashes}}, {"hash": 1})}
+        for i in dup_idx:
+            ex = existing.get(docs[i]["hash"])
+            results[i].update({"id": str(ex) if ex else None, "duplicate": True, "chunk_count": 0})
+            if not ex:
+                results[i]["error"] = "Duplicate content but missing record"
+
+    chunk_docs: List[Dict[str, Any]] = []
+    chunk_vecs: List[Optional[List[float]]] = []
+    doc_points: List[Any] = []
+    inserted_docs: List[Dict[str, Any]] = []
+    for i, (payload, doc) in enumerate(zip(payloads, docs)):
+        if "duplicate" in results[i] or "error" in results[i]:
+            continue
+        inserted_docs.append(doc)
+        doc_id = doc["_id"]
+        results[i].update({"id": str(doc_id), "duplicate": False, "chunk_count": len(payload.chunks)})
+        chunk_docs.extend(_build_chunk_docs(doc_id, doc, payload.chunks, now))
+        chunk_vecs.extend(c.embedding for c in payload.chunks)
+        if payload.embedding and qdrant_mgr and qdrant_mgr.configured:
+            doc_points.append(PointStruct(id=_qdrant_point_id(str(doc_id)), vector=payload.embedding,
+                                          payload=_doc_point_payload(doc_id, doc)))
+    _rollup_record_docs(db, inserted_docs)
+    _topics_record_docs(db, inserted_docs)
+
+    failed: set = set()
+    for start in range(0, len(chunk_docs), batch_size):
+        batch = chunk_docs[start:start + batch_size]
+        try:
+            db.doc_chunks.insert_many(batch, ordered=False)
+        except BulkWriteError as bwe:
+            failed.update(start + int(err.get("index", 0)) for err in bwe.details.get("writeErrors", []))
+    if failed:
+        per_doc: Dict[str, int] = {}
+        for j in failed:
+            key = str(chunk_docs[j]["doc_id"])
+            per_doc[key] = per_doc.get(key, 0) + 1
+        for r in results:
+            n = per_doc.get(r.get("id") or "", 0)
+            if n and not r.get("duplicate"):
+                r["chunk_count"] -= n
+                r["error"] = f"{n} chunk(s) failed to insert"
+        chunk_docs = [ch for j, ch in enumerate(chunk_docs) if j not in failed]
+        chunk_vecs = [v for j, v in enumerate(chunk_vecs) if j not in failed]
+    if lexical_index is not None:
+        lexical_index.add_chunks(chunk_docs)
+    if vector_index is not None:
+        vector_index.add_chunks(chunk_docs, chunk_vecs)
+    if doc_points or chunk_docs:
+        corpus_generation.bump()
+
+    # Qdrant upserts (best-effort), batched across all documents
+    try:
+        if qdrant_mgr and getattr(qdrant_mgr, 'configured', False):
+            qdrant_mgr.upsert_points(qdrant_mgr.col_docs, doc_points)
+            qdrant_mgr.upsert_points(
+                qdrant_mgr.col_chunks,
+                [p for p in (_chunk_point(ch["doc_id"], ch, v) for ch, v in zip(chunk_docs, chunk_vecs)) if p is not None],
+            )
+    except Exception:
+        pass
+
+    return results
+
+
 # -----------------------------
 # Summarization (naive fallback)
 # -----------------------------
@@ -361,13 +606,17 @@ def _sentence_split(text: str) -> List[str]:
     return [t.strip() for t in s if t.strip()]
 
 
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z\-']{2,}")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without STOPWORDS (shared by keywords and the lexical index)."""
+    return [w for w in _WORD_RE.findall((text or "").lower()) if w not in STOPWORDS]
+
+
 def _top_keywords(text: str, k: int = 8) -> List[str]:
-    import re
-    words = re.findall(r"[A-Za-z][A-Za-z\-']{2,}", text.lower())
     freq: Dict[str, int] = {}
-    for w in words:
-        if w in STOPWORDS:
-            continue
+    for w in _tokenize(text):
         freq[w] = freq.get(w, 0) + 1
     return [w for w, _ in sorted(freq.items(), key=lambda kv: kv[1], reverse=True)[:k]]
 
@@ -432,7 +681,11 @@ QDRANT_AVAILABLE = False
 try:
     from qdrant_client import QdrantClient  # type: ignore
     from qdrant_client.http.models import Distance, VectorParams, PointStruct  # type: ignore
-    from qdrant_client.http.models import Filter as QFilter, FieldCondition, MatchValue  # type: ignore
+    from qdrant_client.http.models import Filter as QFilter, FieldCondition, MatchAny, MatchValue  # type: ignore
+    from qdrant_client.http.models import (  # type: ignore
+        CompressionRatio, Disabled, HnswConfigDiff, PayloadSchemaType, ProductQuantization, ProductQuantizationConfig,
+        QuantizationSearchParams, ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchParams, VectorParamsDiff,
+    )
     QDRANT_AVAILABLE = True
 except Exception:
     QDRANT_AVAILABLE = False
@@ -445,8 +698,18 @@ def _qdrant_point_id(id_str: str) -> int:
     return h % (2**63 - 1)
 
 
+def _env_flag(name: str, default: bool = False) -> bool:
+    return os.getenv(name, "on" if default else "off").strip().lower() in {"1", "on", "true", "yes"}
+
+
+# keyword indexes for every payload field searches filter on or deletes select by
+QDRANT_PAYLOAD_INDEXES = ("doc_id", "day_bucket_str", "topics_primary", "type")
+
+
 class QdrantManager:
     def __init__(self):
+        # configured: a client and collection names exist; enabled: Qdrant answered at startup (or since)
+        self.configured = False
         self.enabled = False
         if not QDRANT_AVAILABLE:
             return
@@ -461,69 +724,736 @@ class QdrantManager:
         self.vec_size = int(os.getenv("QDRANT_VECTOR_SIZE", "1536"))
         dist = (os.getenv("QDRANT_DISTANCE", "Cosine").upper())
         self.distance = Distance.COSINE if "COS" in dist else Distance.DOT if "DOT" in dist else Distance.EUCLID
+        self.on_disk = _env_flag("QDRANT_ON_DISK")
+        self.quantization = os.getenv("QDRANT_QUANTIZATION", "none").strip().lower()  # none | scalar | product
+        self.search_params = self._search_params()
+        self.configured = True
         self.enabled = True
         self._ensure_collections()
 
+    def _quantization_config(self):
+        always_ram = _env_flag("QDRANT_QUANTIZATION_ALWAYS_RAM", True)
+        if self.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=float(os.getenv("QDRANT_SCALAR_QUANTILE", "0.99")), always_ram=always_ram,
+            ))
+        if self.quantization == "product":
+            return ProductQuantization(product=ProductQuantizationConfig(
+                compression=CompressionRatio(os.getenv("QDRANT_PQ_COMPRESSION", "x16").lower()), always_ram=always_ram,
+            ))
+        return None
+
+    def _hnsw_config(self):
+        return HnswConfigDiff(
+            m=int(os.getenv("QDRANT_HNSW_M", "16")),
+            ef_construct=int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100")),
+            on_disk=_env_flag("QDRANT_HNSW_ON_DISK"),
+        )
+
+    def _search_params(self):
+        """Query-time HNSW ef and, for quantized collections, rescoring with the original vectors."""
+        ef = os.getenv("QDRANT_SEARCH_EF")
+        quant = None
+        if self.quantization in {"scalar", "product"}:
+            quant = QuantizationSearchParams(
+                rescore=_env_flag("QDRANT_RESCORE", True), oversampling=float(os.getenv("QDRANT_OVERSAMPLING", "2.0")),
+            )
+        if not ef and quant is None:
+            return None
+        return SearchParams(hnsw_ef=int(ef) if ef else None, quantization=quant)
+
     def _ensure_collections(self):
         try:
             for name in (self.col_docs, self.col_chunks):
-                try:
-                    self.client.get_collection(name)
-                except Exception:
-                    self.client.recreate_collection(
+                # never recreate: a transient get_collection error must not wipe the vectors
+                if self.client.collection_exists(name):
+                    self._apply_config(name)
+                else:
+                    self.client.create_collection(
                         collection_name=name,
-                        vectors_config=VectorParams(size=self.vec_size, distance=self.distance),
+                        vectors_config=VectorParams(size=self.vec_size, distance=self.distance, on_disk=self.on_disk),
+                        hnsw_config=self._hnsw_config(),
+                        quantization_config=self._quantization_config(),
+                        on_disk_payload=_env_flag("QDRANT_ON_DISK_PAYLOAD", self.on_disk),
                     )
+                self._ensure_payload_indexes(name)
         except Exception:
             # If Qdrant isn't reachable, disable silently
             self.enabled = False
 
+    def _apply_config(self, name: str):
+        """Bring an existing collection in line with the QDRANT_* settings (Qdrant re-optimizes in the background)."""
+        try:
+            cfg = self.client.get_collection(name).config
+            changes: Dict[str, Any] = {}
+            want_q = self._quantization_config()
+            if type(want_q) is not type(cfg.quantization_config):
+                changes["quantization_config"] = want_q or Disabled.DISABLED
+            want_h, have_h = self._hnsw_config(), cfg.hnsw_config
+            if (have_h.m, have_h.ef_construct, bool(have_h.on_disk)) != (want_h.m, want_h.ef_construct, bool(want_h.on_disk)):
+                changes["hnsw_config"] = want_h
+            vectors = cfg.params.vectors
+            if isinstance(vectors, VectorParams) and bool(vectors.on_disk) != self.on_disk:
+                changes["vectors_config"] = {"": VectorParamsDiff(on_disk=self.on_disk)}
+            if changes:
+                self.client.update_collection(collection_name=name, **changes)
+        except Exception:
+            pass
+
+    def _ensure_payload_indexes(self, name: str):
+        try:
+            have = set((self.client.get_collection(name).payload_schema or {}).keys())
+        except Exception:
+            have = set()
+        for field in QDRANT_PAYLOAD_INDEXES:
+            if field in have:
+                continue
+            try:
+                self.client.create_payload_index(
+                    collection_name=name, field_name=field, field_schema=PayloadSchemaType.KEYWORD, wait=False,
+                )
+            except Exception:
+                pass
+
+    def reconnect(self) -> bool:
+        """Retry collection setup after Qdrant was unreachable at startup."""
+        if not self.enabled and getattr(self, "client", None) is not None:
+            self.enabled = True
+            self._ensure_collections()
+        return self.enabled
+
     def upsert_doc(self, doc_id: ObjectId, vector: Optional[List[float]], payload: Dict[str, Any]):
-        if not self.enabled or not vector:
+        if not self.configured or not vector:
+            return
+        self.upsert_points(self.col_docs, [PointStruct(id=_qdrant_point_id(str(doc_id)), vector=vector, payload=payload)])
+
+    def upsert_chunks(self, doc_id: ObjectId, chunks: List[Dict[str, Any]], vectors: Optional[List[Optional[List[float]]]] = None):
+        if not self.configured:
+            return
+        vectors = vectors or [None] * len(chunks)
+        points = [p for p in (_chunk_point(doc_id, ch, v) for ch, v in zip(chunks, vectors)) if p is not None]
+        self.upsert_points(self.col_chunks, points)
+
+    def upsert_points(self, collection: str, points: List[Any]):
+        """Queue points in the vector outbox (or, with VECTOR_OUTBOX=off, write them best-effort).
+
+        Queuing only needs Qdrant to be configured: the flusher applies the
+        entries once it reconnects, even if Qdrant was down at startup.
+        """
+        if not self.configured or not points:
+            return
+        if vector_outbox is not None:
+            vector_outbox.enqueue(collection, points)
+            return
+        if not self.enabled:
             return
         try:
-            pid = _qdrant_point_id(str(doc_id))
-            self.client.upsert(
-                collection_name=self.col_docs,
-                points=[PointStruct(id=pid, vector=vector, payload=payload)],
-                wait=False,
-            )
+            self.write_points(collection, points, wait=False)
         except Exception:
             pass
 
-    def upsert_chunks(self, doc_id: ObjectId, chunks: List[Dict[str, Any]]):
+    def delete_doc_points(self, collection: str, doc_id: Any):
+        """Remove every point of a document, in order with queued upserts."""
+        if not self.configured:
+            return
+        if vector_outbox is not None:
+            vector_outbox.enqueue_delete(collection, [str(doc_id)])
+            return
         if not self.enabled:
             return
-        points = []
-        for ch in chunks:
-            vec = ch.get("embedding")
-            if not vec:
-                continue
-            cid = ch.get("_id")
-            if cid is None:
-                # will be filled after insert; skip here
+        try:
+            self.delete_where(collection, [str(doc_id)], wait=False)
+        except Exception:
+            pass
+
+    def write_points(self, collection: str, points: List[Any], wait: bool = True):
+        """Upsert in batches of QDRANT_UPSERT_BATCH points; raises on failure."""
+        batch = max(1, int(os.getenv("QDRANT_UPSERT_BATCH", "256")))
+        for i in range(0, len(points), batch):
+            self.client.upsert(collection_name=collection, points=points[i:i + batch], wait=wait)
+
+    def delete_where(self, collection: str, doc_ids: List[str], wait: bool = True):
+        selector = QFilter(must=[FieldCondition(key="doc_id", match=MatchAny(any=doc_ids))])
+        self.client.delete(collection_name=collection, points_selector=selector, wait=wait)
+
+
+CHUNK_PREVIEW_CHARS = 400
+
+# payload fields a chunk hit needs; older points also carry the full chunk document
+CHUNK_HIT_PAYLOAD = ["chunk_id", "_id", "doc_id", "preview", "captured_at"]
+
+
+def _chunk_point_payload(doc_id: ObjectId, ch: Dict[str, Any]) -> Dict[str, Any]:
+    """Ids, filter keys and a short preview; the full text stays in Mongo."""
+    day = ch.get("day_bucket")
+    captured = ch.get("captured_at")
+    return {
+        "chunk_id": str(ch["_id"]),
+        "doc_id": str(doc_id),
+        "type": "chunk",
+        "idx": ch.get("idx"),
+        "day_bucket_str": day.date().isoformat() if isinstance(day, datetime) else None,
+        "captured_at": captured.isoformat() if isinstance(captured, datetime) else captured,
+        "topics_primary": (ch.get("topics") or {}).get("primary"),
+        "preview": (ch.get("text") or "")[:CHUNK_PREVIEW_CHARS],
+    }
+
+
+def _chunk_point(doc_id: ObjectId, ch: Dict[str, Any], vec: Optional[List[float]] = None):
+    """PointStruct for a stored chunk, or None if it has no vector/_id yet."""
+    vec = vec or ch.get("embedding")
+    cid = ch.get("_id")
+    if not vec or cid is None:
+        return None
+    return PointStruct(id=_qdrant_point_id(str(cid)), vector=vec, payload=_chunk_point_payload(doc_id, ch))
+
+
+qdrant_mgr = QdrantManager()
+
+
+# -----------------------------
+# Vector storage in Mongo
+# -----------------------------
+VECTOR_STORAGE_MODES = ("full", "ref", "float16", "int8")
+
+
+def _vector_storage_mode() -> str:
+    """MONGO_VECTOR_STORAGE: how documents/doc_chunks keep their embedding.
+
+    full: float list in `embedding` (default); float16/int8: a packed blob in
+    `embedding_q`; ref: only `embedding_q.dim`, the vector lives in Qdrant.
+    """
+    mode = os.getenv("MONGO_VECTOR_STORAGE", "full").strip().lower()
+    if mode not in VECTOR_STORAGE_MODES:
+        mode = "full"
+    if mode == "ref" and not (qdrant_mgr and qdrant_mgr.enabled):
+        # nothing else would hold the vector; keep a compact copy instead of dropping it
+        return "float16"
+    return mode
+
+
+def _encode_embedding(vec: Optional[List[float]], mode: Optional[str] = None) -> Dict[str, Any]:
+    """Fields to store for `vec` in `mode` (default: the configured storage mode)."""
+    if not vec:
+        return {"embedding": None}
+    mode = mode or _vector_storage_mode()
+    if mode == "full":
+        return {"embedding": list(vec)}
+    dim = len(vec)
+    if mode == "ref":
+        q: Dict[str, Any] = {"fmt": "ref", "dim": dim}
+    elif mode == "float16":
+        q = {"fmt": "float16", "dim": dim, "data": Binary(struct.pack(f"<{dim}e", *vec))}
+    else:
+        # symmetric per-vector scale: int8 value * scale ~= float value, |value| <= 127
+        peak = max(max(vec), -min(vec))
+        scale = (peak / 127.0) or 1.0
+        packed = array("b", map(round, (x * (1.0 / scale) for x in vec)))
+        q = {"fmt": "int8", "dim": dim, "scale": scale, "data": Binary(packed.tobytes())}
+    return {"embedding": None, "embedding_q": q}
+
+
+def _vector_collection(coll_name: str) -> Optional[str]:
+    """Qdrant collection holding the vectors of a Mongo collection's records."""
+    if not (qdrant_mgr and qdrant_mgr.enabled):
+        return None
+    return {"documents": qdrant_mgr.col_docs, "doc_chunks": qdrant_mgr.col_chunks}.get(coll_name)
+
+
+def _fetch_point_vectors(collection: Optional[str], ids: List[Any]) -> Dict[str, List[float]]:
+    """Vectors stored in Qdrant for Mongo ids (point ids derive from the id string)."""
+    if not collection or not ids or not (qdrant_mgr and qdrant_mgr.enabled):
+        return {}
+    by_pid = {_qdrant_point_id(str(i)): str(i) for i in ids}
+    points = qdrant_mgr.client.retrieve(collection_name=collection, ids=list(by_pid), with_vectors=True, with_payload=False)
+    return {by_pid[p.id]: list(p.vector) for p in points if isinstance(p.vector, list) and p.id in by_pid}
+
+
+def _decode_embedding(doc: Dict[str, Any], collection: Optional[str] = None) -> Optional[List[float]]:
+    """Float vector of a stored document/chunk, whichever storage mode wrote it.
+
+    `ref` records are read back from the Qdrant `collection`; pass None to skip them.
+    """
+    vec = doc.get("embedding")
+    if vec:
+        return list(vec)
+    q = doc.get("embedding_q") or {}
+    fmt = q.get("fmt")
+    if fmt == "float16":
+        return list(struct.unpack(f"<{q['dim']}e", bytes(q["data"])))
+    if fmt == "int8":
+        scale = q.get("scale") or 1.0
+        return [v * scale for v in array("b", bytes(q["data"]))]
+    if fmt == "ref" and collection and doc.get("_id") is not None:
+        return _fetch_point_vectors(collection, [doc["_id"]]).get(str(doc["_id"]))
+    return None
+
+
+def _decode_embeddings(docs: List[Dict[str, Any]], collection: Optional[str] = None) -> None:
+    """Replace stored vectors by float lists in place (one Qdrant call for all `ref` records)."""
+    refs = [d["_id"] for d in docs if (d.get("embedding_q") or {}).get("fmt") == "ref"]
+    fetched = _fetch_point_vectors(collection, refs) if refs else {}
+    for d in docs:
+        if "embedding_q" not in d:
+            continue
+        q = d.pop("embedding_q")
+        d["embedding"] = fetched.get(str(d["_id"])) if q.get("fmt") == "ref" else _decode_embedding({"embedding_q": q})
+
+
+def _stored_vector_filter(target: str) -> Dict[str, Any]:
+    """Records holding a vector in some format other than `target`."""
+    if target == "full":
+        return {"embedding_q": {"$exists": True}}
+    return {"$or": [{"embedding": {"$type": "array"}}, {"embedding_q.fmt": {"$exists": True, "$ne": target}}]}
+
+
+def _vector_migrate_job(target: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rewrite stored vectors into `target` format in _id order, batch by batch.
+
+    Moving to `ref` first upserts any point Qdrant is missing, so the Mongo copy
+    is only dropped once Qdrant has it. Records already in `target` no longer
+    match the filter, so rerunning (or resuming at startup) continues where it
+    stopped. `ref` records whose point is gone from Qdrant are counted as lost.
+    """
+    batch = max(1, int(os.getenv("VECTOR_MIGRATE_BATCH", "500")))
+    progress: Dict[str, int] = {"documents": 0, "chunks": 0, "pushed_to_qdrant": 0, "lost": 0}
+    oid = ObjectId(run_id) if run_id else None
+    for coll_name, counter in (("documents", "documents"), ("doc_chunks", "chunks")):
+        coll = database[coll_name]
+        qcol = _vector_collection(coll_name)
+        projection = {"raw_html": 0, "raw_markdown": 0, "cleaned_text": 0, "entities": 0} if coll_name == "documents" else None
+        last = None
+        while True:
+            filt = _stored_vector_filter(target)
+            if last is not None:
+                filt = {"$and": [filt, {"_id": {"$gt": last}}]}
+            rows = list(coll.find(filt, projection).sort("_id", 1).limit(batch))
+            if not rows:
+                break
+            last = rows[-1]["_id"]
+            fetched = len(rows)
+            _decode_embeddings(rows, qcol)
+            rows = [r for r in rows if r.get("embedding")]
+            progress["lost"] += fetched - len(rows)
+            if target == "ref" and rows:
+                have = {str(p.id) for p in qdrant_mgr.client.retrieve(
+                    collection_name=qcol, ids=[_qdrant_point_id(str(r["_id"])) for r in rows], with_vectors=False, with_payload=False,
+                )}
+                missing = [r for r in rows if str(_qdrant_point_id(str(r["_id"]))) not in have]
+                if missing:
+                    points = [
+                        PointStruct(id=_qdrant_point_id(str(r["_id"])), vector=r["embedding"], payload=_doc_point_payload(r["_id"], r))
+                        if coll_name == "documents" else _chunk_point(r["doc_id"], r)
+                        for r in missing
+                    ]
+                    qdrant_mgr.client.upsert(collection_name=qcol, points=[p for p in points if p is not None], wait=True)
+                    progress["pushed_to_qdrant"] += len(missing)
+            ops = []
+            for r in rows:
+                update: Dict[str, Any] = {"$set": _encode_embedding(r["embedding"], target)}
+                if target == "full":
+                    update["$unset"] = {"embedding_q": ""}
+                ops.append(UpdateOne({"_id": r["_id"]}, update))
+            if ops:
+                coll.bulk_write(ops, ordered=False)
+            progress[counter] += len(ops)
+            if oid is not None:
+                try:
+                    database.agent_runs.update_one({"_id": oid}, {"$set": {"progress": dict(progress)}})
+                except PyMongoError:
+                    pass
+    return {"target": target, **progress}
+
+
+class VectorMigrateIn(BaseModel):
+    target: Optional[str] = None  # full | ref | float16 | int8; defaults to MONGO_VECTOR_STORAGE
+    background: Optional[bool] = True
+
+
+@app.post("/vectors/migrate")
+def migrate_vectors(body: VectorMigrateIn, response: Response) -> Dict[str, Any]:
+    """Backfill: rewrite existing documents/doc_chunks vectors into one storage format."""
+    target = (body.target or _vector_storage_mode()).strip().lower()
+    if target not in VECTOR_STORAGE_MODES:
+        raise HTTPException(status_code=400, detail=f"target must be one of {', '.join(VECTOR_STORAGE_MODES)}")
+    if target == "ref" and not (qdrant_mgr and qdrant_mgr.enabled):
+        raise HTTPException(status_code=400, detail="ref storage needs Qdrant")
+    if body.background:
+        run_id = agent_jobs.submit("vector-migrate", {"target": target}, lambda rid: _vector_migrate_job(target, run_id=rid))
+        response.status_code = 202
+        return {"run_id": run_id, "status": "queued", "status_url": f"/agent/runs/{run_id}"}
+    try:
+        return _vector_migrate_job(target)
+    except PyMongoError as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {e}")
+
+# -----------------------------
+# Vector outbox
+# -----------------------------
+class VectorOutbox:
+    """Durable queue of Qdrant writes in the `vector_outbox` collection.
+
+    Ingest only inserts entries (vector as float32 bytes, payload, op), so it
+    no longer waits on Qdrant. One flusher at a time, elected with a lease in
+    `counters`, applies entries in _id order as large wait=True upserts and
+    deletes, removes what succeeded, and backs off exponentially while Qdrant
+    fails. Entries stay in Mongo until Qdrant has acknowledged them. When a
+    group fails while Qdrant is reachable, its entries are retried one by one;
+    an entry rejected VECTOR_OUTBOX_MAX_ATTEMPTS times moves to
+    `vector_outbox_dead`, so one bad vector can't block the queue.
+    """
+
+    LOCK_ID = "vector_outbox_lock"
+
+    def __init__(self, db):
+        self.coll = db.vector_outbox
+        self.dead = db.vector_outbox_dead
+        self.locks = db.counters
+        self.batch = max(1, int(os.getenv("VECTOR_OUTBOX_BATCH", "1000")))
+        self.poll = max(0.05, float(os.getenv("VECTOR_OUTBOX_POLL_SECONDS", "1")))
+        self.min_backoff = max(0.1, float(os.getenv("VECTOR_OUTBOX_MIN_BACKOFF", "1")))
+        self.max_backoff = max(self.min_backoff, float(os.getenv("VECTOR_OUTBOX_MAX_BACKOFF", "300")))
+        self.lease = max(5.0, float(os.getenv("VECTOR_OUTBOX_LEASE_SECONDS", "30")))
+        self.max_attempts = max(1, int(os.getenv("VECTOR_OUTBOX_MAX_ATTEMPTS", "5")))
+        self.owner = f"{os.getpid()}-{ObjectId()}"
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {"enqueued": 0, "flushed": 0, "errors": 0, "dead_lettered": 0}
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[datetime] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="vector-outbox", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, collection: str, points: List[Any]) -> None:
+        now = datetime.utcnow()
+        entries = []
+        for p in points:
+            if p is None or not p.vector:
                 continue
-            pid = _qdrant_point_id(str(cid))
-            payload = {k: v for k, v in ch.items() if k not in {"embedding"}}
-            payload["type"] = "chunk"
-            payload["doc_id"] = str(doc_id)
-            # add string date filter helper
-            db = payload.get("day_bucket")
-            if isinstance(db, datetime):
-                payload["day_bucket_str"] = db.date().isoformat()
-            points.append(PointStruct(id=pid, vector=vec, payload=payload))
-        if not points:
+            entries.append({
+                "op": "upsert", "col": collection, "pid": p.id,
+                "vec": Binary(array("f", p.vector).tobytes()), "payload": p.payload or {},
+                "attempts": 0, "created_at": now,
+            })
+        self._insert(entries, collection, points)
+
+    def enqueue_delete(self, collection: str, doc_ids: List[str]) -> None:
+        entry = {"op": "delete", "col": collection, "doc_ids": doc_ids, "attempts": 0, "created_at": datetime.utcnow()}
+        self._insert([entry], collection, None)
+
+    def _insert(self, entries: List[Dict[str, Any]], collection: str, points: Optional[List[Any]]) -> None:
+        if not entries:
+            return
+        try:
+            self.coll.insert_many(entries, ordered=True)
+        except PyMongoError:
+            # without the outbox, fall back to a direct best-effort write
+            try:
+                if points is not None:
+                    qdrant_mgr.write_points(collection, [p for p in points if p is not None], wait=False)
+                else:
+                    qdrant_mgr.delete_where(collection, entries[0]["doc_ids"], wait=False)
+            except Exception:
+                pass
             return
+        with self._lock:
+            self._counters["enqueued"] += len(entries)
+        self._wake.set()
+
+    def _acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            self.locks.find_one_and_update(
+                {"_id": self.LOCK_ID, "$or": [{"owner": self.owner}, {"until": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "until": now + timedelta(seconds=self.lease)}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            # another process holds the lease
+            return False
+
+    @staticmethod
+    def _groups(rows: List[Dict[str, Any]]):
+        """Consecutive runs of the same (op, collection), so order is kept across upserts and deletes."""
+        group: List[Dict[str, Any]] = []
+        for r in rows:
+            if group and (group[0]["op"], group[0]["col"]) != (r["op"], r["col"]):
+                yield group
+                group = []
+            group.append(r)
+        if group:
+            yield group
+
+    @staticmethod
+    def _apply(group: List[Dict[str, Any]]) -> None:
+        col = group[0]["col"]
+        if group[0]["op"] == "delete":
+            qdrant_mgr.delete_where(col, [d for r in group for d in r.get("doc_ids") or []])
+        else:
+            points = [
+                PointStruct(id=r["pid"], vector=array("f", bytes(r["vec"])).tolist(), payload=r.get("payload") or {})
+                for r in group
+            ]
+            qdrant_mgr.write_points(col, points)
+
+    @staticmethod
+    def _reachable(col: str) -> bool:
+        """Whether Qdrant answers at all, i.e. a failed write was about the entry rather than an outage."""
         try:
-            self.client.upsert(collection_name=self.col_chunks, points=points, wait=False)
+            qdrant_mgr.client.get_collection(col)
+            return True
         except Exception:
+            return False
+
+    def _retry_each(self, group: List[Dict[str, Any]], done: List[Any]) -> None:
+        """Apply a failed group entry by entry, in order; dead-letter entries past max_attempts.
+
+        Stops (raising) at the first entry that fails and still has attempts
+        left, so later writes for the same point never overtake it.
+        """
+        for r in group:
+            try:
+                self._apply([r])
+                done.append(r["_id"])
+                continue
+            except Exception as e:
+                err = str(e)[:500]
+            if r.get("attempts", 0) + 1 >= self.max_attempts:
+                dead = {k: v for k, v in r.items() if k != "_id"}
+                self.dead.insert_one({
+                    **dead, "outbox_id": r["_id"], "attempts": r.get("attempts", 0) + 1,
+                    "last_error": err, "dead_at": datetime.utcnow(),
+                })
+                self.coll.delete_one({"_id": r["_id"]})
+                with self._lock:
+                    self._counters["dead_lettered"] += 1
+                continue
+            self.coll.update_one({"_id": r["_id"]}, {"$inc": {"attempts": 1}, "$set": {"last_error": err}})
+            raise RuntimeError(f"outbox entry {r['_id']} rejected: {err}")
+
+    def flush_once(self) -> int:
+        """Apply up to one batch; returns the number of entries flushed, raises if Qdrant failed."""
+        if not qdrant_mgr.reconnect():
+            raise RuntimeError("Qdrant unavailable")
+        rows = list(self.coll.find({}).sort("_id", 1).limit(self.batch))
+        done: List[Any] = []
+        try:
+            for group in self._groups(rows):
+                try:
+                    self._apply(group)
+                    done.extend(r["_id"] for r in group)
+                except Exception:
+                    # an outage: leave the entries alone and back off
+                    if not self._reachable(group[0]["col"]):
+                        raise
+                    self._retry_each(group, done)
+        finally:
+            if done:
+                self.coll.delete_many({"_id": {"$in": done}})
+                with self._lock:
+                    self._counters["flushed"] += len(done)
+                self.last_flush_at = datetime.utcnow()
+                # cached searches from before the points landed would miss them
+                corpus_generation.bump()
+        return len(done)
+
+    def run(self) -> None:
+        delay = self.min_backoff
+        while True:
+            self._wake.wait(timeout=self.poll)
+            self._wake.clear()
+            try:
+                while self._acquire() and self.flush_once() >= self.batch:
+                    pass
+                delay = self.min_backoff
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                self.last_error = str(e)[:500]
+                time.sleep(delay)
+                delay = min(self.max_backoff, delay * 2)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"enabled": True, "last_error": self.last_error, "last_flush_at": self.last_flush_at}
+        with self._lock:
+            out.update(self._counters)
+        try:
+            out["pending"] = self.coll.estimated_document_count()
+            out["dead"] = self.dead.estimated_document_count()
+            out["failing"] = self.coll.count_documents({"attempts": {"$gt": 0}})
+            oldest = self.coll.find_one({}, {"created_at": 1}, sort=[("_id", 1)])
+            # lag: how long the oldest unflushed write has been waiting
+            out["lag_seconds"] = round((datetime.utcnow() - oldest["created_at"]).total_seconds(), 1) if oldest else 0.0
+        except PyMongoError:
             pass
+        return out
 
 
-qdrant_mgr = QdrantManager()
+vector_outbox: Optional[VectorOutbox] = None
+if QDRANT_AVAILABLE and os.getenv("VECTOR_OUTBOX", "on").lower() not in {"0", "off", "false", "no"}:
+    vector_outbox = VectorOutbox(database)
+
+
+def _vector_reconcile_job(run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Queue every stored vector Qdrant doesn't have (documents, then chunks, in _id order).
+
+    Vectors come from Mongo (any storage mode except ref); chunks with no
+    usable copy are re-embedded when an embeddings provider is configured.
+    Points already waiting in the outbox are not queued twice.
+    """
+    if not (qdrant_mgr and qdrant_mgr.reconnect()):
+        raise HTTPException(status_code=400, detail="Qdrant unavailable")
+    batch = max(1, int(os.getenv("VECTOR_RECONCILE_BATCH", "1000")))
+    progress = {"checked": 0, "missing": 0, "queued": 0, "reembedded": 0, "lost": 0}
+    oid = ObjectId(run_id) if run_id else None
+    has_vector = {"$or": [{"embedding": {"$type": "array"}}, {"embedding_q": {"$exists": True}}]}
+    for coll_name in ("documents", "doc_chunks"):
+        coll = database[coll_name]
+        qcol = _vector_collection(coll_name)
+        projection = {"raw_html": 0, "raw_markdown": 0, "cleaned_text": 0, "entities": 0} if coll_name == "documents" else None
+        last = None
+        while True:
+            filt = has_vector if last is None else {"$and": [has_vector, {"_id": {"$gt": last}}]}
+            rows = list(coll.find(filt, projection).sort("_id", 1).limit(batch))
+            if not rows:
+                break
+            last = rows[-1]["_id"]
+            progress["checked"] += len(rows)
+            pids = {_qdrant_point_id(str(r["_id"])): r for r in rows}
+            have = {p.id for p in qdrant_mgr.client.retrieve(
+                collection_name=qcol, ids=list(pids), with_vectors=False, with_payload=False,
+            )}
+            if vector_outbox is not None:
+                have.update(e["pid"] for e in vector_outbox.coll.find({"col": qcol, "pid": {"$in": list(pids)}}, {"pid": 1}))
+            missing = [r for pid, r in pids.items() if pid not in have]
+            if not missing:
+                continue
+            progress["missing"] += len(missing)
+            vecs = [_decode_embedding(r) for r in missing]
+            if coll_name == "doc_chunks" and embedding_service.enabled:
+                redo = [i for i, v in enumerate(vecs) if not v and (missing[i].get("text") or "").strip()]
+                if redo:
+                    fresh = embedding_service.embed_documents([missing[i]["text"] for i in redo])
+                    for i, v in zip(redo, fresh):
+                        vecs[i] = v
+                    progress["reembedded"] += sum(1 for v in fresh if v)
+            points = []
+            for r, v in zip(missing, vecs):
+                if not v:
+                    progress["lost"] += 1
+                elif coll_name == "documents":
+                    points.append(PointStruct(id=_qdrant_point_id(str(r["_id"])), vector=v, payload=_doc_point_payload(r["_id"], r)))
+                else:
+                    points.append(_chunk_point(r["doc_id"], r, v))
+            qdrant_mgr.upsert_points(qcol, points)
+            progress["queued"] += len(points)
+            if oid is not None:
+                try:
+                    database.agent_runs.update_one({"_id": oid}, {"$set": {"progress": dict(progress)}})
+                except PyMongoError:
+                    pass
+    if progress["queued"] and vector_outbox is None:
+        # written directly; with the outbox, the flusher bumps once they land
+        corpus_generation.bump()
+    return progress
+
+
+class VectorReconcileIn(BaseModel):
+    background: Optional[bool] = True
+
+
+@app.post("/vectors/reconcile")
+def reconcile_vectors(body: VectorReconcileIn, response: Response) -> Dict[str, Any]:
+    """Find documents/chunks whose vectors never reached Qdrant and queue them again."""
+    if body.background:
+        run_id = agent_jobs.submit("vector-reconcile", {}, lambda rid: _vector_reconcile_job(run_id=rid))
+        response.status_code = 202
+        return {"run_id": run_id, "status": "queued", "status_url": f"/agent/runs/{run_id}"}
+    try:
+        return _vector_reconcile_job()
+    except PyMongoError as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {e}")
+
+
+# -----------------------------
+# Firecrawl helpers
+# -----------------------------
+def _find_first(obj, keys):
+    """Depth-first search for the first non-empty string under any of `keys`."""
+    if isinstance(obj, dict):
+        # direct hit
+        for k in keys:
+            v = obj.get(k)
+            if isinstance(v, str) and v.strip():
+                return v
+        # nested
+        for v in obj.values():
+            res = _find_first(v, keys)
+            if res:
+                return res
+    elif isinstance(obj, list):
+        for it in obj:
+            res = _find_first(it, keys)
+            if res:
+                return res
+    return None
+
+
+def _html_to_md_basic(html_str: str) -> str:
+    """Very small HTML → markdown conversion for Firecrawl responses without markdown."""
+    import re
+    text = html_str
+    text = re.sub(r"<\s*br\s*/?\s*>", "\n", text, flags=re.I)
+    for i in range(6, 0, -1):
+        text = re.sub(rf"<\s*h{i}[^>]*>(.*?)<\s*/h{i}\s*>", lambda m: "#"*i + " " + re.sub(r"<[^>]+>", "", m.group(1)) + "\n\n", text, flags=re.I|re.S)
+    text = re.sub(r"<\s*li[^>]*>(.*?)<\s*/li\s*>", lambda m: "- " + re.sub(r"<[^>]+>", "", m.group(1)) + "\n", text, flags=re.I|re.S)
+    def _link(m):
+        href = m.group(1) or ""
+        label = re.sub(r"<[^>]+>", "", m.group(2) or "")
+        return f"[{label}]({href})"
+    text = re.sub(r"<a[^>]*href=\"([^\"]*)\"[^>]*>(.*?)<\s*/a\s*>", _link, text, flags=re.I|re.S)
+    text = re.sub(r"<\s*(p|div|section|article|header|footer)[^>]*>", "\n\n", text, flags=re.I)
+    text = re.sub(r"<\s*/\s*(p|div|section|article|header|footer)\s*>", "\n\n", text, flags=re.I)
+    text = re.sub(r"<[^>]+>", "", text)
+    text = re.sub(r"\n{3,}", "\n\n", text).strip()
+    return text
+
+
+def _markdown_from_scrape(payload: Dict[str, Any]) -> str:
+    markdown = _find_first(payload, ["markdown", "content_markdown", "markdown_text"]) or ""
+    if not markdown:
+        html_val = _find_first(payload, ["html", "content_html", "contentHtml"]) or ""
+        if html_val:
+            markdown = _html_to_md_basic(html_val)
+    return markdown
+
+
+def _scrape_markdown(url: str) -> str:
+    """Scrape one URL through Firecrawl and return its markdown (may be empty).
+
+    Blocking; used from agent job threads. Async handlers use `_ascrape_markdown`.
+    """
+    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+    r = httpx.post(f"{firecrawl}/scrape", json={"url": url, "formats": ["markdown", "html"]}, timeout=60)
+    r.raise_for_status()
+    return _markdown_from_scrape(r.json() or {})
+
+
+async def _ascrape_markdown(url: str) -> str:
+    """Async `_scrape_markdown` on the shared client."""
+    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+    r = await _http().post(f"{firecrawl}/scrape", json={"url": url, "formats": ["markdown", "html"]}, timeout=60)
+    r.raise_for_status()
+    return _markdown_from_scrape(r.json() or {})
+
 
 @app.post("/scrape-website", status_code=201)
-def scrape_website(url: Dict[str, str]):
+async def scrape_website(url: Dict[str, str]):
     target = url.get("url")
     if not target:
         raise HTTPException(status_code=400, detail="url is required")
@@ -531,7 +1461,7 @@ def scrape_website(url: Dict[str, str]):
     firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
     try:
         # Firecrawl /scrape typically responds synchronously with { data: { markdown?, html? } }
-        r = httpx.post(
+        r = await _http().post(
             f"{firecrawl}/scrape",
             json={"url": target, "formats": ["markdown", "html"]},
             timeout=60,
@@ -539,48 +1469,7 @@ def scrape_website(url: Dict[str, str]):
         r.raise_for_status()
         payload = r.json() or {}
 
-        def _find_first(obj, keys):
-            if isinstance(obj, dict):
-                # direct hit
-                for k in keys:
-                    v = obj.get(k)
-                    if isinstance(v, str) and v.strip():
-                        return v
-                # nested
-                for v in obj.values():
-                    res = _find_first(v, keys)
-                    if res:
-                        return res
-            elif isinstance(obj, list):
-                for it in obj:
-                    res = _find_first(it, keys)
-                    if res:
-                        return res
-            return None
-
-        def _html_to_md_basic(html_str: str) -> str:
-            import re
-            text = html_str
-            text = re.sub(r"<\s*br\s*/?\s*>", "\n", text, flags=re.I)
-            for i in range(6, 0, -1):
-                text = re.sub(rf"<\s*h{i}[^>]*>(.*?)<\s*/h{i}\s*>", lambda m: "#"*i + " " + re.sub(r"<[^>]+>", "", m.group(1)) + "\n\n", text, flags=re.I|re.S)
-            text = re.sub(r"<\s*li[^>]*>(.*?)<\s*/li\s*>", lambda m: "- " + re.sub(r"<[^>]+>", "", m.group(1)) + "\n", text, flags=re.I|re.S)
-            def _link(m):
-                href = m.group(1) or ""
-                label = re.sub(r"<[^>]+>", "", m.group(2) or "")
-                return f"[{label}]({href})"
-            text = re.sub(r"<a[^>]*href=\"([^\"]*)\"[^>]*>(.*?)<\s*/a\s*>", _link, text, flags=re.I|re.S)
-            text = re.sub(r"<\s*(p|div|section|article|header|footer)[^>]*>", "\n\n", text, flags=re.I)
-            text = re.sub(r"<\s*/\s*(p|div|section|article|header|footer)\s*>", "\n\n", text, flags=re.I)
-            text = re.sub(r"<[^>]+>", "", text)
-            text = re.sub(r"\n{3,}", "\n\n", text).strip()
-            return text
-
-        markdown = _find_first(payload, ["markdown", "content_markdown", "markdown_text"]) or ""
-        if not markdown:
-            html_val = _find_first(payload, ["html", "content_html", "contentHtml"]) or ""
-            if html_val:
-                markdown = _html_to_md_basic(html_val)
+        markdown = _markdown_from_scrape(payload)
         if not markdown:
             # last resort plain text
             txt = _find_first(payload, ["text", "content", "plainText", "textContent"]) or ""
@@ -591,7 +1480,7 @@ def scrape_website(url: Dict[str, str]):
             "metadata": {"firecrawl": "scrape"},
             "created_at": datetime.utcnow(),
         }
-        inserted = database.notes.insert_one(doc)
+        inserted = await _adb().notes.insert_one(doc)
         return {"id": str(inserted.inserted_id), "markdown": markdown}
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
@@ -599,178 +1488,152 @@ def scrape_website(url: Dict[str, str]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/crawl-website", status_code=201)
-def crawl_website(payload: Dict[str, Any]) -> Dict[str, Any]:
-    target = payload.get("url")
-    if not target:
-        raise HTTPException(status_code=400, detail="url is required")
-    max_depth = int(payload.get("maxDepth", 1))
-    limit = int(payload.get("limit", 10))
+async def _firecrawl_start_crawl(target: str, max_depth: int, limit: int) -> str:
+    """Start a Firecrawl crawl and return its id (502 if the server gives none)."""
     firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
-    try:
-        # Start crawl
-        start = httpx.post(
-            f"{firecrawl}/crawl",
-            json={
-                "url": target,
-                "maxDepth": max_depth,
-                "limit": limit,
-                "scrapeOptions": {"formats": ["markdown", "html"]},
-            },
-            timeout=30,
-        )
-        start.raise_for_status()
-        start_json: Dict[str, Any] = {}
-        try:
-            start_json = start.json() or {}
-        except Exception:
-            start_json = {}
-        crawl_id = (
-            start_json.get("id")
-            or start_json.get("crawl_id")
-            or start_json.get("crawlId")
-            or start_json.get("jobId")
-            or start_json.get("taskId")
-            or (start_json.get("data") or {}).get("id")
-        )
-        if not crawl_id:
-            loc = start.headers.get("Location") or start.headers.get("location") or ""
-            if "/crawl/" in loc:
-                crawl_id = loc.rstrip("/").split("/")[-1]
-        if not crawl_id:
-            # Surface minimal debug info to help diagnose mismatched server versions
-            raise HTTPException(
-                status_code=502,
-                detail=f"Crawl did not return an id (keys: {list(start_json.keys())})",
-            )
-
-        # Poll for completion
-        deadline = time.monotonic() + 180  # up to 3 minutes
-        status: Dict[str, Any] = {}
-        while True:
-            resp = httpx.get(f"{firecrawl}/crawl/{crawl_id}", timeout=30)
-            resp.raise_for_status()
-            status = resp.json() or {}
-            if status.get("status") in {"completed", "failed"}:
-                break
-            if time.monotonic() > deadline:
-                raise HTTPException(status_code=504, detail="Crawl timed out")
-            time.sleep(1.2)
-
-        if status.get("status") != "completed":
-            raise HTTPException(status_code=500, detail="Crawl failed")
-
-        pages: List[Dict[str, Any]] = status.get("data") or []
-        docs: List[Dict[str, Any]] = []
-        for page in pages:
-            content = page.get("markdown") or page.get("html") or ""
-            url = page.get("url")
-            if not content:
-                continue
-            docs.append(
-                {
-                    "text": content,
-                    "source_url": url,
-                    "metadata": {"firecrawl": "crawl", "crawl_id": crawl_id},
-                    "created_at": datetime.utcnow(),
-                }
-            )
+    start = await _http().post(
+        f"{firecrawl}/crawl",
+        json={
+            "url": target,
+            "maxDepth": max_depth,
+            "limit": limit,
+            "scrapeOptions": {"formats": ["markdown", "html"]},
+        },
+        timeout=30,
+    )
+    start.raise_for_status()
+    data = start.json() if start.headers.get("content-type", "").startswith("application/json") else {}
+    crawl_id = (
+        (data or {}).get("id")
+        or (data or {}).get("crawl_id")
+        or (data or {}).get("crawlId")
+        or (data or {}).get("jobId")
+        or (data or {}).get("taskId")
+        or ((data or {}).get("data") or {}).get("id")
+    )
+    if not crawl_id:
+        loc = start.headers.get("Location") or start.headers.get("location") or ""
+        if "/crawl/" in loc:
+            crawl_id = loc.rstrip("/").split("/")[-1]
+    if not crawl_id:
+        raise HTTPException(status_code=502, detail="Crawl did not return an id")
+    return str(crawl_id)
 
-        if not docs:
-            return {"inserted_count": 0, "ids": [], "crawl_id": crawl_id}
 
-        result = database.notes.insert_many(docs)
-        ids = [str(_id) for _id in result.inserted_ids]
-        return {"inserted_count": len(ids), "ids": ids, "crawl_id": crawl_id}
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# -----------------------------
+# Keyword search ($text with regex opt-in)
+# -----------------------------
+def _keyword_filter(q: str, match: str, fields: List[str]) -> Dict[str, Any]:
+    if match == "regex":
+        return {"$or": [{f: {"$regex": q, "$options": "i"}} for f in fields]}
+    return {"$text": {"$search": q}}
+
+
+def _keyword_find(
+    coll,
+    base: Dict[str, Any],
+    q: str,
+    match: Optional[str],
+    fields: List[str],
+    projection: Optional[Dict[str, Any]] = None,
+    time_field: str = "captured_at",
+    skip: int = 0,
+    limit: int = 20,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any], str]:
+    """Keyword query ranked by textScore (or newest-first for regex).
+
+    `match="regex"` opts into an unanchored case-insensitive scan of `fields`;
+    anything else uses the collection's text index and falls back to regex only
+    if that index is missing. Returns (docs, filter used, match used).
+    """
+    match = "regex" if (match or "").lower() == "regex" else "text"
+    filt = {**base, **_keyword_filter(q, match, fields)}
+    proj = dict(projection or {})
+    sort: List[Tuple[str, Any]] = [(time_field, -1)]
+    if match == "text":
+        proj["score"] = {"$meta": "textScore"}
+        sort = [("score", {"$meta": "textScore"}), (time_field, -1)]
+    try:
+        docs = list(coll.find(filt, proj or None).sort(sort).skip(int(skip)).limit(int(limit)))
+    except OperationFailure:
+        if match != "text":
+            raise
+        # no text index on this deployment
+        return _keyword_find(coll, base, q, "regex", fields, projection, time_field, skip, limit)
+    return docs, filt, match
 
 
-@app.post("/crawl-start")
-def crawl_start(payload: Dict[str, Any]) -> Dict[str, Any]:
-    target = payload.get("url")
-    if not target:
-        raise HTTPException(status_code=400, detail="url is required")
-    max_depth = int(payload.get("maxDepth", 1))
-    limit = int(payload.get("limit", 10))
-    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
-    try:
-        start = httpx.post(
-            f"{firecrawl}/crawl",
-            json={
-                "url": target,
-                "maxDepth": max_depth,
-                "limit": limit,
-                "scrapeOptions": {"formats": ["markdown", "html"]},
-            },
-            timeout=30,
-        )
-        start.raise_for_status()
-        data = start.json() if start.headers.get("content-type", "").startswith("application/json") else {}
-        crawl_id = (
-            (data or {}).get("id")
-            or (data or {}).get("crawl_id")
-            or (data or {}).get("crawlId")
-            or (data or {}).get("jobId")
-            or (data or {}).get("taskId")
-            or ((data or {}).get("data") or {}).get("id")
-        )
-        if not crawl_id:
-            loc = start.headers.get("Location") or start.headers.get("location") or ""
-            if "/crawl/" in loc:
-                crawl_id = loc.rstrip("/").split("/")[-1]
-        if not crawl_id:
-            raise HTTPException(status_code=502, detail="Crawl did not return an id")
-        return {"crawl_id": crawl_id}
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
+# -----------------------------
+# Keyset pagination
+# -----------------------------
+def _encode_after(ts: Optional[datetime], oid: Any) -> str:
+    raw = json.dumps({"t": ts.isoformat() if ts else None, "i": str(oid)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
 
 
-@app.get("/crawl-status/{crawl_id}")
-def crawl_status(crawl_id: str) -> Dict[str, Any]:
-    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+def _decode_after(token: str) -> Tuple[Optional[datetime], ObjectId]:
     try:
-        resp = httpx.get(f"{firecrawl}/crawl/{crawl_id}", timeout=30)
-        resp.raise_for_status()
-        return resp.json() or {}
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
+        raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        ts = datetime.fromisoformat(raw["t"]) if raw.get("t") else None
+        return ts, ObjectId(raw["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid after cursor")
+
+
+def _keyset_find(
+    coll,
+    filt: Dict[str, Any],
+    after: Optional[str],
+    limit: int,
+    projection: Optional[Dict[str, Any]] = None,
+    time_field: str = "captured_at",
+    skip: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Newest-first page ordered by (time_field, _id) desc, resuming after an opaque cursor.
+
+    Served by the (time_field -1, _id -1) indexes, so the cost is O(page)
+    however deep the cursor is. `skip` is still honoured for old clients.
+    Returns (docs, next_after or None).
+    """
+    query = filt
+    if after:
+        ts, oid = _decode_after(after)
+        if ts is None:
+            # documents without a timestamp sort last; only the _id tie-break is left
+            seek: Dict[str, Any] = {time_field: None, "_id": {"$lt": oid}}
+        else:
+            seek = {"$or": [{time_field: {"$lt": ts}}, {time_field: ts, "_id": {"$lt": oid}}, {time_field: None}]}
+        query = {"$and": [filt, seek]} if filt else seek
+    cur = coll.find(query, projection).sort([(time_field, -1), ("_id", -1)])
+    if skip:
+        cur = cur.skip(int(skip))
+    docs = list(cur.limit(int(limit) + 1))
+    next_after = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_after = _encode_after(last.get(time_field), last["_id"])
+    return docs, next_after
+
+
+def _page_total(coll, filt: Dict[str, Any], count: str) -> Tuple[Optional[int], Optional[bool]]:
+    """Total for a listing: 'exact' counts the filter, 'estimated' uses collection metadata when
+    unfiltered (else a count capped at ESTIMATED_COUNT_CAP), 'none' skips counting.
+
+    Returns (total, exact).
+    """
+    count = (count or "exact").lower()
+    if count == "none":
+        return None, None
+    if count == "estimated":
+        if not filt:
+            return coll.estimated_document_count(), False
+        cap = max(1, int(os.getenv("ESTIMATED_COUNT_CAP", "10000")))
+        n = coll.count_documents(filt, limit=cap)
+        return n, n < cap
+    return coll.count_documents(filt), True
 
 
-@app.post("/crawl-save/{crawl_id}")
-def crawl_save(crawl_id: str) -> Dict[str, Any]:
-    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
-    try:
-        resp = httpx.get(f"{firecrawl}/crawl/{crawl_id}", timeout=30)
-        resp.raise_for_status()
-        status: Dict[str, Any] = resp.json() or {}
-        if status.get("status") != "completed":
-            raise HTTPException(status_code=409, detail="Crawl not completed yet")
-        pages: List[Dict[str, Any]] = status.get("data") or []
-        docs: List[Dict[str, Any]] = []
-        for page in pages:
-            content = page.get("markdown") or page.get("html") or ""
-            url = page.get("url")
-            if not content:
-                continue
-            docs.append(
-                {
-                    "text": content,
-                    "source_url": url,
-                    "metadata": {"firecrawl": "crawl", "crawl_id": crawl_id},
-                    "created_at": datetime.utcnow(),
-                }
-            )
-        if not docs:
-            return {"inserted_count": 0, "ids": []}
-        result = database.notes.insert_many(docs)
-        ids = [str(_id) for _id in result.inserted_ids]
-        return {"inserted_count": len(ids), "ids": ids}
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
-
 def _serialize_note(doc: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "id": str(doc.get("_id")),
@@ -800,22 +1663,31 @@ def create_note(payload: NoteCreate) -> Dict[str, str]:
 @app.get("/notes")
 def list_notes(
     q: Optional[str] = Query(default=None, description="Full-text search in note text"),
+    match: str = Query(default="text", description="'text' (text index, ranked) or 'regex'"),
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
+    after: Optional[str] = Query(default=None, description="next_after from the previous page"),
+    count: str = Query(default="exact", description="'exact', 'estimated' or 'none'"),
 ) -> Dict[str, Any]:
+    if q and after:
+        raise HTTPException(status_code=400, detail="after is not supported with q; use skip")
     try:
         filt: Dict[str, Any] = {}
+        next_after = None
         if q:
-            filt = {"text": {"$regex": q, "$options": "i"}}
-        cursor = (
-            database.notes.find(filt)
-            .sort("created_at", -1)
-            .skip(int(skip))
-            .limit(int(limit))
-        )
-        items = [_serialize_note(d) for d in cursor]
-        total = database.notes.count_documents(filt)
-        return {"items": items, "total": total, "skip": skip, "limit": limit}
+            docs, filt, match = _keyword_find(database.notes, {}, q, match, ["text"], time_field="created_at", skip=skip, limit=limit)
+        else:
+            docs, next_after = _keyset_find(database.notes, filt, after, limit, time_field="created_at", skip=skip)
+        items = [_serialize_note(d) for d in docs]
+        total, exact = _page_total(database.notes, filt, count)
+        out: Dict[str, Any] = {"items": items, "total": total, "skip": skip, "limit": limit}
+        if not q:
+            out["next_after"] = next_after
+        if exact is False:
+            out["total_exact"] = False
+        if q:
+            out["match"] = match
+        return out
     except PyMongoError as error:
         raise HTTPException(status_code=500, detail=f"Failed to list notes: {error}")
 
@@ -873,6 +1745,115 @@ def ingest_document(doc: DocumentIngest) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _bulk_parse_item(obj: Any) -> DocumentIngest:
+    if not isinstance(obj, dict):
+        raise ValueError("each item must be a JSON object")
+    return DocumentIngest(**obj)
+
+
+@app.post("/ingest/bulk")
+async def ingest_bulk(request: Request) -> Dict[str, Any]:
+    """Ingest many documents: a JSON array (or {"documents": [...]}) or an NDJSON stream.
+
+    NDJSON bodies are written in batches of BULK_INSERT_BATCH as lines arrive.
+    Results are reported per input item (by position), including duplicates
+    and validation errors. A JSON array over BULK_MAX_ITEMS is rejected before
+    anything is written. An NDJSON stream that hits the limit, or a batch that
+    fails with a DB error, stops the request: what was written so far is
+    returned with `error` and `next_index`, the first position to resend.
+    """
+    batch_size = max(1, int(os.getenv("BULK_INSERT_BATCH", "500")))
+    max_items = max(1, int(os.getenv("BULK_MAX_ITEMS", "50000")))
+    items: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, DocumentIngest]] = []
+    stop: Dict[str, Any] = {}
+
+    async def flush():
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        try:
+            out = await run_in_threadpool(create_documents_bulk, database, [p for _, p in batch])
+        except PyMongoError as e:
+            # part of this batch may be written; resending it reports those as duplicates
+            for pos, _ in batch:
+                items.append({"index": pos, "error": f"DB error: {e}"})
+            stop.update(error=f"DB error: {e}", next_index=batch[0][0])
+            return
+        for (pos, _), res in zip(batch, out):
+            res["index"] = pos
+            items.append(res)
+
+    async def accept(pos: int, obj: Any) -> bool:
+        """Queue one item; False once the request has to stop."""
+        if stop:
+            return False
+        if pos >= max_items:
+            stop.update(error=f"At most {max_items} documents per request", next_index=pos, truncated=True)
+            return False
+        try:
+            pending.append((pos, _bulk_parse_item(obj)))
+        except (ValueError, ValidationError) as e:
+            items.append({"index": pos, "error": str(e)})
+        if len(pending) >= batch_size:
+            await flush()
+        return not stop
+
+    async def accept_line(pos: int, line: bytes) -> bool:
+        try:
+            obj = json.loads(line)
+        except ValueError as e:
+            items.append({"index": pos, "error": f"invalid JSON: {e}"})
+            return True
+        return await accept(pos, obj)
+
+    ctype = (request.headers.get("content-type") or "").lower()
+    if "ndjson" in ctype or "jsonlines" in ctype:
+        pos = 0
+        buf = b""
+        async for part in request.stream():
+            buf += part
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    if not await accept_line(pos, line):
+                        break
+                    pos += 1
+            if stop:
+                break
+        if buf.strip() and not stop:
+            await accept_line(pos, buf)
+    else:
+        try:
+            body = json.loads(await request.body() or b"[]")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if isinstance(body, dict):
+            body = body.get("documents")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of documents")
+        if len(body) > max_items:
+            raise HTTPException(status_code=413, detail=f"At most {max_items} documents per request")
+        for pos, obj in enumerate(body):
+            if not await accept(pos, obj):
+                break
+    await flush()
+
+    items.sort(key=lambda r: r["index"])
+    out = {
+        "items": items,
+        "inserted": sum(1 for r in items if r.get("duplicate") is False),
+        "duplicates": sum(1 for r in items if r.get("duplicate")),
+        "failed": sum(1 for r in items if "error" in r and not r.get("duplicate")),
+        "truncated": bool(stop.get("truncated")),
+    }
+    if stop:
+        out["error"] = stop["error"]
+        out["next_index"] = stop["next_index"]
+    return out
+
+
 # -------------------------------------------------
 # Smart Agent (LangGraph + LangChain) pipeline
 # -------------------------------------------------
@@ -899,37 +1880,233 @@ class AgentIngestText(BaseModel):
     lang: Optional[str] = None
     chunk_size: Optional[int] = 1000
     chunk_overlap: Optional[int] = 150
+    background: Optional[bool] = False  # queue as an agent run and return its id at once
 
 
 class AgentIngestUrl(BaseModel):
     url: str
     chunk_size: Optional[int] = 1000
     chunk_overlap: Optional[int] = 150
+    background: Optional[bool] = False
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, sha256(text)).
+
+    An in-process LRU sits in front of an optional Mongo collection
+    (`embedding_cache`) whose TTL index expires entries not used for
+    EMBEDDING_CACHE_TTL_DAYS. EMBEDDING_CACHE selects mongo | memory | off.
+    """
+
+    def __init__(self, db):
+        self.backend = os.getenv("EMBEDDING_CACHE", "mongo").lower()
+        self.max_items = max(0, int(os.getenv("EMBEDDING_CACHE_MAX_ITEMS", "20000")))
+        self.ttl_seconds = int(float(os.getenv("EMBEDDING_CACHE_TTL_DAYS", "30")) * 86400)
+        self.coll = db.embedding_cache if self.backend == "mongo" else None
+        self._mem: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "store_hits": 0, "misses": 0, "writes": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend in {"mongo", "memory"}
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return f"{model}:{_sha256_hex(text)}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not self.enabled or not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            for k in keys:
+                item = self._mem.get(k)
+                if item is None:
+                    continue
+                if self.ttl_seconds and now - item[0] > self.ttl_seconds:
+                    self._mem.pop(k, None)
+                    continue
+                self._mem.move_to_end(k)
+                found[k] = item[1]
+            self.stats["memory_hits"] += len(found)
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing and self.coll is not None:
+            try:
+                rows = list(self.coll.find({"_id": {"$in": missing}}, {"vector": 1}))
+                for r in rows:
+                    found[r["_id"]] = r["vector"]
+                if rows:
+                    self._remember([(r["_id"], r["vector"]) for r in rows])
+                    self.coll.update_many(
+                        {"_id": {"$in": [r["_id"] for r in rows]}},
+                        {"$set": {"last_used_at": datetime.utcnow()}},
+                    )
+                with self._lock:
+                    self.stats["store_hits"] += len(rows)
+            except PyMongoError:
+                pass
+        with self._lock:
+            self.stats["misses"] += len([k for k in dict.fromkeys(keys) if k not in found])
+        return found
 
-
-def _choose_embeddings():
-    """Pick an embeddings function: returns callable(str)->List[float] or None."""
-    provider = os.getenv("EMBEDDING_PROVIDER", "none").lower()
-    if provider == "openai":
+    def put_many(self, model: str, items: List[Tuple[str, List[float]]]):
+        if not self.enabled or not items:
+            return
+        self._remember(items)
+        with self._lock:
+            self.stats["writes"] += len(items)
+        if self.coll is None:
+            return
+        now = datetime.utcnow()
         try:
-            from langchain_openai import OpenAIEmbeddings  # type: ignore
+            self.coll.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": k},
+                        {"$set": {"model": model, "hash": k.rsplit(":", 1)[-1], "vector": v, "last_used_at": now}},
+                        upsert=True,
+                    )
+                    for k, v in items
+                ],
+                ordered=False,
+            )
+        except PyMongoError:
+            pass
 
-            model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
-            emb = OpenAIEmbeddings(model=model)
-            return lambda x: emb.embed_query(x)
-        except Exception:
-            return None
-    elif provider == "huggingface":
-        try:
-            from langchain_huggingface import HuggingFaceEmbeddings  # type: ignore
+    def _remember(self, items: List[Tuple[str, List[float]]]):
+        if not self.max_items:
+            return
+        now = time.time()
+        with self._lock:
+            for k, v in items:
+                self._mem[k] = (now, v)
+                self._mem.move_to_end(k)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.stats)
+            out["memory_items"] = len(self._mem)
+        lookups = out["memory_hits"] + out["store_hits"] + out["misses"]
+        out["backend"] = self.backend
+        out["hit_rate"] = round((out["memory_hits"] + out["store_hits"]) / lookups, 4) if lookups else None
+        return out
 
-            model = os.getenv("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
-            emb = HuggingFaceEmbeddings(model_name=model)
-            return lambda x: emb.embed_query(x)
-        except Exception:
+
+class EmbeddingService:
+    """Process-wide embeddings provider, loaded once and shared by all requests."""
+
+    def __init__(self, cache: Optional[EmbeddingCache] = None):
+        self.provider = os.getenv("EMBEDDING_PROVIDER", "none").lower()
+        self.batch_size = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
+        self.model_name: Optional[str] = None
+        self.cache = cache
+        self._emb = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return self._emb
+        with self._lock:
+            if self._loaded:
+                return self._emb
+            emb = None
+            if self.provider == "openai":
+                try:
+                    from langchain_openai import OpenAIEmbeddings  # type: ignore
+
+                    self.model_name = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+                    emb = OpenAIEmbeddings(model=self.model_name, chunk_size=self.batch_size)
+                except Exception:
+                    emb = None
+            elif self.provider == "huggingface":
+                try:
+                    from langchain_huggingface import HuggingFaceEmbeddings  # type: ignore
+
+                    self.model_name = os.getenv("HF_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+                    emb = HuggingFaceEmbeddings(model_name=self.model_name, encode_kwargs={"batch_size": self.batch_size})
+                except Exception:
+                    emb = None
+            self._emb = emb
+            self._loaded = True
+            return emb
+
+    @property
+    def enabled(self) -> bool:
+        return self._load() is not None
+
+    @property
+    def cache_model(self) -> str:
+        return f"{self.provider}/{self.model_name}"
+
+    def embed_query(self, text: str) -> Optional[List[float]]:
+        emb = self._load()
+        if emb is None:
             return None
-    else:
+        if self.cache is None:
+            return emb.embed_query(text)
+        key = EmbeddingCache.key(self.cache_model, text)
+        hit = self.cache.get_many([key]).get(key)
+        if hit is not None:
+            return hit
+        vec = emb.embed_query(text)
+        if vec:
+            self.cache.put_many(self.cache_model, [(key, vec)])
+        return vec
+
+    def embed_documents(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Embed many texts in batches of EMBEDDING_BATCH_SIZE; failed items come back as None."""
+        emb = self._load()
+        if emb is None or not texts:
+            return [None for _ in texts]
+        out: List[Optional[List[float]]] = [None for _ in texts]
+        keys: List[str] = []
+        cached: Dict[str, List[float]] = {}
+        if self.cache is not None:
+            keys = [EmbeddingCache.key(self.cache_model, t) for t in texts]
+            cached = self.cache.get_many(keys)
+        todo: List[int] = []
+        for i in range(len(texts)):
+            if keys and keys[i] in cached:
+                out[i] = cached[keys[i]]
+            else:
+                todo.append(i)
+        fresh: List[Tuple[str, List[float]]] = []
+        for start in range(0, len(todo), self.batch_size):
+            idxs = todo[start:start + self.batch_size]
+            batch = [texts[i] for i in idxs]
+            try:
+                vecs: List[Optional[List[float]]] = list(emb.embed_documents(batch))
+            except Exception:
+                # retry item by item so one bad chunk doesn't drop the whole batch
+                vecs = []
+                for t in batch:
+                    try:
+                        vecs.append(emb.embed_query(t))
+                    except Exception:
+                        vecs.append(None)
+            for i, vec in zip(idxs, vecs):
+                out[i] = vec
+                if vec and keys:
+                    fresh.append((keys[i], vec))
+        if fresh and self.cache is not None:
+            self.cache.put_many(self.cache_model, fresh)
+        return out
+
+
+embedding_cache = EmbeddingCache(database)
+embedding_service = EmbeddingService(cache=embedding_cache if embedding_cache.enabled else None)
+
+
+def _choose_embeddings():
+    """Pick an embeddings function: returns callable(str)->List[float] or None."""
+    if not embedding_service.enabled:
         return None
+    return embedding_service.embed_query
 
 
 def _chunk_text(text: str, size: int, overlap: int) -> List[str]:
@@ -1010,123 +2187,65 @@ def _categorize_openai(text: str) -> Optional[Dict[str, Any]]:
     return None
 
 
-def _run_pipeline(raw_text: str, meta: Dict[str, Any], chunk_size: int, chunk_overlap: int) -> Dict[str, Any]:
-    """Run via LangGraph if available, else sequential fallback."""
-    if HAVE_LANGGRAPH:
-        # Simple state dict graph
-        State = dict
-        graph = StateGraph(State)
-
-        def node_clean(state: State) -> State:
-            cleaned = (state.get("text") or "").strip()
-            return {**state, "cleaned": cleaned}
-
-        def node_chunk(state: State) -> State:
-            cleaned = state.get("cleaned") or ""
-            chs = _chunk_text(cleaned, chunk_size, chunk_overlap)
-            return {**state, "chunks": chs}
-
-        def node_embed(state: State) -> State:
-            chs: List[str] = state.get("chunks") or []
-            embed_fn = _choose_embeddings()
-            vectors: List[Optional[List[float]]] = []
-            if embed_fn:
-                for ch in chs:
-                    try:
-                        vectors.append(embed_fn(ch))
-                    except Exception:
-                        vectors.append(None)
-            else:
-                vectors = [None for _ in chs]
-            return {**state, "vectors": vectors}
-
-        def node_summarize(state: State) -> State:
-            cleaned = state.get("cleaned") or ""
-            sm = summarize_text_naive(cleaned)
-            return {**state, "summary": sm}
-
-        def node_categorize(state: State) -> State:
-            cleaned = state.get("cleaned") or ""
-            tp = None
-            prov = os.getenv("CATEGORIZER_PROVIDER", "heuristic").lower()
-            if prov == "openai":
-                tp = _categorize_openai(cleaned)
-            if not tp:
-                tp = _categorize_heuristic(cleaned)
-            return {**state, "topics": tp}
-
-        def node_persist(state: State) -> State:
-            cleaned = state.get("cleaned") or ""
-            chs: List[str] = state.get("chunks") or []
-            vecs: List[Optional[List[float]]] = state.get("vectors") or []
-            chunk_models: List[DocumentIngestChunk] = []
-            for i, ch in enumerate(chs):
-                v = vecs[i] if i < len(vecs) else None
-                chunk_models.append(DocumentIngestChunk(idx=i, text=ch, embedding=v))
-            summary = state.get("summary") or {}
-            topics = state.get("topics") or {}
-            di = DocumentIngest(
-                source_url=meta.get("source_url") or meta.get("canonical_url") or "",
-                canonical_url=meta.get("canonical_url") or meta.get("source_url") or "",
-                title=meta.get("title"),
-                content_type=meta.get("content_type") or "web",
-                lang=meta.get("lang"),
-                raw_html=None,
-                raw_markdown=None,
-                cleaned_text=cleaned,
-                tokens=None,
-                summary=DocSummary(**summary),
-                topics=topics,
-                entities=None,
-                tags=["agent"],
-                embedding=None,
-                captured_at=datetime.utcnow(),
-                published_at=None,
-                processed_at=datetime.utcnow(),
-                metadata=meta,
-                chunks=chunk_models,
-            )
-            out = create_document_and_chunks(database, di)
-            return {**state, "result": out}
-
-        graph.add_node("clean", node_clean)
-        graph.add_node("chunk", node_chunk)
-        graph.add_node("embed", node_embed)
-        graph.add_node("summarize", node_summarize)
-        graph.add_node("categorize", node_categorize)
-        graph.add_node("persist", node_persist)
-        graph.add_edge(START, "clean")
-        graph.add_edge("clean", "chunk")
-        graph.add_edge("chunk", "embed")
-        graph.add_edge("embed", "summarize")
-        graph.add_edge("summarize", "categorize")
-        graph.add_edge("categorize", "persist")
-        graph.add_edge("persist", END)
-        compiled = graph.compile()
-        init_state: State = {"text": raw_text}
-        final = compiled.invoke(init_state)
-        return final.get("result") or {}
-
-    # Sequential fallback
-    cleaned = (raw_text or "").strip()
-    chunks = _chunk_text(cleaned, chunk_size, chunk_overlap)
-    embed_fn = _choose_embeddings()
-    chunk_models: List[DocumentIngestChunk] = []
-    for i, ch in enumerate(chunks):
-        vec = None
-        if embed_fn:
-            try:
-                vec = embed_fn(ch)
-            except Exception:
-                vec = None
-        chunk_models.append(DocumentIngestChunk(idx=i, text=ch, tokens=None, section=None, char_start=None, char_end=None, embedding=vec))
-    summary = summarize_text_naive(cleaned)
-    topics = None
+class IngestState(TypedDict, total=False):
+    text: str
+    meta: Dict[str, Any]
+    chunk_size: int
+    chunk_overlap: int
+    run_id: Optional[str]
+    cleaned: str
+    chunks: List[str]
+    vectors: List[Optional[List[float]]]
+    summary: Dict[str, Any]
+    topics: Dict[str, Any]
+    result: Dict[str, Any]
+
+
+def _node_clean(state: IngestState) -> IngestState:
+    cleaned = (state.get("text") or "").strip()
+    return {"cleaned": cleaned}
+
+
+def _node_chunk(state: IngestState) -> IngestState:
+    cleaned = state.get("cleaned") or ""
+    chs = _chunk_text(cleaned, int(state.get("chunk_size") or 1000), int(state.get("chunk_overlap") or 150))
+    return {"chunks": chs}
+
+
+def _node_embed(state: IngestState) -> IngestState:
+    chs: List[str] = state.get("chunks") or []
+    vectors = embedding_service.embed_documents(chs)
+    return {"vectors": vectors}
+
+
+def _node_summarize(state: IngestState) -> IngestState:
+    cleaned = state.get("cleaned") or ""
+    sm = summarize_text_naive(cleaned)
+    return {"summary": sm}
+
+
+def _node_categorize(state: IngestState) -> IngestState:
+    cleaned = state.get("cleaned") or ""
+    tp = None
     prov = os.getenv("CATEGORIZER_PROVIDER", "heuristic").lower()
     if prov == "openai":
-        topics = _categorize_openai(cleaned)
-    if not topics:
-        topics = _categorize_heuristic(cleaned)
+        tp = _categorize_openai(cleaned)
+    if not tp:
+        tp = _categorize_heuristic(cleaned)
+    return {"topics": tp}
+
+
+def _node_persist(state: IngestState) -> IngestState:
+    meta: Dict[str, Any] = state.get("meta") or {}
+    cleaned = state.get("cleaned") or ""
+    chs: List[str] = state.get("chunks") or []
+    vecs: List[Optional[List[float]]] = state.get("vectors") or []
+    chunk_models: List[DocumentIngestChunk] = []
+    for i, ch in enumerate(chs):
+        v = vecs[i] if i < len(vecs) else None
+        chunk_models.append(DocumentIngestChunk(idx=i, text=ch, embedding=v))
+    summary = state.get("summary") or {}
+    topics = state.get("topics") or {}
     di = DocumentIngest(
         source_url=meta.get("source_url") or meta.get("canonical_url") or "",
         canonical_url=meta.get("canonical_url") or meta.get("source_url") or "",
@@ -1147,12 +2266,297 @@ def _run_pipeline(raw_text: str, meta: Dict[str, Any], chunk_size: int, chunk_ov
         processed_at=datetime.utcnow(),
         metadata=meta,
         chunks=chunk_models,
+        agent_run_id=state.get("run_id"),
     )
-    return create_document_and_chunks(database, di)
+    out = create_document_and_chunks(database, di)
+    return {"result": out}
+
+
+def _record_stage(run_id: Optional[str], name: str, **fields: Any) -> None:
+    """Best-effort progress write to agent_runs.stages.<name>."""
+    oid = _maybe_object_id(run_id)
+    if not oid:
+        return
+    try:
+        database.agent_runs.update_one(
+            {"_id": oid},
+            {"$set": {f"stages.{name}.{k}": v for k, v in fields.items()}},
+        )
+    except PyMongoError:
+        pass
+
+
+@contextmanager
+def _run_stage(run_id: Optional[str], name: str):
+    """Time a pipeline stage and record its status/duration on the agent run."""
+    if not run_id:
+        yield
+        return
+    t0 = time.perf_counter()
+    _record_stage(run_id, name, status="running", started_at=datetime.utcnow())
+    try:
+        yield
+    except Exception as e:
+        _record_stage(run_id, name, status="failed", error=str(e), finished_at=datetime.utcnow(),
+                      duration_ms=round((time.perf_counter() - t0) * 1000, 1))
+        raise
+    _record_stage(run_id, name, status="completed", finished_at=datetime.utcnow(),
+                  duration_ms=round((time.perf_counter() - t0) * 1000, 1))
+
+
+def _tracked_stage(name: str, fn):
+    def run(state: IngestState) -> IngestState:
+        with _run_stage(state.get("run_id"), name):
+            return fn(state)
+    run.__name__ = f"stage_{name}"
+    return run
+
+
+# clean -> chunk, then embed / summarize / categorize fan out and join before persist
+INGEST_STAGES = [
+    ("clean", _tracked_stage("clean", _node_clean)),
+    ("chunk", _tracked_stage("chunk", _node_chunk)),
+    ("embed", _tracked_stage("embed", _node_embed)),
+    ("summarize", _tracked_stage("summarize", _node_summarize)),
+    ("categorize", _tracked_stage("categorize", _node_categorize)),
+    ("persist", _tracked_stage("persist", _node_persist)),
+]
+INGEST_PARALLEL_STAGES = ("embed", "summarize", "categorize")
+
+_ingest_stage_pool = ThreadPoolExecutor(
+    max_workers=max(len(INGEST_PARALLEL_STAGES), int(os.getenv("INGEST_STAGE_WORKERS", "8"))),
+    thread_name_prefix="ingest-stage",
+)
+
+
+def _build_ingest_graph():
+    """Build and compile the ingest StateGraph; per-request inputs travel in the state."""
+    graph = StateGraph(IngestState)
+    for name, fn in INGEST_STAGES:
+        graph.add_node(name, fn)
+    graph.add_edge(START, "clean")
+    graph.add_edge("clean", "chunk")
+    for name in INGEST_PARALLEL_STAGES:
+        graph.add_edge("chunk", name)
+    graph.add_edge(list(INGEST_PARALLEL_STAGES), "persist")
+    graph.add_edge("persist", END)
+    return graph.compile()
+
+
+INGEST_GRAPH = None
+if HAVE_LANGGRAPH:
+    try:
+        INGEST_GRAPH = _build_ingest_graph()
+    except Exception:
+        INGEST_GRAPH = None
+
+
+def _run_pipeline_sequential(state: IngestState) -> IngestState:
+    """Fallback without LangGraph: same stages, with the middle three run concurrently."""
+    stages = dict(INGEST_STAGES)
+    state = {**state, **stages["clean"](state)}
+    state = {**state, **stages["chunk"](state)}
+    futures = [_ingest_stage_pool.submit(stages[name], state) for name in INGEST_PARALLEL_STAGES]
+    for fut in futures:
+        state = {**state, **fut.result()}
+    state = {**state, **stages["persist"](state)}
+    return state
+
+
+def _run_pipeline(
+    raw_text: str,
+    meta: Dict[str, Any],
+    chunk_size: int,
+    chunk_overlap: int,
+    run_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Run via the compiled LangGraph if available, else sequential fallback."""
+    init_state: IngestState = {
+        "text": raw_text,
+        "meta": meta,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "run_id": run_id,
+    }
+    if INGEST_GRAPH is not None:
+        final = INGEST_GRAPH.invoke(init_state)
+    else:
+        final = _run_pipeline_sequential(init_state)
+    return final.get("result") or {}
+
+
+# -----------------------------
+# Background agent runs
+# -----------------------------
+class AgentJobRunner:
+    """Bounded worker pool for ingest jobs; each job is tracked in `agent_runs`.
+
+    Every queued/running run carries the `owner` process and a `lease_until`
+    that the owner renews in the background. A run whose lease has lapsed was
+    left by a dead process: the first worker to claim it reschedules it if its
+    kind was registered with `resumable`, otherwise marks it failed.
+    """
+
+    ACTIVE = ["queued", "running"]
+
+    def __init__(self, db):
+        self.db = db
+        self.max_workers = max(1, int(os.getenv("AGENT_JOB_WORKERS", "4")))
+        self.max_pending = max(1, int(os.getenv("AGENT_JOB_MAX_PENDING", "100")))
+        self.lease = max(10.0, float(os.getenv("AGENT_JOB_LEASE_SECONDS", "60")))
+        self.owner = f"{os.getpid()}-{ObjectId()}"
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-job")
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._resumable: Dict[str, Any] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, params: Dict[str, Any], fn) -> str:
+        """Persist a queued run and schedule fn(run_id); returns the run id immediately."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(status_code=429, detail="Too many queued agent runs; retry later")
+            self._pending += 1
+        try:
+            now = datetime.utcnow()
+            res = self.db.agent_runs.insert_one({
+                "kind": kind,
+                "status": "queued",
+                "params": params,
+                "stages": {},
+                "owner": self.owner,
+                "lease_until": now + timedelta(seconds=self.lease),
+                "queued_at": now,
+                "started_at": None,
+                "finished_at": None,
+            })
+            run_id = str(res.inserted_id)
+            self._pool.submit(self._execute, run_id, fn)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return run_id
+
+    def _execute(self, run_id: str, fn):
+        oid = ObjectId(run_id)
+        t0 = time.perf_counter()
+        try:
+            self.db.agent_runs.update_one({"_id": oid}, {"$set": {"status": "running", "started_at": datetime.utcnow()}})
+            result = fn(run_id)
+            update = {"status": "completed", "result": result}
+        except HTTPException as e:
+            update = {"status": "failed", "error": str(e.detail)}
+        except Exception as e:
+            update = {"status": "failed", "error": str(e)}
+        finally:
+            with self._lock:
+                self._pending -= 1
+        update["finished_at"] = datetime.utcnow()
+        update["duration_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        try:
+            self.db.agent_runs.update_one({"_id": oid}, {"$set": update})
+        except PyMongoError:
+            pass
+
+    def resumable(self, kind: str, make_fn) -> None:
+        """Let orphaned runs of `kind` be rescheduled.
+
+        make_fn(params) returns the fn(run_id) to run; only use it for jobs that
+        are safe to repeat.
+        """
+        self._resumable[kind] = make_fn
+
+    def recover(self) -> List[str]:
+        """Claim runs whose owner stopped renewing its lease; returns the rescheduled ids."""
+        now = datetime.utcnow()
+        orphan = {"status": {"$in": self.ACTIVE}, "$or": [{"owner": None}, {"lease_until": {"$lt": now}}]}
+        ids = []
+        for doc in list(self.db.agent_runs.find(orphan, {"kind": 1})):
+            filt = {**orphan, "_id": doc["_id"]}
+            make_fn = self._resumable.get(doc.get("kind"))
+            if make_fn is None:
+                # not safe to repeat (e.g. ingest): report it instead of leaving it queued forever
+                self.db.agent_runs.update_one(filt, {"$set": {
+                    "status": "failed", "error": "interrupted by restart", "owner": self.owner, "finished_at": now,
+                }})
+                continue
+            run = self.db.agent_runs.find_one_and_update(
+                filt,
+                {"$set": {"owner": self.owner, "lease_until": now + timedelta(seconds=self.lease)}},
+                projection={"params": 1},
+            )
+            if run is None:
+                # another worker claimed it first
+                continue
+            run_id = str(run["_id"])
+            with self._lock:
+                self._pending += 1
+            self._pool.submit(self._execute, run_id, make_fn(run.get("params") or {}))
+            ids.append(run_id)
+        return ids
+
+    def _renew(self) -> None:
+        self.db.agent_runs.update_many(
+            {"owner": self.owner, "status": {"$in": self.ACTIVE}},
+            {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease)}},
+        )
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="agent-jobs", daemon=True)
+            self._thread.start()
+
+    def run(self):
+        """Background loop: keep this process's leases fresh and pick up orphaned runs."""
+        while True:
+            try:
+                self._renew()
+                self.recover()
+            except PyMongoError:
+                pass
+            time.sleep(self.lease / 3)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+        return {"workers": self.max_workers, "pending": pending, "max_pending": self.max_pending}
+
+
+agent_jobs = AgentJobRunner(database)
+
+
+def _serialize_run(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(doc.get("_id")),
+        "kind": doc.get("kind"),
+        "status": doc.get("status"),
+        "params": doc.get("params") or {},
+        "stages": doc.get("stages") or {},
+        "progress": doc.get("progress"),
+        "queued_at": doc.get("queued_at"),
+        "started_at": doc.get("started_at"),
+        "finished_at": doc.get("finished_at"),
+        "duration_ms": doc.get("duration_ms"),
+        "result": doc.get("result"),
+        "error": doc.get("error"),
+    }
+
+
+def _url_ingest_meta(url: str) -> Dict[str, Any]:
+    return {"ui": "agent", "source_url": url, "canonical_url": url, "title": None, "content_type": "web"}
+
+
+def _ingest_url_job(url: str, chunk_size: int, chunk_overlap: int, run_id: Optional[str] = None) -> Dict[str, Any]:
+    with _run_stage(run_id, "scrape"):
+        text = (_scrape_markdown(url) or "").strip()
+    if not text:
+        raise HTTPException(status_code=422, detail="Scrape returned no content")
+    return _run_pipeline(text, _url_ingest_meta(url), chunk_size, chunk_overlap, run_id=run_id)
 
 
 @app.post("/agent/ingest-text")
-def agent_ingest_text(body: AgentIngestText) -> Dict[str, Any]:
+async def agent_ingest_text(body: AgentIngestText, response: Response) -> Dict[str, Any]:
     text = (body.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="text required")
@@ -1164,15 +2568,1250 @@ def agent_ingest_text(body: AgentIngestText) -> Dict[str, Any]:
         "content_type": body.content_type or "web",
         "lang": body.lang or None,
     }
+    size, overlap = body.chunk_size or 1000, body.chunk_overlap or 150
     try:
-        out = _run_pipeline(text, meta, body.chunk_size or 1000, body.chunk_overlap or 150)
+        if body.background:
+            params = {"source_url": meta["source_url"], "title": meta["title"], "chars": len(text)}
+            run_id = await run_in_threadpool(
+                agent_jobs.submit, "ingest-text", params,
+                lambda rid: _run_pipeline(text, meta, size, overlap, run_id=rid),
+            )
+            response.status_code = 202
+            return {"run_id": run_id, "status": "queued", "status_url": f"/agent/runs/{run_id}"}
+        # chunking/embedding/persist are CPU work and sync SDKs; keep them off the event loop
+        out = await run_in_threadpool(_run_pipeline, text, meta, size, overlap)
         return out
+    except HTTPException:
+        raise
     except PyMongoError as e:
         raise HTTPException(status_code=500, detail=f"DB error: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# -----------------------------
+# Background crawls
+# -----------------------------
+class CrawlManager:
+    """Polls Firecrawl crawls from the event loop and ingests pages as they arrive.
+
+    Each crawl is a `crawls` doc keyed by the Firecrawl id. `cursor` counts the
+    pages consumed so far and is sent back as `skip`, so only new pages are
+    fetched (following Firecrawl's `next` links) and a restarted process
+    resumes where it left off. Pages go through `_run_pipeline`; pages whose
+    content hash is already stored are counted as duplicates and skipped.
+    """
+
+    COUNTERS = ("pages_fetched", "pages_stored", "pages_duplicate", "pages_skipped", "pages_failed")
+
+    def __init__(self):
+        self.min_interval = float(os.getenv("CRAWL_POLL_MIN_SECONDS", "1"))
+        self.max_interval = float(os.getenv("CRAWL_POLL_MAX_SECONDS", "15"))
+        self.max_seconds = float(os.getenv("CRAWL_MAX_SECONDS", "3600"))
+        self.max_errors = max(1, int(os.getenv("CRAWL_MAX_ERRORS", "10")))
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, crawl_id: str) -> None:
+        task = self._tasks.get(crawl_id)
+        if task is not None and not task.done():
+            return
+        task = asyncio.create_task(self._run(crawl_id))
+        self._tasks[crawl_id] = task
+        task.add_done_callback(lambda _t, cid=crawl_id: self._tasks.pop(cid, None))
+
+    async def resume(self) -> None:
+        """Pick up crawls left queued/running by a previous process."""
+        try:
+            async for d in _adb().crawls.find({"status": {"$in": ["queued", "running"]}}, {"_id": 1}):
+                self.start(d["_id"])
+        except PyMongoError:
+            pass
+
+    async def cancel(self, crawl_id: str) -> None:
+        task = self._tasks.pop(crawl_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def shutdown(self) -> None:
+        tasks = list(self._tasks.values())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": len(self._tasks)}
+
+    async def _run(self, crawl_id: str) -> None:
+        db = _adb()
+        crawl = await db.crawls.find_one({"_id": crawl_id})
+        if not crawl or crawl.get("status") not in {"queued", "running"}:
+            return
+        await db.crawls.update_one({"_id": crawl_id}, {"$set": {"status": "running", "updated_at": datetime.utcnow()}})
+        cursor = int(crawl.get("cursor") or 0)
+        deadline = time.monotonic() + self.max_seconds
+        interval = self.min_interval
+        errors = 0
+        while True:
+            try:
+                fc, new_cursor = await self._drain(crawl, cursor)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                errors += 1
+                if errors >= self.max_errors:
+                    await self._finish(crawl_id, "failed", error=f"Firecrawl error: {e}")
+                    return
+                interval = min(self.max_interval, interval * 2)
+                await asyncio.sleep(interval)
+                continue
+            got_pages = new_cursor > cursor
+            cursor = new_cursor
+            status = fc.get("status")
+            if status == "completed" and not got_pages:
+                await self._finish(crawl_id, "completed")
+                return
+            if status in {"failed", "cancelled"}:
+                await self._finish(crawl_id, "failed", error=f"Firecrawl status: {status}")
+                return
+            if time.monotonic() > deadline:
+                await self._finish(crawl_id, "failed", error="Crawl timed out")
+                return
+            # back off while Firecrawl has nothing new; poll again promptly after progress
+            interval = self.min_interval if got_pages else min(self.max_interval, interval * 1.5)
+            if status != "completed":
+                await asyncio.sleep(interval)
+
+    async def _drain(self, crawl: Dict[str, Any], cursor: int) -> Tuple[Dict[str, Any], int]:
+        """Fetch and store every page past `cursor`; returns (last status without data, new cursor)."""
+        firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+        url: Optional[str] = f"{firecrawl}/crawl/{crawl['_id']}"
+        params: Optional[Dict[str, Any]] = {"skip": cursor}
+        fc: Dict[str, Any] = {}
+        first = True
+        while url:
+            resp = await _http().get(url, params=params, timeout=30)
+            resp.raise_for_status()
+            fc = resp.json() or {}
+            pages: List[Dict[str, Any]] = fc.pop("data", None) or []
+            completed = fc.get("completed")
+            if first and cursor and isinstance(completed, int) and len(pages) > max(0, completed - cursor):
+                # server ignored `skip` and sent everything again
+                pages = pages[cursor:]
+            first = False
+            if pages:
+                counts = dict.fromkeys(self.COUNTERS, 0)
+                counts["pages_fetched"] = len(pages)
+                for page in pages:
+                    counts[await self._store_page(crawl, page)] += 1
+                cursor += len(pages)
+                await _adb().crawls.update_one({"_id": crawl["_id"]}, {
+                    "$inc": counts,
+                    "$set": {"cursor": cursor, "updated_at": datetime.utcnow()},
+                })
+            nxt = fc.get("next")
+            url = (nxt if nxt.startswith("http") else f"{firecrawl}/{nxt.lstrip('/')}") if isinstance(nxt, str) and nxt else None
+            params = None
+        await _adb().crawls.update_one({"_id": crawl["_id"]}, {"$set": {
+            "firecrawl": {k: fc.get(k) for k in ("status", "total", "completed")},
+        }})
+        return fc, cursor
+
+    async def _store_page(self, crawl: Dict[str, Any], page: Dict[str, Any]) -> str:
+        """Ingest one crawled page; returns the counter it belongs to."""
+        text = (page.get("markdown") or "").strip()
+        if not text and page.get("html"):
+            text = _html_to_md_basic(page["html"]).strip()
+        if not text:
+            return "pages_skipped"
+        pmeta = page.get("metadata") or {}
+        url = page.get("url") or pmeta.get("sourceURL") or pmeta.get("url") or crawl.get("url")
+        try:
+            # same hash as _build_document; skip the pipeline (and embeddings) for known content
+            if await _adb().documents.find_one({"hash": _sha256_hex(text)}, {"_id": 1}):
+                return "pages_duplicate"
+            meta = _url_ingest_meta(url)
+            meta.update({"ui": "crawl", "title": pmeta.get("title"), "crawl_id": crawl["_id"]})
+            params = crawl.get("params") or {}
+            out = await run_in_threadpool(
+                _run_pipeline, text, meta, params.get("chunk_size") or 1000, params.get("chunk_overlap") or 150,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return "pages_failed"
+        return "pages_duplicate" if out.get("duplicate") else "pages_stored"
+
+    async def _finish(self, crawl_id: str, status: str, error: Optional[str] = None) -> None:
+        update: Dict[str, Any] = {"status": status, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+        if error:
+            update["error"] = error
+        try:
+            await _adb().crawls.update_one({"_id": crawl_id, "status": {"$ne": "cancelled"}}, {"$set": update})
+        except PyMongoError:
+            pass
+
+
+crawl_manager = CrawlManager()
+
+
+class CrawlStartIn(BaseModel):
+    url: str
+    maxDepth: Optional[int] = 1
+    limit: Optional[int] = 10
+    chunk_size: Optional[int] = 1000
+    chunk_overlap: Optional[int] = 150
+
+
+def _serialize_crawl(doc: Dict[str, Any]) -> Dict[str, Any]:
+    out = {
+        "crawl_id": doc.get("_id"),
+        "url": doc.get("url"),
+        "status": doc.get("status"),
+        "params": doc.get("params") or {},
+        "firecrawl": doc.get("firecrawl") or {},
+        "queued_at": doc.get("queued_at"),
+        "updated_at": doc.get("updated_at"),
+        "finished_at": doc.get("finished_at"),
+        "error": doc.get("error"),
+    }
+    for k in CrawlManager.COUNTERS:
+        out[k] = doc.get(k) or 0
+    return out
+
+
+@app.post("/crawls", status_code=202)
+async def start_crawl(body: CrawlStartIn) -> Dict[str, Any]:
+    target = (body.url or "").strip()
+    if not target:
+        raise HTTPException(status_code=400, detail="url is required")
+    params = {
+        "maxDepth": int(body.maxDepth or 1),
+        "limit": int(body.limit or 10),
+        "chunk_size": body.chunk_size or 1000,
+        "chunk_overlap": body.chunk_overlap or 150,
+    }
+    try:
+        crawl_id = await _firecrawl_start_crawl(target, params["maxDepth"], params["limit"])
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
+    _doc, created = await _track_crawl(crawl_id, target, params)
+    if not created:
+        raise HTTPException(status_code=409, detail="Crawl already tracked")
+    return {"crawl_id": crawl_id, "status": "queued", "status_url": f"/crawls/{crawl_id}"}
+
+
+async def _track_crawl(crawl_id: str, url: Optional[str], params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """Record a Firecrawl crawl in `crawls` and make sure it is being polled.
+
+    Returns (doc, created); an already tracked crawl is returned as stored and
+    picked up again if it is still active.
+    """
+    now = datetime.utcnow()
+    doc = {"_id": crawl_id, "url": url, "status": "queued", "params": params, "cursor": 0,
+           "queued_at": now, "updated_at": now, "finished_at": None}
+    doc.update(dict.fromkeys(CrawlManager.COUNTERS, 0))
+    created = True
+    try:
+        await _adb().crawls.insert_one(doc)
+    except DuplicateKeyError:
+        created = False
+        doc = await _adb().crawls.find_one({"_id": crawl_id}) or doc
+    if doc.get("status") in {"queued", "running"}:
+        crawl_manager.start(crawl_id)
+    return doc, created
+
+
+# Legacy crawl routes: thin wrappers over CrawlManager, so pages go through the
+# document/chunk pipeline with hash dedup instead of being copied into `notes`.
+async def _legacy_crawl_start(payload: Dict[str, Any]) -> Dict[str, Any]:
+    target = (payload.get("url") or "").strip()
+    if not target:
+        raise HTTPException(status_code=400, detail="url is required")
+    params = {
+        "maxDepth": int(payload.get("maxDepth", 1)),
+        "limit": int(payload.get("limit", 10)),
+        "chunk_size": 1000,
+        "chunk_overlap": 150,
+    }
+    try:
+        crawl_id = await _firecrawl_start_crawl(target, params["maxDepth"], params["limit"])
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
+    doc, _created = await _track_crawl(crawl_id, target, params)
+    return {**_serialize_crawl(doc), "status_url": f"/crawls/{crawl_id}"}
+
+
+@app.post("/crawl-website", status_code=202)
+async def crawl_website(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Start a crawl; pages are ingested as they arrive (poll `status_url`)."""
+    return await _legacy_crawl_start(payload)
+
+
+@app.post("/crawl-start", status_code=202)
+async def crawl_start(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _legacy_crawl_start(payload)
+
+
+@app.get("/crawl-status/{crawl_id}")
+async def crawl_status(crawl_id: str) -> Dict[str, Any]:
+    doc = await _adb().crawls.find_one({"_id": crawl_id})
+    if doc:
+        return _serialize_crawl(doc)
+    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+    try:
+        resp = await _http().get(f"{firecrawl}/crawl/{crawl_id}", timeout=30)
+        resp.raise_for_status()
+        fc = resp.json() or {}
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
+    # untracked crawl: report Firecrawl's status without its page payload
+    fc.pop("data", None)
+    return fc
+
+
+@app.post("/crawl-save/{crawl_id}", status_code=202)
+async def crawl_save(crawl_id: str) -> Dict[str, Any]:
+    """Adopt a crawl started elsewhere; its pages are ingested page by page from `cursor`."""
+    doc, _created = await _track_crawl(crawl_id, None, {"chunk_size": 1000, "chunk_overlap": 150})
+    return {**_serialize_crawl(doc), "status_url": f"/crawls/{crawl_id}"}
+
+
+@app.get("/crawls")
+async def list_crawls(
+    status: Optional[str] = Query(default=None, description="queued | running | completed | failed | cancelled"),
+    limit: int = Query(default=20, ge=1, le=200),
+) -> Dict[str, Any]:
+    filt: Dict[str, Any] = {"status": status} if status else {}
+    cursor = _adb().crawls.find(filt).sort("queued_at", -1).limit(int(limit))
+    items = [_serialize_crawl(d) async for d in cursor]
+    return {"items": items, "total": len(items)}
+
+
+@app.get("/crawls/{crawl_id}")
+async def get_crawl(crawl_id: str) -> Dict[str, Any]:
+    doc = await _adb().crawls.find_one({"_id": crawl_id})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    return _serialize_crawl(doc)
+
+
+@app.post("/crawls/{crawl_id}/cancel")
+async def cancel_crawl(crawl_id: str) -> Dict[str, Any]:
+    res = await _adb().crawls.update_one(
+        {"_id": crawl_id, "status": {"$in": ["queued", "running"]}},
+        {"$set": {"status": "cancelled", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+    )
+    if not res.matched_count:
+        doc = await _adb().crawls.find_one({"_id": crawl_id}, {"status": 1})
+        if not doc:
+            raise HTTPException(status_code=404, detail="Crawl not found")
+        return _serialize_crawl(doc)
+    await crawl_manager.cancel(crawl_id)
+    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+    try:
+        await _http().delete(f"{firecrawl}/crawl/{crawl_id}", timeout=10)
+    except httpx.HTTPError:
+        pass
+    return _serialize_crawl(await _adb().crawls.find_one({"_id": crawl_id}))
+
+
+# -----------------------------
+# Lexical index (BM25 over doc_chunks)
+# -----------------------------
+class LexicalIndex:
+    """In-process BM25 inverted index over `doc_chunks.text`.
+
+    Tokens come from `_tokenize` (same rules and STOPWORDS as `_top_keywords`).
+    Each term maps to two parallel `array('I')` postings: chunk ordinals and
+    term frequencies. Removed chunks are tombstoned and dropped on the next
+    snapshot. The index is pickled to LEXICAL_INDEX_PATH and, after a restart,
+    caught up from Mongo by `created_at`. A background loop also picks up
+    chunks written by other workers every LEXICAL_SYNC_SECONDS.
+    """
+
+    SNAPSHOT_VERSION = 1
+    SYNC_OVERLAP = timedelta(minutes=5)
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self):
+        self.chunk_ids: List[str] = []
+        self.doc_ids: List[str] = []
+        self.days: List[Optional[str]] = []
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.ordinal: Dict[str, int] = {}
+        self.by_doc: Dict[str, List[int]] = {}
+        self.live = 0
+        self.total_len = 0
+        self.synced_at: Optional[datetime] = None
+        self.dirty = 0
+
+    # ---- writes ----
+    def add_chunks(self, chunks: List[Dict[str, Any]]):
+        """Index stored chunk docs (need _id, doc_id, text); already-indexed ids are skipped."""
+        with self._lock:
+            for ch in chunks:
+                cid = ch.get("_id")
+                if cid is None or str(cid) in self.ordinal:
+                    continue
+                tf: Dict[str, int] = {}
+                for tok in _tokenize(ch.get("text") or ""):
+                    tf[tok] = tf.get(tok, 0) + 1
+                n = len(self.chunk_ids)
+                day = ch.get("day_bucket")
+                self.chunk_ids.append(str(cid))
+                self.doc_ids.append(str(ch.get("doc_id")))
+                self.days.append(day.date().isoformat() if isinstance(day, datetime) else None)
+                length = sum(tf.values())
+                self.lengths.append(length)
+                self.alive.append(1)
+                self.ordinal[str(cid)] = n
+                self.by_doc.setdefault(str(ch.get("doc_id")), []).append(n)
+                for tok, c in tf.items():
+                    post = self.postings.get(tok)
+                    if post is None:
+                        post = self.postings[tok] = (array("I"), array("I"))
+                    post[0].append(n)
+                    post[1].append(c)
+                self.live += 1
+                self.total_len += length
+                self.dirty += 1
+                created = ch.get("created_at")
+                if isinstance(created, datetime):
+                    created = created.replace(tzinfo=None)
+                    if self.synced_at is None or created > self.synced_at:
+                        self.synced_at = created
+
+    def remove_doc(self, doc_id: Any):
+        with self._lock:
+            for n in self.by_doc.pop(str(doc_id), []):
+                if self.alive[n]:
+                    self.alive[n] = 0
+                    self.live -= 1
+                    self.total_len -= self.lengths[n]
+                    self.ordinal.pop(self.chunk_ids[n], None)
+                    self.dirty += 1
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Tombstone chunks that are gone from Mongo (e.g. replaced by another worker's reprocess)."""
+        with self._lock:
+            for cid in chunk_ids:
+                n = self.ordinal.pop(str(cid), None)
+                if n is not None and self.alive[n]:
+                    self.alive[n] = 0
+                    self.live -= 1
+                    self.total_len -= self.lengths[n]
+                    self.dirty += 1
+
+    # ---- reads ----
+    def search(self, query: str, top_k: int = 10, day: Optional[str] = None) -> List[Dict[str, Any]]:
+        terms = list(dict.fromkeys(_tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            if not self.live:
+                return []
+            avg = self.total_len / max(1, self.live)
+            scores: Dict[int, float] = {}
+            for term in terms:
+                post = self.postings.get(term)
+                if post is None:
+                    continue
+                ords, tfs = post
+                idf = math.log(1 + (self.live - len(ords) + 0.5) / (len(ords) + 0.5))
+                for n, tf in zip(ords, tfs):
+                    if not self.alive[n] or (day and self.days[n] != day):
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[n] / avg)
+                    scores[n] = scores.get(n, 0.0) + idf * tf * (self.k1 + 1) / norm
+            best = heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+            return [{"id": self.chunk_ids[n], "doc_id": self.doc_ids[n], "score": round(sc, 4)} for n, sc in best]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "chunks": self.live,
+                "terms": len(self.postings),
+                "tombstones": len(self.chunk_ids) - self.live,
+                "synced_at": self.synced_at,
+            }
+
+    # ---- persistence ----
+    def _compact(self):
+        keep = [n for n in range(len(self.chunk_ids)) if self.alive[n]]
+        if len(keep) == len(self.chunk_ids):
+            return
+        remap = {old: new for new, old in enumerate(keep)}
+        postings: Dict[str, Tuple[array, array]] = {}
+        for term, (ords, tfs) in self.postings.items():
+            no, nt = array("I"), array("I")
+            for n, tf in zip(ords, tfs):
+                m = remap.get(n)
+                if m is not None:
+                    no.append(m)
+                    nt.append(tf)
+            if no:
+                postings[term] = (no, nt)
+        self.postings = postings
+        self.chunk_ids = [self.chunk_ids[n] for n in keep]
+        self.doc_ids = [self.doc_ids[n] for n in keep]
+        self.days = [self.days[n] for n in keep]
+        self.lengths = array("I", (self.lengths[n] for n in keep))
+        self.alive = bytearray(b"\x01" * len(keep))
+        self.ordinal = {cid: n for n, cid in enumerate(self.chunk_ids)}
+        self.by_doc = {}
+        for n, did in enumerate(self.doc_ids):
+            self.by_doc.setdefault(did, []).append(n)
+
+    def save(self):
+        with self._lock:
+            self._compact()
+            state = {
+                "version": self.SNAPSHOT_VERSION,
+                "chunk_ids": self.chunk_ids,
+                "doc_ids": self.doc_ids,
+                "days": self.days,
+                "lengths": self.lengths.tobytes(),
+                "postings": {t: (o.tobytes(), f.tobytes()) for t, (o, f) in self.postings.items()},
+                "synced_at": self.synced_at,
+            }
+            self.dirty = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "wb") as fh:
+            pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def load(self) -> bool:
+        try:
+            with open(self.path, "rb") as fh:
+                state = pickle.load(fh)
+        except Exception:
+            return False
+        if not isinstance(state, dict) or state.get("version") != self.SNAPSHOT_VERSION:
+            return False
+
+        def _arr(raw: bytes) -> array:
+            a = array("I")
+            a.frombytes(raw)
+            return a
+
+        with self._lock:
+            self._reset()
+            self.chunk_ids = state["chunk_ids"]
+            self.doc_ids = state["doc_ids"]
+            self.days = state["days"]
+            self.lengths = _arr(state["lengths"])
+            self.alive = bytearray(b"\x01" * len(self.chunk_ids))
+            self.postings = {t: (_arr(o), _arr(f)) for t, (o, f) in state["postings"].items()}
+            self.ordinal = {cid: n for n, cid in enumerate(self.chunk_ids)}
+            for n, did in enumerate(self.doc_ids):
+                self.by_doc.setdefault(did, []).append(n)
+            self.live = len(self.chunk_ids)
+            self.total_len = sum(self.lengths)
+            self.synced_at = state.get("synced_at")
+        return True
+
+    def sync(self, db, batch: int = 2000):
+        """Index chunks created since the last watermark (all chunks on first run)."""
+        filt: Dict[str, Any] = {}
+        if self.synced_at is not None:
+            filt["created_at"] = {"$gt": self.synced_at - self.SYNC_OVERLAP}
+        proj = {"doc_id": 1, "text": 1, "day_bucket": 1, "created_at": 1}
+        buf: List[Dict[str, Any]] = []
+        for ch in db.doc_chunks.find(filt, proj).batch_size(batch):
+            buf.append(ch)
+            if len(buf) >= batch:
+                self.add_chunks(buf)
+                buf = []
+        if buf:
+            self.add_chunks(buf)
+
+    def start(self, db):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, args=(db,), name="lexical-index", daemon=True)
+            self._thread.start()
+
+    def run(self, db):
+        """Background loop: load snapshot, catch up, then keep syncing and snapshotting."""
+        interval = max(1.0, float(os.getenv("LEXICAL_SYNC_SECONDS", "30")))
+        snapshot_every = max(1, int(os.getenv("LEXICAL_SNAPSHOT_EVERY", "2000")))
+        self.load()
+        while True:
+            try:
+                self.sync(db)
+                self.ready = True
+                if self.dirty >= snapshot_every:
+                    self.save()
+            except Exception:
+                pass
+            time.sleep(interval)
+
+
+lexical_index: Optional[LexicalIndex] = None
+if os.getenv("LEXICAL_INDEX", "on").lower() not in {"0", "off", "false", "no"}:
+    lexical_index = LexicalIndex(
+        os.getenv("LEXICAL_INDEX_PATH", str(Path(__file__).resolve().parent / ".cache" / "lexical_index.pkl"))
+    )
+
+    @atexit.register
+    def _save_lexical_index():
+        if lexical_index is not None and lexical_index.ready and lexical_index.dirty:
+            try:
+                lexical_index.save()
+            except Exception:
+                pass
+
+
+def _lexical_chunk_hits(q: str, top_k: int, day: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """BM25 chunk hits hydrated from Mongo in one $in query; None when the index isn't ready."""
+    if lexical_index is None or not lexical_index.ready:
+        return None
+    # over-fetch: chunks replaced by another worker's reprocess are only noticed here
+    hits = lexical_index.search(q, top_k=top_k * 2, day=day)
+    oids = [ObjectId(h["id"]) for h in hits if ObjectId.is_valid(h["id"])]
+    rows = {str(c["_id"]): c for c in database.doc_chunks.find({"_id": {"$in": oids}}, {"text": 1, "captured_at": 1})} if oids else {}
+    items = []
+    for h in hits:
+        c = rows.get(h["id"])
+        if not c:
+            # chunk was replaced since it was indexed
+            continue
+        items.append({
+            "id": h["id"],
+            "type": "chunk",
+            "doc_id": h["doc_id"],
+            "text": (c.get("text") or "")[:400],
+            "captured_at": c.get("captured_at"),
+            "score": h["score"],
+        })
+    gone = [h["id"] for h in hits if h["id"] not in rows]
+    if gone:
+        lexical_index.remove_chunks(gone)
+    return items[:top_k]
+
+
+# -----------------------------
+# Local vector index (NumPy fallback when Qdrant is down)
+# -----------------------------
+try:
+    import numpy as np  # type: ignore
+    HAVE_NUMPY = True
+except Exception:
+    np = None  # type: ignore
+    HAVE_NUMPY = False
+
+
+def _embedding_array(doc: Dict[str, Any]) -> Optional["np.ndarray"]:
+    """float32 vector of a stored chunk decoded straight into NumPy; None for `ref` or missing vectors."""
+    vec = doc.get("embedding")
+    if vec:
+        return np.asarray(vec, dtype=np.float32)
+    q = doc.get("embedding_q") or {}
+    if q.get("fmt") == "float16":
+        return np.frombuffer(bytes(q["data"]), dtype="<f2").astype(np.float32)
+    if q.get("fmt") == "int8":
+        return np.frombuffer(bytes(q["data"]), dtype=np.int8).astype(np.float32) * np.float32(q.get("scale") or 1.0)
+    return None
+
+
+class LocalVectorIndex:
+    """In-process ANN index over the chunk vectors stored in Mongo.
+
+    Serves `/search/semantic` when Qdrant is unreachable. Rows live in two
+    float32 matrices: `base`, memory-mapped from the last snapshot
+    (VECTOR_INDEX_PATH/snap-<id>/vectors.npy, named by the CURRENT file), and
+    `delta`, an in-RAM buffer of chunks added since. Unless QDRANT_DISTANCE is Dot, rows are L2-normalised so scores
+    match Qdrant's cosine scores. Up to VECTOR_INDEX_IVF_MIN live rows a query
+    is an exact scan; past that each snapshot trains an IVF layer (spherical
+    k-means) and stores base rows grouped by list, so a query scans the
+    VECTOR_INDEX_NPROBE closest lists as contiguous slices plus the whole
+    delta. Day-filtered queries score just that day's rows exactly. Removed
+    chunks are tombstoned until the next snapshot. Catch-up from Mongo works
+    like LexicalIndex; `ref` vectors exist only in Qdrant and are skipped.
+    """
+
+    SNAPSHOT_VERSION = 1
+    SYNC_OVERLAP = timedelta(minutes=5)
+    SCAN_BLOCK = 32768
+    KMEANS_ITERS = 10
+
+    def __init__(self, path: str, normalize: bool = True, ivf_min: int = 50000, nprobe: int = 16,
+                 nlist: Optional[int] = None):
+        self.path = Path(path)
+        self.normalize = normalize
+        self.ivf_min = ivf_min
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.ready = False
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self):
+        self.dim: Optional[int] = None
+        self.base = None  # (n_base, dim), memory-mapped once loaded or saved
+        self.delta = None  # (capacity, dim), first n_delta rows in use
+        self.n_base = 0
+        self.n_delta = 0
+        self.alive = None  # bool per ordinal (base rows first, then delta)
+        self.day_code = None  # int32 per ordinal, -1 when unknown
+        self.day_names: List[str] = []
+        self.day_index: Dict[str, int] = {}
+        self.chunk_ids: List[str] = []
+        self.doc_ids: List[str] = []
+        self.ordinal: Dict[str, int] = {}
+        self.by_doc: Dict[str, List[int]] = {}
+        self.centroids = None  # IVF over base rows: (nlist, dim)
+        self.list_offsets = None  # (nlist + 1,) row boundaries of each list in base
+        self.live = 0
+        self.skipped = 0
+        self.synced_at: Optional[datetime] = None
+        self.dirty = 0
+
+    @staticmethod
+    def _reserve(arr, n: int, dtype, dim: Optional[int] = None):
+        """`arr` with room for at least n rows, grown geometrically."""
+        cap = 0 if arr is None else len(arr)
+        if n <= cap:
+            return arr
+        out = np.zeros((max(n, cap * 2, 1024),) + ((dim,) if dim else ()), dtype=dtype)
+        if cap:
+            out[:cap] = arr
+        return out
+
+    def _unit(self, rows):
+        if not self.normalize:
+            return rows
+        norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return rows / norms
+
+    # ---- writes ----
+    def add(self, ids: List[str], doc_ids: List[str], days: List[Optional[str]], vectors) -> int:
+        """Append rows; ids already indexed and vectors of another dimension are skipped."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or not len(vectors):
+            return 0
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            if vectors.shape[1] != self.dim:
+                self.skipped += len(vectors)
+                return 0
+            seen = set()
+            keep = []
+            for i, cid in enumerate(ids):
+                if cid not in self.ordinal and cid not in seen:
+                    seen.add(cid)
+                    keep.append(i)
+            if not keep:
+                return 0
+            rows = self._unit(vectors[keep])
+            end = self.n_delta + len(rows)
+            self.delta = self._reserve(self.delta, end, np.float32, self.dim)
+            self.delta[self.n_delta:end] = rows
+            first = self.n_base + self.n_delta
+            total = first + len(rows)
+            self.alive = self._reserve(self.alive, total, np.bool_)
+            self.day_code = self._reserve(self.day_code, total, np.int32)
+            for n, i in enumerate(keep, first):
+                day = days[i]
+                code = -1
+                if day:
+                    code = self.day_index.get(day, -1)
+                    if code < 0:
+                        code = self.day_index[day] = len(self.day_names)
+                        self.day_names.append(day)
+                self.alive[n] = True
+                self.day_code[n] = code
+                self.chunk_ids.append(ids[i])
+                self.doc_ids.append(doc_ids[i])
+                self.ordinal[ids[i]] = n
+                self.by_doc.setdefault(doc_ids[i], []).append(n)
+            self.n_delta = end
+            self.live += len(keep)
+            self.dirty += len(keep)
+            return len(keep)
+
+    def add_chunks(self, chunks: List[Dict[str, Any]], vectors: Optional[List[Optional[List[float]]]] = None):
+        """Index stored chunk docs (need _id, doc_id, a vector); `vectors` overrides the stored copy."""
+        ids, doc_ids, days, rows = [], [], [], []
+        for i, ch in enumerate(chunks):
+            cid = ch.get("_id")
+            if cid is None:
+                continue
+            vec = vectors[i] if vectors is not None and i < len(vectors) else None
+            arr = np.asarray(vec, dtype=np.float32) if vec else _embedding_array(ch)
+            if arr is None or not arr.size:
+                continue
+            if rows and arr.shape != rows[0].shape:
+                self.skipped += 1
+                continue
+            day = ch.get("day_bucket")
+            ids.append(str(cid))
+            doc_ids.append(str(ch.get("doc_id")))
+            days.append(day.date().isoformat() if isinstance(day, datetime) else None)
+            rows.append(arr)
+        if rows:
+            self.add(ids, doc_ids, days, np.stack(rows))
+        with self._lock:
+            for ch in chunks:
+                created = ch.get("created_at")
+                if isinstance(created, datetime):
+                    created = created.replace(tzinfo=None)
+                    if self.synced_at is None or created > self.synced_at:
+                        self.synced_at = created
+
+    def remove_doc(self, doc_id: Any):
+        with self._lock:
+            for n in self.by_doc.pop(str(doc_id), []):
+                if self.alive[n]:
+                    self.alive[n] = False
+                    self.live -= 1
+                    self.ordinal.pop(self.chunk_ids[n], None)
+                    self.dirty += 1
+
+    def remove_chunks(self, chunk_ids: List[str]):
+        """Tombstone chunks that are gone from Mongo (e.g. replaced by another worker's reprocess)."""
+        with self._lock:
+            for cid in chunk_ids:
+                n = self.ordinal.pop(str(cid), None)
+                if n is not None and self.alive[n]:
+                    self.alive[n] = False
+                    self.live -= 1
+                    self.dirty += 1
+
+    # ---- reads ----
+    def search(self, vector, top_k: int = 10, day: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if not self.live or q.shape != (self.dim,):
+                return []
+            q = self._unit(q)
+            total = self.n_base + self.n_delta
+            alive = self.alive[:total]
+            parts: List[Tuple[Any, Any]] = []
+            if day:
+                code = self.day_index.get(day)
+                if code is None:
+                    return []
+                rows = np.flatnonzero(alive & (self.day_code[:total] == code))
+                nb = int(np.searchsorted(rows, self.n_base))
+                if nb:
+                    parts.append((rows[:nb], self.base[rows[:nb]] @ q))
+                if len(rows) > nb:
+                    parts.append((rows[nb:], self.delta[rows[nb:] - self.n_base] @ q))
+            else:
+                if self.n_base and self.centroids is not None:
+                    probe = np.argsort(-(self.centroids @ q))[:self.nprobe]
+                    for lst in np.sort(probe):
+                        s, e = int(self.list_offsets[lst]), int(self.list_offsets[lst + 1])
+                        if e > s:
+                            parts.append((np.arange(s, e), self.base[s:e] @ q))
+                else:
+                    for s in range(0, self.n_base, self.SCAN_BLOCK):
+                        e = min(self.n_base, s + self.SCAN_BLOCK)
+                        parts.append((np.arange(s, e), self.base[s:e] @ q))
+                if self.n_delta:
+                    parts.append((np.arange(self.n_base, total), self.delta[:self.n_delta] @ q))
+                parts = [(o[alive[o]], sc[alive[o]]) for o, sc in parts]
+            if not parts:
+                return []
+            ords = np.concatenate([o for o, _ in parts])
+            scores = np.concatenate([sc for _, sc in parts])
+            if len(scores) > top_k:
+                top = np.argpartition(-scores, top_k - 1)[:top_k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [
+                {"id": self.chunk_ids[n], "doc_id": self.doc_ids[n], "score": round(float(sc), 4)}
+                for n, sc in zip(ords[top].tolist(), scores[top].tolist())
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "chunks": self.live,
+                "dim": self.dim,
+                "snapshot_rows": self.n_base,
+                "delta_rows": self.n_delta,
+                "tombstones": self.n_base + self.n_delta - self.live,
+                "ivf_lists": len(self.centroids) if self.centroids is not None else 0,
+                "nprobe": self.nprobe,
+                "skipped": self.skipped,
+                "synced_at": self.synced_at,
+            }
+
+    # ---- IVF ----
+    @staticmethod
+    def _nearest(rows, centroids):
+        return np.argmax(rows @ centroids.T, axis=1)
+
+    def _train_ivf(self, mat):
+        """Spherical k-means on a sample; returns (centroids, list of each row)."""
+        n = len(mat)
+        nlist = max(1, min(n, self.nlist or int(math.sqrt(n))))
+        rng = np.random.default_rng(0)
+        sample = mat[np.sort(rng.choice(n, min(n, nlist * 32), replace=False))]
+        cent = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.KMEANS_ITERS):
+            assign = self._nearest(sample, cent)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            cent[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, None]
+            cent /= np.maximum(np.linalg.norm(cent, axis=1, keepdims=True), 1e-12)
+        assign = np.concatenate([
+            self._nearest(mat[s:s + self.SCAN_BLOCK], cent) for s in range(0, n, self.SCAN_BLOCK)
+        ])
+        return cent.astype(np.float32), assign
+
+    # ---- persistence ----
+    def save(self):
+        """Compact live rows into a new snapshot (grouped by IVF list when large enough) and map it."""
+        with self._lock:
+            if not self.live:
+                return
+            total = self.n_base + self.n_delta
+            keep = np.flatnonzero(self.alive[:total])
+            nb = int(np.searchsorted(keep, self.n_base))
+            mat = np.empty((len(keep), self.dim), dtype=np.float32)
+            if nb:
+                mat[:nb] = self.base[keep[:nb]]
+            if len(keep) > nb:
+                mat[nb:] = self.delta[keep[nb:] - self.n_base]
+            centroids = offsets = None
+            if len(keep) >= self.ivf_min:
+                centroids, assign = self._train_ivf(mat)
+                order = np.argsort(assign, kind="stable")
+                keep = keep[order]
+                mat = mat[order]
+                offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=len(centroids)))))
+            chunk_ids = [self.chunk_ids[n] for n in keep.tolist()]
+            doc_ids = [self.doc_ids[n] for n in keep.tolist()]
+            day_code = self.day_code[keep]
+            snapshot_id = f"{time.time_ns()}-{os.getpid()}"
+            state = {
+                "version": self.SNAPSHOT_VERSION,
+                "snapshot": snapshot_id,
+                "rows": len(keep),
+                "dim": self.dim,
+                "normalize": self.normalize,
+                "chunk_ids": chunk_ids,
+                "doc_ids": doc_ids,
+                "day_names": self.day_names,
+                "day_code": day_code.tobytes(),
+                "centroids": centroids,
+                "list_offsets": offsets,
+                "synced_at": self.synced_at,
+            }
+            # each snapshot gets its own directory; CURRENT is switched with one rename, so
+            # workers snapshotting at once never pair one's vectors with the other's metadata
+            snap_dir = self.path / f"snap-{snapshot_id}"
+            snap_dir.mkdir(parents=True, exist_ok=True)
+            with open(snap_dir / "vectors.npy", "wb") as fh:
+                np.save(fh, mat)
+            with open(snap_dir / "meta.pkl", "wb") as fh:
+                pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            previous = self._current_dir()
+            tmp = self.path / f"CURRENT.{snapshot_id}.tmp"
+            tmp.write_text(snap_dir.name)
+            os.replace(tmp, self.path / "CURRENT")
+            self._install(np.load(snap_dir / "vectors.npy", mmap_mode="r"), state)
+        self._prune(keep={snap_dir.name, previous.name if previous else ""})
+
+    def _current_dir(self) -> Optional[Path]:
+        try:
+            name = (self.path / "CURRENT").read_text().strip()
+        except OSError:
+            return None
+        return self.path / name if name.startswith("snap-") else None
+
+    def _prune(self, keep: set, min_age: float = 600.0):
+        """Drop snapshot dirs no longer current (already-mapped files stay readable on POSIX).
+
+        The previous snapshot and fresh dirs are kept: another worker may still be
+        loading the one or writing the other.
+        """
+        now = time.time()
+        for d in self.path.glob("snap-*"):
+            try:
+                if d.name in keep or now - d.stat().st_mtime < min_age:
+                    continue
+                for f in d.iterdir():
+                    f.unlink()
+                d.rmdir()
+            except OSError:
+                pass
+
+    def _install(self, base, state: Dict[str, Any]):
+        self._reset()
+        self.dim = state["dim"]
+        self.base = base
+        self.n_base = len(base)
+        self.alive = np.ones(self.n_base, dtype=np.bool_)
+        self.day_code = np.frombuffer(state["day_code"], dtype=np.int32).copy()
+        self.day_names = list(state["day_names"])
+        self.day_index = {d: i for i, d in enumerate(self.day_names)}
+        self.chunk_ids = list(state["chunk_ids"])
+        self.doc_ids = list(state["doc_ids"])
+        self.ordinal = {cid: n for n, cid in enumerate(self.chunk_ids)}
+        for n, did in enumerate(self.doc_ids):
+            self.by_doc.setdefault(did, []).append(n)
+        self.centroids = state.get("centroids")
+        self.list_offsets = state.get("list_offsets")
+        self.live = self.n_base
+        self.synced_at = state.get("synced_at")
+
+    def load(self) -> bool:
+        snap_dir = self._current_dir()
+        if snap_dir is None:
+            return False
+        try:
+            with open(snap_dir / "meta.pkl", "rb") as fh:
+                state = pickle.load(fh)
+            base = np.load(snap_dir / "vectors.npy", mmap_mode="r")
+        except Exception:
+            return False
+        if (
+            not isinstance(state, dict) or state.get("version") != self.SNAPSHOT_VERSION
+            or f"snap-{state.get('snapshot')}" != snap_dir.name
+            or state.get("rows") != len(base) or state.get("normalize") != self.normalize
+        ):
+            return False
+        with self._lock:
+            self._install(base, state)
+        return True
+
+    def sync(self, db, batch: int = 2000):
+        """Index chunks created since the last watermark (all chunks on first run)."""
+        filt: Dict[str, Any] = {}
+        if self.synced_at is not None:
+            filt["created_at"] = {"$gt": self.synced_at - self.SYNC_OVERLAP}
+        proj = {"doc_id": 1, "embedding": 1, "embedding_q": 1, "day_bucket": 1, "created_at": 1}
+        buf: List[Dict[str, Any]] = []
+        for ch in db.doc_chunks.find(filt, proj).batch_size(batch):
+            buf.append(ch)
+            if len(buf) >= batch:
+                self.add_chunks(buf)
+                buf = []
+        if buf:
+            self.add_chunks(buf)
+
+    def start(self, db):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, args=(db,), name="vector-index", daemon=True)
+            self._thread.start()
+
+    def run(self, db):
+        """Background loop: map the snapshot, catch up, then keep syncing and snapshotting."""
+        interval = max(1.0, float(os.getenv("VECTOR_INDEX_SYNC_SECONDS", "30")))
+        snapshot_every = max(1, int(os.getenv("VECTOR_INDEX_SNAPSHOT_EVERY", "5000")))
+        self.load()
+        while True:
+            try:
+                self.sync(db)
+                self.ready = True
+                # the IVF layer is only built by a snapshot; take one as soon as the index is big enough
+                if self.dirty >= snapshot_every or (self.dirty and self.centroids is None and self.live >= self.ivf_min):
+                    self.save()
+            except Exception:
+                pass
+            time.sleep(interval)
+
+
+vector_index: Optional[LocalVectorIndex] = None
+_vector_index_mode = os.getenv("VECTOR_INDEX", "auto").lower()  # auto: only when Qdrant is down at startup
+if HAVE_NUMPY and _vector_index_mode not in {"0", "off", "false", "no"} and (
+    _vector_index_mode != "auto" or not getattr(qdrant_mgr, "enabled", False)
+):
+    vector_index = LocalVectorIndex(
+        os.getenv("VECTOR_INDEX_PATH", str(Path(__file__).resolve().parent / ".cache" / "vector_index")),
+        normalize="DOT" not in os.getenv("QDRANT_DISTANCE", "Cosine").upper(),
+        ivf_min=int(os.getenv("VECTOR_INDEX_IVF_MIN", "50000")),
+        nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "16")),
+        nlist=int(os.getenv("VECTOR_INDEX_NLIST", "0")) or None,
+    )
+
+    @atexit.register
+    def _save_vector_index():
+        if vector_index is not None and vector_index.ready and vector_index.dirty:
+            try:
+                vector_index.save()
+            except Exception:
+                pass
+
+
+def _local_vector_hits(vec: List[float], top_k: int, day: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+    """Chunk hits from the local vector index hydrated from Mongo; None when the index isn't ready."""
+    if vector_index is None or not vector_index.ready:
+        return None
+    # over-fetch: chunks replaced by another worker's reprocess are only noticed here
+    hits = vector_index.search(vec, top_k=top_k * 2, day=day)
+    oids = [ObjectId(h["id"]) for h in hits if ObjectId.is_valid(h["id"])]
+    rows = {str(c["_id"]): c for c in database.doc_chunks.find({"_id": {"$in": oids}}, {"text": 1, "captured_at": 1})} if oids else {}
+    items = []
+    for h in hits:
+        c = rows.get(h["id"])
+        if not c:
+            # chunk was replaced since it was indexed
+            continue
+        items.append({
+            "id": h["id"],
+            "type": "chunk",
+            "doc_id": h["doc_id"],
+            "text": (c.get("text") or "")[:CHUNK_PREVIEW_CHARS],
+            "captured_at": c.get("captured_at"),
+            "score": h["score"],
+        })
+    gone = [h["id"] for h in hits if h["id"] not in rows]
+    if gone:
+        vector_index.remove_chunks(gone)
+    return items[:top_k]
+
+
+# -----------------------------
+# Result cache (search / compose)
+# -----------------------------
+class CorpusGeneration:
+    """Counter bumped on every corpus write; cached results from older generations are stale.
+
+    The value lives in `counters` so writes from other workers are noticed too:
+    a thread started from the lifespan re-reads it every
+    RESULT_CACHE_GEN_CHECK_SECONDS, and `current()` only reads memory, so a slow
+    Mongo never blocks the event loop on a cache lookup. If Mongo is unreachable
+    the local counter still moves, so this process stays correct.
+    """
+
+    KEY = "corpus_generation"
+
+    def __init__(self, db):
+        self.db = db
+        self.check_seconds = float(os.getenv("RESULT_CACHE_GEN_CHECK_SECONDS", "2"))
+        self.value = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def bump(self) -> int:
+        with self._lock:
+            self.value += 1
+        try:
+            doc = self.db.counters.find_one_and_update(
+                {"_id": self.KEY}, {"$inc": {"value": 1}}, upsert=True, return_document=ReturnDocument.AFTER,
+            )
+            with self._lock:
+                self.value = int(doc["value"])
+        except PyMongoError:
+            pass
+        return self.value
+
+    def current(self) -> int:
+        return self.value
+
+    def refresh(self) -> int:
+        """Re-read the shared counter (blocking)."""
+        try:
+            doc = self.db.counters.find_one({"_id": self.KEY})
+            if doc is not None:
+                with self._lock:
+                    self.value = int(doc.get("value") or 0)
+        except PyMongoError:
+            pass
+        return self.value
+
+    def run(self) -> None:
+        while True:
+            self.refresh()
+            time.sleep(max(0.1, self.check_seconds))
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="corpus-generation", daemon=True)
+            self._thread.start()
+
+
+class ResultCache:
+    """In-process TTL + LRU cache for search and compose responses.
+
+    Entries remember the corpus generation they were computed at and are
+    dropped on read once it has moved. RESULT_CACHE_TTL_SECONDS=0 disables it.
+    """
+
+    def __init__(self, generation: CorpusGeneration):
+        self.generation = generation
+        self.ttl = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+        self.max_items = max(1, int(os.getenv("RESULT_CACHE_MAX_ITEMS", "1000")))
+        self.enabled = self.ttl > 0
+        self._items: "OrderedDict[Tuple, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "evictions": 0}
+
+    @staticmethod
+    def key(kind: str, query: str, **parts: Any) -> Tuple:
+        norm = " ".join((query or "").lower().split())
+        return (kind, norm) + tuple(sorted((k, v) for k, v in parts.items()))
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        gen = self.generation.current()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            expires, entry_gen, value = entry
+            if entry_gen != gen or expires < time.monotonic():
+                del self._items[key]
+                self.stats["stale" if entry_gen != gen else "expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: Tuple, value: Any, generation: int) -> None:
+        """Store a result computed at `generation` (read before computing, so a write racing the
+        computation leaves an entry that is already stale)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, generation, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.stats)
+            out["items"] = len(self._items)
+        lookups = out["hits"] + out["misses"]
+        out["enabled"] = self.enabled
+        out["generation"] = self.generation.value
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else None
+        return out
+
+
+corpus_generation = CorpusGeneration(database)
+result_cache = ResultCache(corpus_generation)
+
+
 # -----------------------------
 # Semantic search (Qdrant + fallback)
 # -----------------------------
@@ -1182,101 +3821,274 @@ class SemanticSearchIn(BaseModel):
     scope: Optional[str] = "chunks"  # 'chunks' | 'docs'
     date: Optional[str] = None  # YYYY-MM-DD
     topic: Optional[str] = None  # only applied to docs
+    match: Optional[str] = "text"  # keyword fallback: 'text' | 'regex'
+    mode: Optional[str] = None  # 'auto' (default) | 'vector' | 'lexical' | 'hybrid'
+    include_text: Optional[bool] = False  # full chunk text instead of the 400-char preview
 
 
-@app.post("/search/semantic")
-def search_semantic(body: SemanticSearchIn) -> Dict[str, Any]:
-    q = (body.query or "").strip()
-    if not q:
-        raise HTTPException(status_code=400, detail="query required")
-    scope = (body.scope or "chunks").lower()
-    top_k = max(1, min(200, int(body.top_k or 10)))
+def _doc_hit_projection(snippet_chars: int = 220) -> Dict[str, Any]:
+    """Fields needed to render a document hit; raw_html/markdown/embedding stay on the server."""
+    return {
+        "title": 1,
+        "source_url": 1,
+        "captured_at": 1,
+        "summary.short": 1,
+        "text_head": {"$substrCP": [{"$ifNull": ["$cleaned_text", ""]}, 0, snippet_chars]},
+    }
+
+
+def _doc_hit(d: Dict[str, Any], score: Optional[float] = None) -> Dict[str, Any]:
+    hit = {
+        "id": str(d.get("_id")),
+        "type": "doc",
+        "title": d.get("title"),
+        "source_url": d.get("source_url"),
+        "captured_at": d.get("captured_at"),
+        "snippet": (d.get("summary") or {}).get("short") or d.get("text_head") or "",
+    }
+    if score is not None:
+        hit["score"] = score
+    return hit
 
-    embed_fn = _choose_embeddings()
-    # Fallback when embeddings or qdrant are unavailable → simple regex over docs
-    if not (embed_fn and qdrant_mgr and getattr(qdrant_mgr, 'enabled', False)):
-        filt: Dict[str, Any] = {}
-        if body.date:
-            try:
-                d = datetime.fromisoformat(body.date)
-                if d.tzinfo is None:
-                    d = d.replace(tzinfo=timezone.utc)
-                filt["day_bucket"] = datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
-            except Exception:
-                pass
-        if body.topic:
-            filt["topics.primary"] = body.topic
-        filt["$or"] = [{"cleaned_text": {"$regex": q, "$options": "i"}}, {"title": {"$regex": q, "$options": "i"}}]
-        cursor = database.documents.find(filt).sort("captured_at", -1).limit(top_k)
-        items = [{
-            "id": str(d.get("_id")),
-            "type": "doc",
-            "title": d.get("title"),
-            "source_url": d.get("source_url"),
-            "captured_at": d.get("captured_at"),
-            "snippet": (d.get("summary") or {}).get("short") or (d.get("cleaned_text") or "")[:220]
-        } for d in cursor]
-        return {"items": items, "total": len(items), "mode": "fallback"}
 
-    # Qdrant path
+def _hydrate_docs(doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Fetch many documents for hit rendering in one $in query, keyed by str(_id)."""
+    oids = list({ObjectId(i) for i in doc_ids if i and ObjectId.is_valid(str(i))})
+    if not oids:
+        return {}
+    return {str(d["_id"]): d for d in database.documents.find({"_id": {"$in": oids}}, _doc_hit_projection())}
+
+
+def _hydrate_chunk_text(items: List[Dict[str, Any]], limit: Optional[int] = None) -> None:
+    """Fill `text` of chunk hits from doc_chunks in one $in query, cut to `limit` chars if given."""
+    oids = [ObjectId(it["id"]) for it in items if it.get("type") == "chunk" and ObjectId.is_valid(it.get("id") or "")]
+    if not oids:
+        return
+    texts = {str(c["_id"]): c.get("text") or "" for c in database.doc_chunks.find({"_id": {"$in": oids}}, {"text": 1})}
+    for it in items:
+        text = texts.get(it.get("id") or "")
+        if text is not None:
+            it["text"] = text[:limit] if limit else text
+
+
+def _day_bucket_from_str(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        d = datetime.fromisoformat(value)
+    except Exception:
+        return None
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+def _local_vector_ready() -> bool:
+    return vector_index is not None and vector_index.ready
+
+
+def _vector_hits(
+    q: str, scope: str, top_k: int, date: Optional[str], topic: Optional[str],
+) -> Tuple[List[Dict[str, Any]], str]:
+    """Embed the query and search Qdrant, or the local vector index for chunks when Qdrant is down.
+
+    Returns (items, backend) where backend is 'qdrant' or 'local'; raises HTTPException on failure.
+    """
     try:
-        vec = embed_fn(q)
+        vec = _choose_embeddings()(q)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"embed failed: {e}")
 
+    if not getattr(qdrant_mgr, 'enabled', False):
+        items = _local_vector_hits(vec, top_k, date or None) if scope != "docs" else None
+        if items is None:
+            raise HTTPException(status_code=503, detail="vector search unavailable (Qdrant down, no local index)")
+        return items, "local"
+
     try:
         # Build filter
         must = []
-        if body.date:
-            must.append(FieldCondition(key="day_bucket_str", match=MatchValue(value=body.date)))
-        if body.topic and scope == "docs":
-            must.append(FieldCondition(key="topics_primary", match=MatchValue(value=body.topic)))
+        if date:
+            must.append(FieldCondition(key="day_bucket_str", match=MatchValue(value=date)))
+        if topic and scope == "docs":
+            must.append(FieldCondition(key="topics_primary", match=MatchValue(value=_topic_slug(topic) or topic)))
         qfilter = QFilter(must=must) if must else None
 
         if scope == "docs":
             col = qdrant_mgr.col_docs
-            res = qdrant_mgr.client.query_points(collection_name=col, query=vec, limit=top_k, filter=qfilter)
+            res = qdrant_mgr.client.query_points(collection_name=col, query=vec, limit=top_k, query_filter=qfilter,
+                                                 search_params=qdrant_mgr.search_params, with_payload=["doc_id"])
+            points = getattr(res, 'points', []) or getattr(res, 'result', []) or []
+            # one $in round trip for all hits, then keep Qdrant's ranking
+            docs = _hydrate_docs([str((p.payload or {}).get("doc_id") or "") for p in points])
             items = []
-            for p in getattr(res, 'points', []) or getattr(res, 'result', []) or []:
-                payload = p.payload or {}
-                doc_id = payload.get("doc_id") or None
-                # we stored doc payload with doc-level upsert; payload may not include text
-                # fetch details from Mongo
-                if doc_id is None:
-                    # The doc upsert uses id hash of doc_id; we set payload doc_id earlier.
-                    pass
-                d = None
-                if doc_id and ObjectId.is_valid(str(doc_id)):
-                    d = database.documents.find_one({"_id": ObjectId(str(doc_id))})
+            for p in points:
+                d = docs.get(str((p.payload or {}).get("doc_id") or ""))
                 score = getattr(p, 'score', None) or getattr(p, 'similarity', None)
                 if d:
-                    items.append({
-                        "id": str(d.get("_id")), "type": "doc", "title": d.get("title"),
-                        "source_url": d.get("source_url"), "captured_at": d.get("captured_at"),
-                        "score": score, "snippet": (d.get("summary") or {}).get("short") or (d.get("cleaned_text") or "")[:220]
-                    })
-            return {"items": items, "total": len(items), "mode": "qdrant"}
-        else:
-            # chunks
-            col = qdrant_mgr.col_chunks
-            res = qdrant_mgr.client.query_points(collection_name=col, query=vec, limit=top_k, filter=qfilter)
-            items = []
-            for p in getattr(res, 'points', []) or getattr(res, 'result', []) or []:
-                pay = p.payload or {}
-                score = getattr(p, 'score', None) or getattr(p, 'similarity', None)
-                items.append({
-                    "id": str(pay.get("_id") or ""),
-                    "type": "chunk",
-                    "doc_id": str(pay.get("doc_id") or ""),
-                    "text": (pay.get("text") or "")[:400],
-                    "captured_at": pay.get("captured_at"),
-                    "score": score,
-                })
-            return {"items": items, "total": len(items), "mode": "qdrant"}
+                    items.append(_doc_hit(d, score))
+            return items, "qdrant"
+        # chunks
+        col = qdrant_mgr.col_chunks
+        res = qdrant_mgr.client.query_points(collection_name=col, query=vec, limit=top_k, query_filter=qfilter,
+                                             search_params=qdrant_mgr.search_params, with_payload=CHUNK_HIT_PAYLOAD)
+        items = []
+        for p in getattr(res, 'points', []) or getattr(res, 'result', []) or []:
+            pay = p.payload or {}
+            score = getattr(p, 'score', None) or getattr(p, 'similarity', None)
+            items.append({
+                "id": str(pay.get("chunk_id") or pay.get("_id") or ""),
+                "type": "chunk",
+                "doc_id": str(pay.get("doc_id") or ""),
+                "text": pay.get("preview"),
+                "captured_at": pay.get("captured_at"),
+                "score": score,
+            })
+        # points written before slim payloads have no preview; read it from Mongo
+        _hydrate_chunk_text([it for it in items if it["text"] is None], limit=CHUNK_PREVIEW_CHARS)
+        return items, "qdrant"
     except Exception as e:
+        # Qdrant went away after startup: a warm local index (VECTOR_INDEX=on) can still answer chunk queries
+        items = _local_vector_hits(vec, top_k, date or None) if scope != "docs" else None
+        if items is not None:
+            return items, "local"
         raise HTTPException(status_code=500, detail=f"qdrant search failed: {e}")
 
 
+def _lexical_hits(
+    q: str, scope: str, top_k: int, date: Optional[str], topic: Optional[str], match: Optional[str],
+) -> Tuple[List[Dict[str, Any]], str, Optional[str]]:
+    """Keyword retrieval: BM25 over chunks when ready, else the Mongo text indexes.
+
+    Returns (items, mode, match) where mode is 'bm25' or 'fallback'.
+    """
+    if scope != "docs":
+        items = _lexical_chunk_hits(q, top_k, day=date or None)
+        if items is not None:
+            return items, "bm25", None
+    filt: Dict[str, Any] = {}
+    day = _day_bucket_from_str(date)
+    if day:
+        filt["day_bucket"] = day
+    if scope != "docs":
+        rows, _, used = _keyword_find(
+            database.doc_chunks, filt, q, match, ["text"], {"doc_id": 1, "text": 1, "captured_at": 1}, limit=top_k,
+        )
+        items = [{
+            "id": str(c.get("_id")),
+            "type": "chunk",
+            "doc_id": str(c.get("doc_id") or ""),
+            "text": (c.get("text") or "")[:400],
+            "captured_at": c.get("captured_at"),
+            "score": c.get("score"),
+        } for c in rows]
+        return items, "fallback", used
+    if topic:
+        filt["topics.primary"] = _topic_slug(topic) or topic
+    docs, _, used = _keyword_find(
+        database.documents, filt, q, match, ["cleaned_text", "title"], _doc_hit_projection(), limit=top_k,
+    )
+    return [_doc_hit(d, d.get("score")) for d in docs], "fallback", used
+
+
+def _rrf_fuse(ranked: Dict[str, List[Dict[str, Any]]], top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion: score = sum over retrievers of 1 / (k + rank).
+
+    Each fused hit keeps per-retriever scores and ranks under `scores`.
+    """
+    fused: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for name, hits in ranked.items():
+        for rank, hit in enumerate(hits, 1):
+            key = (str(hit.get("type")), str(hit.get("id"))) if hit.get("id") else (name, str(rank))
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {f: v for f, v in hit.items() if f != "score"}
+                entry["scores"] = {"rrf": 0.0}
+            else:
+                for f, v in hit.items():
+                    if f != "score" and not entry.get(f):
+                        entry[f] = v
+            entry["scores"][name] = hit.get("score")
+            entry["scores"][f"{name}_rank"] = rank
+            entry["scores"]["rrf"] += 1.0 / (k + rank)
+    out = sorted(fused.values(), key=lambda h: -h["scores"]["rrf"])[:top_k]
+    for h in out:
+        h["scores"]["rrf"] = round(h["scores"]["rrf"], 6)
+        h["score"] = h["scores"]["rrf"]
+    return out
+
+
+_search_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_WORKERS", "8")), thread_name_prefix="search")
+
+
+def _semantic_search(body: SemanticSearchIn) -> Dict[str, Any]:
+    """Blocking search core shared by /search/semantic and /answer/compose."""
+    out = _search_items(body)
+    if body.include_text:
+        _hydrate_chunk_text(out["items"])
+    return out
+
+
+def _search_items(body: SemanticSearchIn) -> Dict[str, Any]:
+    q = (body.query or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="query required")
+    scope = (body.scope or "chunks").lower()
+    top_k = max(1, min(200, int(body.top_k or 10)))
+    mode = (body.mode or "auto").lower()
+    if mode not in {"auto", "vector", "lexical", "hybrid"}:
+        raise HTTPException(status_code=400, detail="mode must be auto, vector, lexical or hybrid")
+
+    vector_ok = bool(_choose_embeddings() and (
+        getattr(qdrant_mgr, 'enabled', False) or (scope != "docs" and _local_vector_ready())
+    ))
+    if mode == "vector" and not vector_ok:
+        raise HTTPException(status_code=400, detail="vector search unavailable (no embeddings, Qdrant or local index)")
+
+    # Lexical only: requested, or vectors unavailable → BM25 over chunks, else keyword search
+    if mode == "lexical" or not vector_ok:
+        items, lex_mode, match = _lexical_hits(q, scope, top_k, body.date, body.topic, body.match)
+        out: Dict[str, Any] = {"items": items, "total": len(items), "mode": lex_mode}
+        if match:
+            out["match"] = match
+        return out
+
+    if mode == "hybrid":
+        # widen each retriever's candidate list, fuse, then cut back to top_k
+        pool = min(200, top_k * max(1, int(os.getenv("HYBRID_CANDIDATES_FACTOR", "3"))))
+        fut_vec = _search_pool.submit(_vector_hits, q, scope, pool, body.date, body.topic)
+        fut_lex = _search_pool.submit(_lexical_hits, q, scope, pool, body.date, body.topic, body.match)
+        vec_items, backend = fut_vec.result()
+        lex_items, lex_mode, match = fut_lex.result()
+        items = _rrf_fuse(
+            {"vector": vec_items, "lexical": lex_items}, top_k, k=int(os.getenv("HYBRID_RRF_K", "60")),
+        )
+        return {"items": items, "total": len(items), "mode": "hybrid", "vector": backend, "lexical": match or lex_mode}
+
+    items, backend = _vector_hits(q, scope, top_k, body.date, body.topic)
+    return {"items": items, "total": len(items), "mode": backend}
+
+
+def _search_cache_key(kind: str, body: Any, **extra: Any) -> Tuple:
+    return ResultCache.key(
+        kind, body.query,
+        scope=(body.scope or "chunks").lower(), top_k=body.top_k, date=body.date or None, topic=body.topic or None,
+        mode=(body.mode or "auto").lower(), match=(body.match or "text").lower(),
+        include_text=bool(getattr(body, "include_text", False)), model=embedding_service.cache_model, **extra,
+    )
+
+
+@app.post("/search/semantic")
+async def search_semantic(body: SemanticSearchIn) -> Dict[str, Any]:
+    key = _search_cache_key("search", body)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+    gen = corpus_generation.value
+    # embedding and the Qdrant/pymongo calls are blocking SDKs; run them on a worker thread
+    out = await run_in_threadpool(_semantic_search, body)
+    result_cache.put(key, out, gen)
+    return out
+
+
 class CategorizeIn(BaseModel):
     text: str
 
@@ -1302,18 +4114,22 @@ class ComposeAnswerIn(BaseModel):
     date: Optional[str] = None
     topic: Optional[str] = None
     include_sources: Optional[bool] = True
+    match: Optional[str] = "text"  # keyword fallback: 'text' | 'regex'
+    mode: Optional[str] = None  # retrieval mode, see SemanticSearchIn
 
 
-def _compose_llm_answer(query: str, contexts: List[Dict[str, Any]]) -> Optional[str]:
-    try:
-        from openai import OpenAI  # type: ignore
-    except Exception:
-        return None
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+def _answer_llm() -> Optional[Tuple[Any, str]]:
+    """(shared AsyncOpenAI client, model) when an answer LLM is configured, else None.
+
+    The client honours OPENAI_BASE_URL, so any OpenAI-compatible server works.
+    """
+    client = _openai()
+    if client is None:
         return None
-    model = os.getenv("OPENAI_ANSWER_MODEL", "gpt-4o-mini")
-    client = OpenAI(api_key=api_key)
+    return client, os.getenv("OPENAI_ANSWER_MODEL", "gpt-4o-mini")
+
+
+def _compose_messages(query: str, contexts: List[Dict[str, Any]]) -> List[Dict[str, str]]:
     # Build context string with brief sources
     blocks = []
     for i, c in enumerate(contexts[:20], 1):
@@ -1327,10 +4143,18 @@ def _compose_llm_answer(query: str, contexts: List[Dict[str, Any]]) -> Optional[
         "Be concise and precise. Include brief inline references like [1], [2] where relevant."
     )
     user = f"Question: {query}\n\nContext:\n{ctx}\n\nAnswer:"
+    return [{"role": "system", "content": system}, {"role": "user", "content": user}]
+
+
+async def _compose_llm_answer(query: str, contexts: List[Dict[str, Any]]) -> Optional[str]:
+    llm = _answer_llm()
+    if llm is None:
+        return None
+    client, model = llm
     try:
-        resp = client.chat.completions.create(
+        resp = await client.chat.completions.create(
             model=model,
-            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            messages=_compose_messages(query, contexts),
             temperature=0.2,
         )
         return (resp.choices[0].message.content or "").strip()
@@ -1338,31 +4162,46 @@ def _compose_llm_answer(query: str, contexts: List[Dict[str, Any]]) -> Optional[
         return None
 
 
-@app.post("/answer/compose")
-def compose_answer(body: ComposeAnswerIn) -> Dict[str, Any]:
-    q = (body.query or "").strip()
-    if not q:
-        raise HTTPException(status_code=400, detail="query required")
-    scope = (body.scope or "chunks").lower()
-    top_k = max(1, min(50, int(body.top_k or 8)))
+async def _compose_llm_stream(client: Any, model: str, query: str, contexts: List[Dict[str, Any]]):
+    """Yield answer text deltas as the completion streams in; errors propagate to the caller."""
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=_compose_messages(query, contexts),
+        temperature=0.2,
+        stream=True,
+    )
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
 
-    # Reuse search pipeline
+
+def _compose_fallback_answer(contexts: List[Dict[str, Any]]) -> str:
+    joined = "\n".join([(c.get("text") or "") for c in contexts])
+    sm = summarize_text_naive(joined, sentences=3, bullets=5)
+    return sm.get("short") or ""
+
+
+def _compose_sources(contexts: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    return [{k: v for k, v in c.items() if k in {"id", "doc_id", "source_url"}} for c in contexts[:top_k]]
+
+
+async def _compose_contexts(body: ComposeAnswerIn, q: str, scope: str, top_k: int) -> List[Dict[str, Any]]:
+    """Retrieve and normalize the context snippets for an answer."""
     items: List[Dict[str, Any]] = []
     try:
         # Use the same logic as search_semantic
-        req = SemanticSearchIn(query=q, scope=scope, top_k=top_k, date=body.date, topic=body.topic)
-        result = search_semantic(req)
+        req = SemanticSearchIn(query=q, scope=scope, top_k=top_k, date=body.date, topic=body.topic, match=body.match, mode=body.mode)
+        result = await run_in_threadpool(_semantic_search, req)
         # Normalize to contexts
         for it in result.get("items", []):
             ctx = {"text": it.get("text") or it.get("snippet"), "id": it.get("id")}
             if it.get("type") == "doc":
-                # fetch URL for doc
-                try:
-                    if ObjectId.is_valid(str(it.get("id"))):
-                        d = database.documents.find_one({"_id": ObjectId(str(it.get("id")))} , {"source_url":1})
-                        if d and d.get("source_url"): ctx["source_url"] = d.get("source_url")
-                except Exception:
-                    pass
+                # doc hits are already hydrated with source_url
+                if it.get("source_url"):
+                    ctx["source_url"] = it.get("source_url")
             else:
                 # chunk: attach doc_id for reference
                 ctx["doc_id"] = it.get("doc_id")
@@ -1371,25 +4210,106 @@ def compose_answer(body: ComposeAnswerIn) -> Dict[str, Any]:
         raise
     except Exception as e:
         # Fallback: simple keyword over documents
-        filt = {"$or": [{"cleaned_text": {"$regex": q, "$options": "i"}}, {"title": {"$regex": q, "$options": "i"}}]}
-        cur = database.documents.find(filt).sort("captured_at", -1).limit(top_k)
+        cur, _, _ = await run_in_threadpool(
+            _keyword_find, database.documents, {}, q, body.match, ["cleaned_text", "title"], _doc_hit_projection(500),
+            limit=top_k,
+        )
         for d in cur:
-            items.append({"text": (d.get("summary") or {}).get("short") or (d.get("cleaned_text") or "")[:500], "id": str(d.get("_id")), "source_url": d.get("source_url")})
+            items.append({"text": _doc_hit(d)["snippet"], "id": str(d.get("_id")), "source_url": d.get("source_url")})
+    return items
+
+
+def _compose_params(body: ComposeAnswerIn) -> Tuple[str, str, int, Optional[str]]:
+    q = (body.query or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="query required")
+    scope = (body.scope or "chunks").lower()
+    top_k = max(1, min(50, int(body.top_k or 8)))
+    llm_model = os.getenv("OPENAI_ANSWER_MODEL", "gpt-4o-mini") if os.getenv("OPENAI_API_KEY") else None
+    return q, scope, top_k, llm_model
+
+
+@app.post("/answer/compose")
+async def compose_answer(body: ComposeAnswerIn) -> Dict[str, Any]:
+    q, scope, top_k, llm_model = _compose_params(body)
+    key = _search_cache_key("compose", body, llm=llm_model, sources=bool(body.include_sources))
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+    gen = corpus_generation.value
+
+    # Reuse search pipeline
+    items = await _compose_contexts(body, q, scope, top_k)
 
     # Compose answer
-    answer = _compose_llm_answer(q, items)
+    answer = await _compose_llm_answer(q, items)
     mode = "llm" if answer else "summary"
     if not answer:
-        joined = "\n".join([(c.get("text") or "") for c in items])
-        sm = summarize_text_naive(joined, sentences=3, bullets=5)
-        answer = sm.get("short") or ""
+        answer = _compose_fallback_answer(items)
 
     out: Dict[str, Any] = {"answer": answer, "mode": mode}
     if body.include_sources:
-        out["sources"] = [{k: v for k, v in c.items() if k in {"id", "doc_id", "source_url"}} for c in items[:top_k]]
+        out["sources"] = _compose_sources(items, top_k)
+    # don't pin a summary fallback caused by a transient LLM failure
+    if mode == "llm" or not llm_model:
+        result_cache.put(key, out, gen)
     return out
 
 
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=_export_default)}\n\n"
+
+
+@app.post("/answer/compose/stream")
+async def compose_answer_stream(body: ComposeAnswerIn) -> StreamingResponse:
+    """Server-sent events: `sources` once retrieval is done, then `token` deltas, then `done`.
+
+    Without an LLM (or if it fails before the first token) the naive summary is
+    sent as a single token. A failure mid-answer sends `error` before `done`.
+    """
+    q, scope, top_k, llm_model = _compose_params(body)
+    # shares the cache entry of a non-streamed compose with sources
+    key = _search_cache_key("compose", body, llm=llm_model, sources=True)
+    cached = result_cache.get(key)
+    gen = corpus_generation.value
+    # retrieval errors still surface as plain HTTP errors
+    items = [] if cached is not None else await _compose_contexts(body, q, scope, top_k)
+
+    async def _events():
+        if cached is not None:
+            yield _sse("sources", {"sources": cached.get("sources") or []})
+            yield _sse("token", {"delta": cached.get("answer") or ""})
+            yield _sse("done", {"mode": cached.get("mode"), "cached": True})
+            return
+        sources = _compose_sources(items, top_k)
+        yield _sse("sources", {"sources": sources})
+        parts: List[str] = []
+        mode = "summary"
+        llm = _answer_llm()
+        if llm is not None:
+            client, model = llm
+            try:
+                async for delta in _compose_llm_stream(client, model, q, items):
+                    parts.append(delta)
+                    yield _sse("token", {"delta": delta})
+                mode = "llm"
+            except Exception as e:
+                if parts:
+                    yield _sse("error", {"detail": f"LLM stream failed: {e}"})
+                    yield _sse("done", {"mode": "llm", "partial": True})
+                    return
+        if mode != "llm":
+            parts = [_compose_fallback_answer(items)]
+            yield _sse("token", {"delta": parts[0]})
+        yield _sse("done", {"mode": mode})
+        if mode == "llm" or not llm_model:
+            result_cache.put(key, {"answer": "".join(parts).strip(), "mode": mode, "sources": sources}, gen)
+
+    return StreamingResponse(
+        _events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 class ReprocessDocIn(BaseModel):
     chunk_size: Optional[int] = 1000
     chunk_overlap: Optional[int] = 150
@@ -1412,7 +4332,19 @@ def categorize_doc_endpoint(doc_id: str) -> Dict[str, Any]:
         out = _categorize_openai(text)
     if not out:
         out = _categorize_heuristic(text)
+    out = _normalize_topics(out)
     database.documents.update_one({"_id": ObjectId(doc_id)}, {"$set": {"topics": out, "updated_at": datetime.utcnow()}})
+    old_topic, new_topic = (doc.get("topics") or {}).get("primary"), (out or {}).get("primary")
+    _rollup_move_topic(database, doc.get("day_bucket"), old_topic, new_topic)
+    if old_topic != new_topic:
+        _topics_apply(database, [(old_topic, -1, None), (new_topic, 1, doc.get("captured_at"))])
+        # a cleared topic is propagated too, or filters would keep matching the old one
+        try:
+            _rename_chunk_topics({"doc_id": ObjectId(doc_id)}, new_topic or None)
+            _rename_point_topics("doc_id", [doc_id], new_topic or None)
+        except Exception:
+            logger.exception("categorize %s: propagating topic %r to chunks/points failed", doc_id, new_topic)
+    corpus_generation.bump()
     return out or {"primary": None, "labels": []}
 
 
@@ -1431,7 +4363,6 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
     overlap = int(body.chunk_overlap or 150)
     replace = bool(body.replace_chunks if body.replace_chunks is not None else True)
     chunks = _chunk_text(text, size, overlap)
-    embed_fn = _choose_embeddings()
 
     # Optionally remove old chunks and qdrant points
     removed = 0
@@ -1441,11 +4372,15 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
             removed = res.deleted_count
         except Exception:
             removed = 0
+        if lexical_index is not None:
+            lexical_index.remove_doc(doc_id)
+        if vector_index is not None:
+            vector_index.remove_doc(doc_id)
+        corpus_generation.bump()
         # Qdrant delete by filter payload doc_id
         try:
-            if qdrant_mgr and getattr(qdrant_mgr, 'enabled', False):
-                from qdrant_client.http.models import Filter as QF, FieldCondition as FC, MatchValue as MV  # type: ignore
-                qdrant_mgr.client.delete(collection_name=qdrant_mgr.col_chunks, points_selector=QF(must=[FC(key="doc_id", match=MV(value=str(doc_id)))]))
+            if qdrant_mgr and getattr(qdrant_mgr, 'configured', False):
+                qdrant_mgr.delete_doc_points(qdrant_mgr.col_chunks, doc_id)
         except Exception:
             pass
 
@@ -1458,15 +4393,9 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
     captured_hour = captured_at.hour
 
     chunk_docs: List[Dict[str, Any]] = []
-    vectors: List[Optional[List[float]]] = []
+    vectors = embedding_service.embed_documents(chunks)
     for i, ch in enumerate(chunks):
-        vec = None
-        if embed_fn:
-            try:
-                vec = embed_fn(ch)
-            except Exception:
-                vec = None
-        vectors.append(vec)
+        vec = vectors[i] if i < len(vectors) else None
         chunk_docs.append({
             "doc_id": ObjectId(doc_id),
             "idx": i,
@@ -1475,8 +4404,8 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
             "section": None,
             "char_start": None,
             "char_end": None,
-            "embedding": vec,
-            "topics": None,
+            **_encode_embedding(vec),
+            "topics": _chunk_topics(doc),
             "captured_at": captured_at,
             "captured_hour": captured_hour,
             "day_bucket": day_bucket,
@@ -1487,27 +4416,18 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
         if chunk_docs:
             r = database.doc_chunks.insert_many(chunk_docs)
             inserted_ids = [str(i) for i in r.inserted_ids]
+            if lexical_index is not None:
+                lexical_index.add_chunks(chunk_docs)
+            if vector_index is not None:
+                vector_index.add_chunks(chunk_docs, vectors)
+            corpus_generation.bump()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Insert chunks failed: {e}")
 
     # Qdrant upsert
     try:
-        if qdrant_mgr and getattr(qdrant_mgr, 'enabled', False):
-            points = []
-            for oid, chdoc in zip(inserted_ids, chunk_docs):
-                vec = chdoc.get("embedding")
-                if not vec:
-                    continue
-                pid = _qdrant_point_id(oid)
-                payload = {k: v for k, v in chdoc.items() if k != "embedding"}
-                payload["_id"] = oid
-                payload["doc_id"] = str(doc_id)
-                db = payload.get("day_bucket")
-                if isinstance(db, datetime):
-                    payload["day_bucket_str"] = db.date().isoformat()
-                points.append(PointStruct(id=pid, vector=vec, payload=payload))
-            if points:
-                qdrant_mgr.client.upsert(collection_name=qdrant_mgr.col_chunks, points=points, wait=False)
+        if qdrant_mgr and getattr(qdrant_mgr, 'configured', False):
+            qdrant_mgr.upsert_chunks(ObjectId(doc_id), chunk_docs, vectors)
     except Exception:
         pass
 
@@ -1517,77 +4437,386 @@ def reprocess_doc_endpoint(doc_id: str, body: ReprocessDocIn) -> Dict[str, Any]:
 # -----------------------------
 # Topics management
 # -----------------------------
+def _topic_slug(primary: Any) -> Optional[str]:
+    """Normalized slash path for a `topics.primary` value ("ai/ agents/" -> "ai/agents")."""
+    if not isinstance(primary, str):
+        return None
+    return "/".join(p.strip() for p in primary.split("/") if p.strip()) or None
+
+
+def _normalize_topics(topics: Any) -> Any:
+    """`topics` with `primary` stored as its slug, so filters and `/topics` ids match stored values."""
+    if not isinstance(topics, dict) or "primary" not in topics:
+        return topics
+    return {**topics, "primary": _topic_slug(topics.get("primary"))}
+
+
+def _topic_variants(topics: List[str]) -> List[str]:
+    """Slugs of `topics` plus every stored `topics.primary` spelling that normalizes to one of them."""
+    wanted = {s for s in map(_topic_slug, topics) if s}
+    stored = database.documents.distinct("topics.primary", {"topics.primary": {"$type": "string"}})
+    return sorted(wanted | {t for t in stored if _topic_slug(t) in wanted})
+
+
+def _topic_node_insert(parts: List[str], now: datetime) -> Dict[str, Any]:
+    return {
+        "name": parts[-1],
+        "parent_id": "/".join(parts[:-1]) or None,
+        "depth": len(parts) - 1,
+        "search": "/".join(parts).lower(),
+        "created_at": now,
+    }
+
+
+def _topics_apply(db, changes: List[Tuple[Any, int, Optional[datetime]]]) -> None:
+    """Apply (primary, delta, seen_at) changes to the materialized `topics` tree.
+
+    `count` is documents whose primary is exactly the node, `subtree_count`
+    includes descendants, so every ancestor of a changed path moves too.
+    Nodes whose subtree drops to zero are removed. Best-effort: /topics/rebuild
+    repairs drift.
+    """
+    acc: Dict[str, Dict[str, Any]] = {}
+    for primary, delta, seen in changes:
+        slug = _topic_slug(primary)
+        if not slug or not delta:
+            continue
+        parts = slug.split("/")
+        for depth in range(len(parts)):
+            path = "/".join(parts[:depth + 1])
+            a = acc.setdefault(path, {"count": 0, "subtree_count": 0, "seen": None, "parts": parts[:depth + 1]})
+            a["subtree_count"] += delta
+            if path == slug:
+                a["count"] += delta
+            if seen and delta > 0 and (a["seen"] is None or seen > a["seen"]):
+                a["seen"] = seen
+    acc = {k: a for k, a in acc.items() if a["subtree_count"] or a["count"]}
+    if not acc:
+        return
+    now = datetime.utcnow()
+    ops = []
+    for path, a in acc.items():
+        update: Dict[str, Any] = {
+            "$inc": {"count": a["count"], "subtree_count": a["subtree_count"]},
+            "$set": {"updated_at": now},
+            "$setOnInsert": _topic_node_insert(a["parts"], now),
+        }
+        if a["seen"]:
+            update["$max"] = {"last_seen_at": a["seen"]}
+        ops.append(UpdateOne({"slug": path}, update, upsert=a["subtree_count"] > 0))
+    shrunk = [path for path, a in acc.items() if a["subtree_count"] < 0]
+    try:
+        db.topics.bulk_write(ops, ordered=False)
+        if shrunk:
+            db.topics.delete_many({"slug": {"$in": shrunk}, "subtree_count": {"$lte": 0}})
+    except PyMongoError:
+        pass
+
+
+def _topics_record_docs(db, docs: List[Dict[str, Any]]) -> None:
+    _topics_apply(db, [((d.get("topics") or {}).get("primary"), 1, d.get("captured_at")) for d in docs])
+
+
+def _recount_topics(db, primaries: List[Any]) -> None:
+    """Recompute the nodes of `primaries` and their ancestors from documents.
+
+    Unlike `_topics_apply` deltas this is exact however often, or however far,
+    an earlier pass ran, so jobs that can repeat or stop halfway finish with it.
+    """
+    slugs = {s for s in map(_topic_slug, primaries) if s}
+    paths = {"/".join(s.split("/")[:d + 1]) for s in slugs for d in range(s.count("/") + 1)}
+    if not paths:
+        return
+    roots = sorted({p.split("/")[0] for p in paths})
+    rows = db.documents.aggregate([
+        {"$match": {"topics.primary": {"$regex": "^\\s*(?:" + "|".join(re.escape(r) for r in roots) + ")"}}},
+        {"$group": {"_id": "$topics.primary", "count": {"$sum": 1}, "last_seen_at": {"$max": "$captured_at"}}},
+    ])
+    nodes: Dict[str, Dict[str, Any]] = {p: {"count": 0, "subtree_count": 0, "last_seen_at": None} for p in paths}
+    for r in rows:
+        slug = _topic_slug(r["_id"])
+        if not slug:
+            continue
+        parts = slug.split("/")
+        for depth in range(len(parts)):
+            n = nodes.get("/".join(parts[:depth + 1]))
+            if n is None:
+                continue
+            n["subtree_count"] += r["count"]
+            if depth == len(parts) - 1:
+                n["count"] += r["count"]
+            seen = r.get("last_seen_at")
+            if seen and (n["last_seen_at"] is None or seen > n["last_seen_at"]):
+                n["last_seen_at"] = seen
+    now = datetime.utcnow()
+    ops = []
+    for path, n in nodes.items():
+        if n["subtree_count"] <= 0:
+            continue
+        update: Dict[str, Any] = {
+            "$set": {"count": n["count"], "subtree_count": n["subtree_count"], "updated_at": now},
+            "$setOnInsert": _topic_node_insert(path.split("/"), now),
+        }
+        if n["last_seen_at"]:
+            update["$max"] = {"last_seen_at": n["last_seen_at"]}
+        ops.append(UpdateOne({"slug": path}, update, upsert=True))
+    if ops:
+        db.topics.bulk_write(ops, ordered=False)
+    empty = [path for path, n in nodes.items() if n["subtree_count"] <= 0]
+    if empty:
+        db.topics.delete_many({"slug": {"$in": empty}})
+
+
+def _rebuild_topics(db) -> Dict[str, int]:
+    """Recompute the whole `topics` tree from one $group over documents."""
+    rows = db.documents.aggregate([
+        {"$match": {"topics.primary": {"$type": "string"}}},
+        {"$group": {"_id": "$topics.primary", "count": {"$sum": 1}, "last_seen_at": {"$max": "$captured_at"}}},
+    ])
+    nodes: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        slug = _topic_slug(r["_id"])
+        if not slug:
+            continue
+        parts = slug.split("/")
+        for depth in range(len(parts)):
+            path = "/".join(parts[:depth + 1])
+            n = nodes.setdefault(path, {"count": 0, "subtree_count": 0, "last_seen_at": None, "parts": parts[:depth + 1]})
+            n["subtree_count"] += r["count"]
+            if path == slug:
+                n["count"] += r["count"]
+            seen = r.get("last_seen_at")
+            if seen and (n["last_seen_at"] is None or seen > n["last_seen_at"]):
+                n["last_seen_at"] = seen
+    now = datetime.utcnow()
+    ops = []
+    for path, n in nodes.items():
+        parts = n.pop("parts")
+        node = _topic_node_insert(parts, now)
+        created_at = node.pop("created_at")
+        ops.append(UpdateOne(
+            {"slug": path},
+            {"$set": {**n, **node, "updated_at": now}, "$setOnInsert": {"created_at": created_at}},
+            upsert=True,
+        ))
+    if ops:
+        db.topics.bulk_write(ops, ordered=False)
+    removed = db.topics.delete_many({"slug": {"$nin": list(nodes)}}).deleted_count
+    return {"topics": len(nodes), "removed": removed}
+
+
+_topics_backfill_checked = False
+
+
+def _ensure_topics_backfilled(db) -> None:
+    """Fill `topics` once for corpora ingested before it was maintained."""
+    global _topics_backfill_checked
+    if _topics_backfill_checked:
+        return
+    _topics_backfill_checked = True
+    try:
+        if db.topics.find_one({}, {"_id": 1}) is None and \
+                db.documents.find_one({"topics.primary": {"$type": "string"}}, {"_id": 1}) is not None:
+            _rebuild_topics(db)
+    except PyMongoError:
+        _topics_backfill_checked = False
+
+
+def _serialize_topic(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "topic": d.get("slug"),
+        "name": d.get("name"),
+        "parent": d.get("parent_id"),
+        "depth": d.get("depth", 0),
+        "count": d.get("count", 0),
+        "subtree_count": d.get("subtree_count", 0),
+        "has_children": (d.get("subtree_count") or 0) > (d.get("count") or 0),
+        "last_seen_at": d.get("last_seen_at"),
+    }
+
+
 @app.get("/topics")
-def list_topics(q: Optional[str] = Query(default=None), limit: int = Query(default=100, ge=1, le=1000)) -> Dict[str, Any]:
+def list_topics(
+    q: Optional[str] = Query(default=None, description="case-insensitive prefix of the topic path"),
+    parent: Optional[str] = Query(default=None, description="list children of this path; empty for roots"),
+    limit: int = Query(default=100, ge=1, le=1000),
+) -> Dict[str, Any]:
     try:
-        pipeline: List[Dict[str, Any]] = [
-            {"$match": {"topics.primary": {"$exists": True, "$ne": None, "$ne": ""}}},
-            {"$group": {"_id": "$topics.primary", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": int(limit)},
-        ]
-        if q:
-            pipeline.insert(0, {"$match": {"topics.primary": {"$regex": q, "$options": "i"}}})
-        rows = list(database.documents.aggregate(pipeline))
-        items = [{"topic": r["_id"], "count": r["count"]} for r in rows]
+        _ensure_topics_backfilled(database)
+        filt: Dict[str, Any] = {}
+        if parent is not None:
+            # tree browsing: every node under `parent`, ranked by subtree size
+            filt["parent_id"] = _topic_slug(parent)
+            filt["subtree_count"] = {"$gt": 0}
+            sort_field = "subtree_count"
+        else:
+            # flat list of topics documents actually carry
+            filt["count"] = {"$gt": 0}
+            sort_field = "count"
+        if q and q.strip():
+            filt["search"] = {"$regex": "^" + re.escape(q.strip().lower())}
+        rows = database.topics.find(filt).sort([(sort_field, -1), ("slug", 1)]).limit(int(limit))
+        items = [_serialize_topic(d) for d in rows]
         return {"items": items, "total": len(items)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/topics/rebuild")
+def rebuild_topics() -> Dict[str, Any]:
+    try:
+        return _rebuild_topics(database)
+    except PyMongoError as e:
+        raise HTTPException(status_code=500, detail=f"DB error: {e}")
+
+
 class TopicRenameIn(BaseModel):
-    from_topic: str
+    from_topic: Optional[str] = None
+    from_topics: Optional[List[str]] = None  # merge several topics into to_topic
     to_topic: str
+    background: Optional[bool] = False  # True: return 202 with a run id instead of the result
+
+
+def _rename_chunk_topics(filt: Dict[str, Any], dst: Optional[str]) -> int:
+    """Point chunks matching `filt` at `dst`; chunks stored with `topics: null` get a fresh object.
+
+    `dst=None` clears the topic (`topics: null`, as `_chunk_topics` stores untopiced chunks).
+    """
+    now = datetime.utcnow()
+    if dst is None:
+        return database.doc_chunks.update_many(
+            {"$and": [filt, {"topics": {"$ne": None}}]}, {"$set": {"topics": None, "updated_at": now}},
+        ).modified_count
+    n = database.doc_chunks.update_many(
+        {"$and": [filt, {"topics": None}]}, {"$set": {"topics": {"primary": dst}, "updated_at": now}},
+    ).modified_count
+    n += database.doc_chunks.update_many(
+        {"$and": [filt, {"topics": {"$ne": None}}, {"topics.primary": {"$ne": dst}}]},
+        {"$set": {"topics.primary": dst, "updated_at": now}},
+    ).modified_count
+    return n
+
+
+def _rename_point_topics(key: str, values: List[str], dst: Optional[str]) -> None:
+    """set_payload on every doc and chunk point whose `key` payload is in `values` (None clears the topic)."""
+    if not values:
+        return
+    if vector_outbox is not None:
+        # writes still queued would otherwise restore the old topic
+        vector_outbox.coll.update_many({f"payload.{key}": {"$in": values}}, {"$set": {"payload.topics_primary": dst}})
+    if not (qdrant_mgr and qdrant_mgr.enabled):
+        return
+    selector = QFilter(must=[FieldCondition(key=key, match=MatchAny(any=values))])
+    for col in (qdrant_mgr.col_docs, qdrant_mgr.col_chunks):
+        qdrant_mgr.client.set_payload(collection_name=col, payload={"topics_primary": dst}, points=selector, wait=True)
+
+
+def _topic_rename_job(sources: List[str], dst: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+    """Move every document on `sources` to `dst` in batches, with its chunks and Qdrant points.
+
+    Chunks and vector payloads of a batch are updated before its documents, so
+    an interrupted run leaves those documents on the old topic and a rerun (or
+    the resume at startup) picks the batch up again. Topic counts get
+    incremental deltas only for batches this run moved in full; the run ends by
+    recounting the affected topics, so overlapping or resumed runs (and a crash
+    between the document update and the deltas) leave exact counts.
+    """
+    batch = max(1, int(os.getenv("TOPIC_RENAME_BATCH", "500")))
+    srcs = [t for t in sources if t != dst]
+    progress = {"documents": 0, "chunks": 0, "batches": 0}
+    oid = ObjectId(run_id) if run_id else None
+    for t in srcs:
+        _rollup_mark_topic_stale(database, t)
+    while srcs:
+        rows = list(database.documents.find(
+            {"topics.primary": {"$in": srcs}}, {"topics.primary": 1, "captured_at": 1},
+        ).limit(batch))
+        if not rows:
+            break
+        ids = [r["_id"] for r in rows]
+        progress["chunks"] += _rename_chunk_topics({"doc_id": {"$in": ids}}, dst)
+        _rename_point_topics("doc_id", [str(i) for i in ids], dst)
+        res = database.documents.update_many(
+            {"_id": {"$in": ids}, "topics.primary": {"$in": srcs}},
+            {"$set": {"topics.primary": dst, "updated_at": datetime.utcnow()}},
+        )
+        if res.modified_count == len(rows):
+            # another run moved some of these first; the final recount covers that case
+            seen = max((r["captured_at"] for r in rows if r.get("captured_at")), default=None)
+            _topics_apply(database, [(r["topics"]["primary"], -1, None) for r in rows] + [(dst, len(rows), seen)])
+        corpus_generation.bump()
+        progress["documents"] += res.modified_count
+        progress["batches"] += 1
+        if oid is not None:
+            try:
+                database.agent_runs.update_one({"_id": oid}, {"$set": {"progress": dict(progress)}})
+            except PyMongoError:
+                pass
+    # sweep chunks/points left behind by renames that only touched documents
+    if srcs:
+        progress["chunks"] += _rename_chunk_topics({"topics.primary": {"$in": srcs}}, dst)
+        _rename_point_topics("topics_primary", srcs, dst)
+        _recount_topics(database, srcs + [dst])
+    # keep the keys the synchronous endpoint has always returned
+    return {**progress, "matched": progress["documents"], "modified": progress["documents"]}
+
+
+# idempotent jobs a dead process left unfinished are rerun by whichever worker claims them
+agent_jobs.resumable(
+    "topic-rename",
+    lambda params: lambda rid: _topic_rename_job(params.get("sources") or [], params.get("to") or "", run_id=rid),
+)
+agent_jobs.resumable(
+    "vector-migrate",
+    lambda params: lambda rid: _vector_migrate_job(params.get("target") or "full", run_id=rid),
+)
+agent_jobs.resumable("vector-reconcile", lambda params: lambda rid: _vector_reconcile_job(run_id=rid))
 
 
 @app.post("/topics/rename")
-def rename_topic(body: TopicRenameIn) -> Dict[str, Any]:
-    src = (body.from_topic or "").strip()
-    dst = (body.to_topic or "").strip()
-    if not src or not dst:
-        raise HTTPException(status_code=400, detail="from_topic and to_topic required")
+def rename_topic(body: TopicRenameIn, response: Response) -> Dict[str, Any]:
+    sources = [t for t in ([body.from_topic] if body.from_topic else []) + list(body.from_topics or []) if _topic_slug(t)]
+    dst = _topic_slug(body.to_topic) or ""
+    if not sources or not dst:
+        raise HTTPException(status_code=400, detail="from_topic (or from_topics) and to_topic required")
     try:
-        res = database.documents.update_many({"topics.primary": src}, {"$set": {"topics.primary": dst, "updated_at": datetime.utcnow()}})
-        return {"matched": res.matched_count, "modified": res.modified_count}
+        # match stored spellings that differ only in whitespace/slashes (renaming a topic to itself cleans them up)
+        sources = _topic_variants(sources)
+        if body.background:
+            run_id = agent_jobs.submit(
+                "topic-rename", {"sources": sources, "to": dst},
+                lambda rid: _topic_rename_job(sources, dst, run_id=rid),
+            )
+            response.status_code = 202
+            return {"run_id": run_id, "status": "queued", "status_url": f"/agent/runs/{run_id}"}
+        return _topic_rename_job(sources, dst)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/agent/ingest-url")
-def agent_ingest_url(body: AgentIngestUrl) -> Dict[str, Any]:
+async def agent_ingest_url(body: AgentIngestUrl, response: Response) -> Dict[str, Any]:
     url = (body.url or "").strip()
     if not url:
         raise HTTPException(status_code=400, detail="url required")
-    # Reuse scrape logic to get markdown/html
-    firecrawl = os.getenv("FIRECRAWL_BASE_URL", "http://localhost:8010").rstrip("/")
+    size, overlap = body.chunk_size or 1000, body.chunk_overlap or 150
     try:
-        r = httpx.post(f"{firecrawl}/scrape", json={"url": url, "formats": ["markdown", "html"]}, timeout=60)
-        r.raise_for_status()
-        payload = r.json() or {}
-        def _find_first(obj, keys):
-            if isinstance(obj, dict):
-                for k in keys:
-                    v = obj.get(k)
-                    if isinstance(v, str) and v.strip():
-                        return v
-                for v in obj.values():
-                    res = _find_first(v, keys)
-                    if res:
-                        return res
-            elif isinstance(obj, list):
-                for it in obj:
-                    res = _find_first(it, keys)
-                    if res:
-                        return res
-            return None
-        markdown = _find_first(payload, ["markdown", "content_markdown", "markdown_text"]) or ""
-        if not markdown:
-            html_val = _find_first(payload, ["html", "content_html", "contentHtml"]) or ""
-            if html_val:
-                markdown = _html_to_md_basic(html_val)
-        text = (markdown or "").strip()
-        meta = {"ui": "agent", "source_url": url, "canonical_url": url, "title": None, "content_type": "web"}
-        return _run_pipeline(text, meta, body.chunk_size or 1000, body.chunk_overlap or 150)
+        if body.background:
+            run_id = await run_in_threadpool(
+                agent_jobs.submit, "ingest-url", {"url": url},
+                lambda rid: _ingest_url_job(url, size, overlap, run_id=rid),
+            )
+            response.status_code = 202
+            return {"run_id": run_id, "status": "queued", "status_url": f"/agent/runs/{run_id}"}
+        # the scrape waits on the shared client; only the pipeline needs a worker thread
+        text = (await _ascrape_markdown(url) or "").strip()
+        if not text:
+            raise HTTPException(status_code=422, detail="Scrape returned no content")
+        return await run_in_threadpool(_run_pipeline, text, _url_ingest_meta(url), size, overlap)
+    except HTTPException:
+        raise
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Firecrawl error: {e}")
     except PyMongoError as e:
@@ -1597,7 +4826,7 @@ def agent_ingest_url(body: AgentIngestUrl) -> Dict[str, Any]:
 
 
 @app.get("/agent/status")
-def agent_status() -> Dict[str, Any]:
+async def agent_status() -> Dict[str, Any]:
     provider = os.getenv("EMBEDDING_PROVIDER", "none")
     firecrawl = os.getenv("FIRECRAWL_BASE_URL", "").rstrip("/")
     qd: Dict[str, Any] = {"enabled": False}
@@ -1613,50 +4842,72 @@ def agent_status() -> Dict[str, Any]:
             "collections": {"docs": qdrant_mgr.col_docs, "chunks": qdrant_mgr.col_chunks},
             "vector_size": qdrant_mgr.vec_size,
             "distance": dist_name,
+            "quantization": qdrant_mgr.quantization,
+            "on_disk": qdrant_mgr.on_disk,
             "url": os.getenv("QDRANT_URL", "")
         }
+    # the outbox counts are pymongo calls; keep them off the event loop
+    outbox = await run_in_threadpool(vector_outbox.stats) if vector_outbox is not None else {"enabled": False}
     return {
         "langgraph": HAVE_LANGGRAPH,
         "langchain": HAVE_LANGCHAIN,
         "embedding_provider": provider,
+        "embedding_batch_size": embedding_service.batch_size,
+        "embedding_cache": embedding_cache.snapshot(),
+        "vector_storage": _vector_storage_mode(),
+        "vector_outbox": outbox,
         "qdrant": qd,
+        "agent_jobs": agent_jobs.stats(),
+        "result_cache": result_cache.snapshot(),
+        "crawls": crawl_manager.stats(),
+        "lexical_index": lexical_index.stats() if lexical_index is not None else {"ready": False},
+        "vector_index": vector_index.stats() if vector_index is not None else {"ready": False},
         "env": {"FIRECRAWL_BASE_URL": firecrawl}
     }
 
 
+@app.get("/agent/runs")
+async def list_agent_runs(
+    status: Optional[str] = Query(default=None, description="queued | running | completed | failed"),
+    limit: int = Query(default=20, ge=1, le=200),
+) -> Dict[str, Any]:
+    filt: Dict[str, Any] = {"status": status} if status else {}
+    cursor = _adb().agent_runs.find(filt, {"result.chunk_ids": 0}).sort("started_at", -1).limit(int(limit))
+    items = [_serialize_run(d) async for d in cursor]
+    return {"items": items, "total": len(items)}
+
+
+@app.get("/agent/runs/{run_id}")
+async def get_agent_run(run_id: str) -> Dict[str, Any]:
+    if not ObjectId.is_valid(run_id):
+        raise HTTPException(status_code=400, detail="Invalid run id")
+    doc = await _adb().agent_runs.find_one({"_id": ObjectId(run_id)})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return _serialize_run(doc)
+
+
 # -----------------------------
 # Browse endpoints
 # -----------------------------
-@app.get("/documents")
-def list_documents(
-    q: Optional[str] = Query(default=None, description="Regex on cleaned_text/title"),
-    topic: Optional[str] = Query(default=None, description="Filter by topics.primary"),
-    date: Optional[str] = Query(default=None, description="YYYY-MM-DD UTC day"),
-    start: Optional[str] = Query(default=None, description="ISO start datetime"),
-    end: Optional[str] = Query(default=None, description="ISO end datetime"),
-    skip: int = Query(default=0, ge=0),
-    limit: int = Query(default=20, ge=1, le=100),
+def _browse_filter(
+    topic: Optional[str] = None,
+    date: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    doc_id: Optional[str] = None,
 ) -> Dict[str, Any]:
+    """Mongo filter shared by /documents, /chunks and /export/*; unparseable dates are ignored."""
     filt: Dict[str, Any] = {}
-    if q:
-        filt["$or"] = [
-            {"cleaned_text": {"$regex": q, "$options": "i"}},
-            {"title": {"$regex": q, "$options": "i"}},
-        ]
+    if doc_id:
+        if not ObjectId.is_valid(doc_id):
+            raise HTTPException(status_code=400, detail="Invalid doc_id")
+        filt["doc_id"] = ObjectId(doc_id)
     if topic:
-        filt["topics.primary"] = topic
-    # Date range logic
-    def _parse_utc_date(s: str) -> datetime:
-        d = datetime.fromisoformat(s)  # type: ignore
-        if isinstance(d, datetime) and d.tzinfo is None:
-            return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
-        return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
-    if date:
-        try:
-            day = _parse_utc_date(date)
-            filt["day_bucket"] = day
-        except Exception:
-            pass
+        filt["topics.primary"] = _topic_slug(topic) or topic
+    day = _day_bucket_from_str(date)
+    if day:
+        filt["day_bucket"] = day
     # start/end on captured_at
     range_cond: Dict[str, Any] = {}
     for key, val in (("$gte", start), ("$lte", end)):
@@ -1670,15 +4921,34 @@ def list_documents(
                 pass
     if range_cond:
         filt["captured_at"] = range_cond
+    return filt
 
-    cursor = (
-        database.documents.find(filt, {
-            "cleaned_text": 0, "raw_html": 0, "raw_markdown": 0, "embedding": 0, "entities": 0
-        })
-        .sort("captured_at", -1)
-        .skip(int(skip))
-        .limit(int(limit))
-    )
+
+@app.get("/documents")
+def list_documents(
+    q: Optional[str] = Query(default=None, description="Keyword search on cleaned_text/title"),
+    match: str = Query(default="text", description="'text' (text index, ranked) or 'regex'"),
+    topic: Optional[str] = Query(default=None, description="Filter by topics.primary"),
+    date: Optional[str] = Query(default=None, description="YYYY-MM-DD UTC day"),
+    start: Optional[str] = Query(default=None, description="ISO start datetime"),
+    end: Optional[str] = Query(default=None, description="ISO end datetime"),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+    after: Optional[str] = Query(default=None, description="next_after from the previous page"),
+    count: str = Query(default="exact", description="'exact', 'estimated' or 'none'"),
+) -> Dict[str, Any]:
+    if q and after:
+        raise HTTPException(status_code=400, detail="after is not supported with q; use skip")
+    filt = _browse_filter(topic=topic, date=date, start=start, end=end)
+
+    projection = {"cleaned_text": 0, "raw_html": 0, "raw_markdown": 0, "embedding": 0, "embedding_q": 0, "entities": 0}
+    next_after = None
+    if q:
+        cursor, filt, match = _keyword_find(
+            database.documents, filt, q, match, ["cleaned_text", "title"], projection, skip=skip, limit=limit,
+        )
+    else:
+        cursor, next_after = _keyset_find(database.documents, filt, after, limit, projection, skip=skip)
     items = []
     for d in cursor:
         items.append({
@@ -1690,9 +4960,17 @@ def list_documents(
             "captured_at": d.get("captured_at"),
             "tokens": d.get("tokens"),
             "summary": (d.get("summary") or {}).get("short"),
+            **({"score": d["score"]} if "score" in d else {}),
         })
-    total = database.documents.count_documents(filt)
-    return {"items": items, "total": total, "skip": skip, "limit": limit}
+    total, exact = _page_total(database.documents, filt, count)
+    out: Dict[str, Any] = {"items": items, "total": total, "skip": skip, "limit": limit}
+    if not q:
+        out["next_after"] = next_after
+    if exact is False:
+        out["total_exact"] = False
+    if q:
+        out["match"] = match
+    return out
 
 
 @app.get("/chunks")
@@ -1702,28 +4980,11 @@ def list_chunks(
     date: Optional[str] = Query(default=None),
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=200),
+    after: Optional[str] = Query(default=None, description="next_after from the previous page"),
+    count: str = Query(default="exact", description="'exact', 'estimated' or 'none'"),
 ) -> Dict[str, Any]:
-    filt: Dict[str, Any] = {}
-    if doc_id:
-        if not ObjectId.is_valid(doc_id):
-            raise HTTPException(status_code=400, detail="Invalid doc_id")
-        filt["doc_id"] = ObjectId(doc_id)
-    if topic:
-        filt["topics.primary"] = topic
-    if date:
-        try:
-            d = datetime.fromisoformat(date)
-            if d.tzinfo is None:
-                d = d.replace(tzinfo=timezone.utc)
-            filt["day_bucket"] = datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
-        except Exception:
-            pass
-    cursor = (
-        database.doc_chunks.find(filt, {"embedding": 0})
-        .sort("captured_at", -1)
-        .skip(int(skip))
-        .limit(int(limit))
-    )
+    filt = _browse_filter(topic=topic, date=date, doc_id=doc_id)
+    cursor, next_after = _keyset_find(database.doc_chunks, filt, after, limit, {"embedding": 0, "embedding_q": 0}, skip=skip)
     items = []
     for c in cursor:
         items.append({
@@ -1734,13 +4995,307 @@ def list_chunks(
             "text": (c.get("text") or "")[:260],
             "captured_at": c.get("captured_at"),
         })
-    total = database.doc_chunks.count_documents(filt)
-    return {"items": items, "total": total, "skip": skip, "limit": limit}
+    total, exact = _page_total(database.doc_chunks, filt, count)
+    out: Dict[str, Any] = {"items": items, "total": total, "skip": skip, "limit": limit, "next_after": next_after}
+    if exact is False:
+        out["total_exact"] = False
+    return out
+
+
+# -----------------------------
+# Streaming export
+# -----------------------------
+def _export_default(o: Any) -> Any:
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, datetime):
+        return o.isoformat()
+    if isinstance(o, bytes):
+        return o.hex()
+    raise TypeError(f"{type(o).__name__} is not JSON serializable")
+
+
+def _export_response(coll_name: str, filt: Dict[str, Any], projection: Optional[Dict[str, Any]], fmt: str,
+                     limit: int) -> StreamingResponse:
+    """Stream every match of one server-side cursor as NDJSON or SSE.
+
+    Records are encoded as they come off the cursor and flushed every
+    EXPORT_FLUSH_RECORDS lines, so memory stays bounded by the cursor batch.
+    """
+    fmt = (fmt or "ndjson").lower()
+    if fmt not in {"ndjson", "sse"}:
+        raise HTTPException(status_code=400, detail="format must be ndjson or sse")
+    batch_size = max(1, int(os.getenv("EXPORT_BATCH_SIZE", "500")))
+    flush_every = max(1, int(os.getenv("EXPORT_FLUSH_RECORDS", "100")))
+
+    async def _gen():
+        cursor = _adb()[coll_name].find(filt, projection, batch_size=batch_size).sort("captured_at", -1)
+        if limit:
+            cursor = cursor.limit(int(limit))
+        recs: List[Dict[str, Any]] = []
+        buf: List[str] = []
+        count = 0
+
+        async def _encode(records):
+            if projection is None:
+                # compact/ref vectors are exported as plain float lists
+                await run_in_threadpool(_decode_embeddings, records, _vector_collection(coll_name))
+            for d in records:
+                line = json.dumps(d, default=_export_default, separators=(",", ":"))
+                buf.append(f"data: {line}\n\n" if fmt == "sse" else line + "\n")
+
+        async for d in cursor:
+            recs.append(d)
+            count += 1
+            if len(recs) >= flush_every:
+                await _encode(recs)
+                recs = []
+                yield "".join(buf)
+                buf = []
+        if recs:
+            await _encode(recs)
+        if fmt == "sse":
+            buf.append(f"event: end\ndata: {json.dumps({'count': count})}\n\n")
+        if buf:
+            yield "".join(buf)
+
+    if fmt == "sse":
+        return StreamingResponse(_gen(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    return StreamingResponse(
+        _gen(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{coll_name}.ndjson"'},
+    )
+
+
+@app.get("/export/documents")
+async def export_documents(
+    topic: Optional[str] = Query(default=None, description="Filter by topics.primary"),
+    date: Optional[str] = Query(default=None, description="YYYY-MM-DD UTC day"),
+    start: Optional[str] = Query(default=None, description="ISO start datetime"),
+    end: Optional[str] = Query(default=None, description="ISO end datetime"),
+    include_embeddings: bool = Query(default=False),
+    format: str = Query(default="ndjson", description="'ndjson' or 'sse'"),
+    limit: int = Query(default=0, ge=0, description="0 = everything"),
+):
+    filt = _browse_filter(topic=topic, date=date, start=start, end=end)
+    projection = None if include_embeddings else {"embedding": 0, "embedding_q": 0}
+    return _export_response("documents", filt, projection, format, limit)
+
+
+@app.get("/export/chunks")
+async def export_chunks(
+    doc_id: Optional[str] = Query(default=None),
+    topic: Optional[str] = Query(default=None),
+    date: Optional[str] = Query(default=None, description="YYYY-MM-DD UTC day"),
+    start: Optional[str] = Query(default=None, description="ISO start datetime"),
+    end: Optional[str] = Query(default=None, description="ISO end datetime"),
+    include_embeddings: bool = Query(default=False),
+    format: str = Query(default="ndjson", description="'ndjson' or 'sse'"),
+    limit: int = Query(default=0, ge=0, description="0 = everything"),
+):
+    filt = _browse_filter(topic=topic, date=date, start=start, end=end, doc_id=doc_id)
+    projection = None if include_embeddings else {"embedding": 0, "embedding_q": 0}
+    return _export_response("doc_chunks", filt, projection, format, limit)
 
 
 # -----------------------------
 # Daily rollup generation
 # -----------------------------
+ROLLUP_MAX_BULLETS = 24
+
+
+def _rollup_key(value: str) -> str:
+    """Escape a topic/domain for use as a field name under topic_counts/domain_counts."""
+    return value.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def _rollup_unkey(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def _rollup_bullet(doc: Dict[str, Any]) -> Optional[str]:
+    s = ((doc.get("summary") or {}).get("short") or "").strip()
+    return s or (doc.get("cleaned_text") or "").strip()[:180] or None
+
+
+def _rollup_day_filter(day: datetime) -> Dict[str, Any]:
+    # day rollups have no granularity field; week/month buckets carry one
+    return {"date": day, "granularity": None}
+
+
+ROLLUP_GRANULARITIES = ("day", "week", "month")
+
+
+def _bucket_start(day: datetime, granularity: str) -> datetime:
+    """UTC start of the day/ISO week (Monday)/month containing `day`."""
+    day = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_end(start: datetime, granularity: str) -> datetime:
+    """Exclusive end of the bucket starting at `start`."""
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _rollup_bucket_filters(day: datetime) -> List[Dict[str, Any]]:
+    """The day rollup plus any cached week/month buckets that contain `day`."""
+    return [_rollup_day_filter(day)] + [
+        {"date": _bucket_start(day, g), "granularity": g} for g in ROLLUP_GRANULARITIES if g != "day"
+    ]
+
+
+def _rollup_increments(docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+    """Per-day $inc/$push updates for newly inserted documents (one UpdateOne per day)."""
+    per_day: Dict[datetime, Dict[str, Any]] = {}
+    for d in docs:
+        day = d.get("day_bucket")
+        if not day:
+            continue
+        acc = per_day.setdefault(day, {"inc": {"doc_count": 0, "token_sum": 0}, "bullets": []})
+        inc = acc["inc"]
+        inc["doc_count"] += 1
+        inc["token_sum"] += int(d.get("tokens") or 0)
+        topic = (d.get("topics") or {}).get("primary")
+        if topic:
+            k = f"topic_counts.{_rollup_key(topic)}"
+            inc[k] = inc.get(k, 0) + 1
+        if d.get("domain"):
+            k = f"domain_counts.{_rollup_key(d['domain'])}"
+            inc[k] = inc.get(k, 0) + 1
+        bullet = _rollup_bullet(d)
+        if bullet and len(acc["bullets"]) < ROLLUP_MAX_BULLETS:
+            acc["bullets"].append(bullet)
+    ops = []
+    now = datetime.utcnow()
+    for day, acc in per_day.items():
+        # the notes-only summary no longer applies once documents arrive
+        update: Dict[str, Any] = {
+            "$inc": acc["inc"], "$set": {"updated_at": now}, "$setOnInsert": {"incremental": True},
+            "$unset": {"summary": ""},
+        }
+        if acc["bullets"]:
+            update["$push"] = {"bullets": {"$each": acc["bullets"], "$slice": ROLLUP_MAX_BULLETS}}
+        ops.append(UpdateOne(_rollup_day_filter(day), update, upsert=True))
+        # keep cached week/month buckets (written by /rollup/range) exact; never create them here
+        for filt in _rollup_bucket_filters(day)[1:]:
+            ops.append(UpdateOne(filt, {"$inc": acc["inc"], "$set": {"updated_at": now}}))
+    return ops
+
+
+def _rollup_record_docs(db, docs: List[Dict[str, Any]]) -> None:
+    """Fold new documents into their day rollups (best-effort; a rebuild repairs drift)."""
+    ops = _rollup_increments(docs)
+    if not ops:
+        return
+    try:
+        db.daily_rollups.bulk_write(ops, ordered=False)
+    except PyMongoError:
+        pass
+
+
+def _rollup_move_topic(db, day: Optional[datetime], old: Optional[str], new: Optional[str]) -> None:
+    """Shift one document's topic count on its day after it was recategorized."""
+    if not day or old == new:
+        return
+    inc: Dict[str, int] = {}
+    if old:
+        inc[f"topic_counts.{_rollup_key(old)}"] = -1
+    if new:
+        inc[f"topic_counts.{_rollup_key(new)}"] = 1
+    try:
+        # only touch rollups that exist; a missing one is rebuilt on first read
+        for filt in _rollup_bucket_filters(day):
+            db.daily_rollups.update_one(filt, {"$inc": inc})
+    except PyMongoError:
+        pass
+
+
+def _rollup_mark_topic_stale(db, topic: str) -> None:
+    """Rollups counting `topic` get rebuilt on next read (used by topic rename/merge)."""
+    try:
+        db.daily_rollups.update_many(
+            {f"topic_counts.{_rollup_key(topic)}": {"$gt": 0}}, {"$set": {"stale": True}},
+        )
+    except PyMongoError:
+        pass
+
+
+def _rebuild_day_rollup(db, day: datetime) -> Optional[Dict[str, Any]]:
+    """Recompute a day's rollup with one projected aggregation; None if the day has no documents."""
+    pipeline = [
+        {"$match": {"day_bucket": day}},
+        {"$sort": {"captured_at": 1}},
+        {"$project": {
+            "_id": 0,
+            "topic": "$topics.primary",
+            "domain": 1,
+            "tokens": 1,
+            "bullet": {"$trim": {"input": {"$ifNull": [
+                "$summary.short",
+                {"$substrCP": [{"$ifNull": ["$cleaned_text", ""]}, 0, 180]},
+            ]}}},
+        }},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None, "doc_count": {"$sum": 1}, "token_sum": {"$sum": {"$ifNull": ["$tokens", 0]}},
+            }}],
+            "topics": [{"$match": {"topic": {"$nin": [None, ""]}}}, {"$group": {"_id": "$topic", "count": {"$sum": 1}}}],
+            "domains": [{"$match": {"domain": {"$nin": [None, ""]}}}, {"$group": {"_id": "$domain", "count": {"$sum": 1}}}],
+            "bullets": [{"$match": {"bullet": {"$nin": [None, ""]}}}, {"$limit": ROLLUP_MAX_BULLETS}],
+        }},
+    ]
+    res = next(iter(db.documents.aggregate(pipeline)), None) or {}
+    totals = (res.get("totals") or [{}])[0]
+    if not totals.get("doc_count"):
+        return None
+    data = {
+        "date": day,
+        "doc_count": totals["doc_count"],
+        "token_sum": totals.get("token_sum") or 0,
+        "topic_counts": {_rollup_key(t["_id"]): t["count"] for t in res.get("topics") or []},
+        "domain_counts": {_rollup_key(t["_id"]): t["count"] for t in res.get("domains") or []},
+        "bullets": [b["bullet"] for b in res.get("bullets") or []],
+        "stale": False,
+        "incremental": True,
+        "updated_at": datetime.utcnow(),
+    }
+    db.daily_rollups.update_one(_rollup_day_filter(day), {"$set": data, "$unset": {"summary": "", "top_topics": ""}}, upsert=True)
+    return data
+
+
+def _top_counts(counts: Optional[Dict[str, int]], label: str, n: int = 8) -> List[Dict[str, Any]]:
+    items = [(k, v) for k, v in (counts or {}).items() if v and v > 0]
+    items.sort(key=lambda kv: -kv[1])
+    return [{label: _rollup_unkey(k), "count": v} for k, v in items[:n]]
+
+
+def _format_day_rollup(doc: Dict[str, Any]) -> Dict[str, Any]:
+    bullets = doc.get("bullets") or []
+    count = doc.get("doc_count") or 0
+    out = {
+        "date": doc.get("date"),
+        "summary": doc.get("summary") or (bullets[0] if bullets else f"Captured {count} documents."),
+        "bullets": bullets,
+        "top_topics": doc.get("top_topics") or _top_counts(doc.get("topic_counts"), "topic"),
+        "top_domains": _top_counts(doc.get("domain_counts"), "domain"),
+        "doc_count": count,
+        "token_sum": doc.get("token_sum") or 0,
+        "updated_at": doc.get("updated_at"),
+    }
+    if "_id" in doc:
+        out["id"] = str(doc["_id"])
+    return out
+
+
 class DayRollupIn(BaseModel):
     date: str  # YYYY-MM-DD (UTC)
     rebuild: Optional[bool] = False
@@ -1756,55 +5311,200 @@ def build_day_rollup(body: DayRollupIn) -> Dict[str, Any]:
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid date format; expected YYYY-MM-DD")
 
-    # If exists and not rebuild, return existing
-    existing = database.daily_rollups.find_one({"date": day})
-    if existing and not body.rebuild:
-        existing["id"] = str(existing.pop("_id"))
-        return existing
-
-    # Gather documents for the day
-    docs = list(database.documents.find({"day_bucket": day}))
-    # Fallback to notes if no docs exist
-    if not docs:
+    # Maintained on ingest: normally a single small read. Rollups written before
+    # incremental counters (no `incremental` flag) or marked stale are rebuilt.
+    existing = database.daily_rollups.find_one(_rollup_day_filter(day))
+    # empty placeholders from /rollup/range still go through the notes fallback below
+    placeholder = existing and not existing.get("doc_count") and not existing.get("summary")
+    # day rollups cached by /rollup/range carry counts but no bullets yet
+    placeholder = placeholder or (existing and existing.get("doc_count") and "bullets" not in existing)
+    if existing and not body.rebuild and not existing.get("stale") and existing.get("incremental") and not placeholder:
+        return _format_day_rollup(existing)
+
+    if _rebuild_day_rollup(database, day) is None:
+        # Fallback to notes if no docs exist
         day_next = day + timedelta(days=1)
-        notes = list(database.notes.find({
-            "created_at": {"$gte": day, "$lt": day_next}
-        }))
+        notes = list(database.notes.find(
+            {"created_at": {"$gte": day, "$lt": day_next}}, {"text": 1},
+        ).sort("created_at", 1).limit(20))
+        n_notes = database.notes.count_documents({"created_at": {"$gte": day, "$lt": day_next}})
         # Minimal rollup from notes
-        bullets = [(n.get("text") or "").strip()[:120] for n in notes[:20]]
-        summary = f"Captured {len(notes)} notes."
-        data = {"date": day, "summary": summary, "bullets": bullets, "top_topics": []}
-        database.daily_rollups.update_one({"date": day}, {"$set": data}, upsert=True)
-        out = database.daily_rollups.find_one({"date": day}) or data
-        out["id"] = str(out.pop("_id"))
-        return out
+        bullets = [(n.get("text") or "").strip()[:120] for n in notes]
+        summary = f"Captured {n_notes} notes."
+        data = {"date": day, "summary": summary, "bullets": bullets, "top_topics": [], "doc_count": 0, "token_sum": 0,
+                "topic_counts": {}, "domain_counts": {}, "stale": False, "incremental": True,
+                "updated_at": datetime.utcnow()}
+        database.daily_rollups.update_one(_rollup_day_filter(day), {"$set": data}, upsert=True)
+    out = database.daily_rollups.find_one(_rollup_day_filter(day)) or {}
+    return _format_day_rollup(out)
+
+
+class RollupRangeIn(BaseModel):
+    start: str  # YYYY-MM-DD (UTC), inclusive
+    end: str  # YYYY-MM-DD (UTC), inclusive
+    granularity: Optional[str] = "day"  # day | week | month
+    top_n: Optional[int] = 8
+    rebuild: Optional[bool] = False
 
-    # Build bullets from document summaries or beginnings of cleaned_text
-    bullets: List[str] = []
-    topic_counts: Dict[str, int] = {}
-    for d in docs:
-        tp = ((d.get("topics") or {}).get("primary") if d.get("topics") else None)
-        if tp:
-            topic_counts[tp] = topic_counts.get(tp, 0) + 1
-        s = (d.get("summary") or {}).get("short") or None
-        if s:
-            bullets.append(s.strip())
-        else:
-            ct = (d.get("cleaned_text") or "").strip()
-            if ct:
-                bullets.append(ct[:180])
-        if len(bullets) >= 24:
-            break
 
-    # Compose summary
-    if bullets:
-        summary = bullets[0]
-    else:
-        summary = f"Captured {len(docs)} documents."
-    top_topics = sorted([{ "topic": k, "count": v } for k, v in topic_counts.items()], key=lambda x: -x["count"])[:8]
+def _rollup_range_rows(db, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """One $group over [start, end): doc count and token sum per (day, topic, domain)."""
+    pipeline = [
+        {"$match": {"day_bucket": {"$gte": start, "$lt": end}}},
+        {"$group": {
+            "_id": {"day": "$day_bucket", "topic": "$topics.primary", "domain": "$domain"},
+            "count": {"$sum": 1},
+            "tokens": {"$sum": {"$ifNull": ["$tokens", 0]}},
+        }},
+    ]
+    return list(db.documents.aggregate(pipeline))
 
-    data = {"date": day, "summary": summary, "bullets": bullets, "top_topics": top_topics}
-    database.daily_rollups.update_one({"date": day}, {"$set": data}, upsert=True)
-    out = database.daily_rollups.find_one({"date": day}) or data
-    out["id"] = str(out.pop("_id"))
-    return out
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {"doc_count": 0, "token_sum": 0, "topic_counts": {}, "domain_counts": {}}
+
+
+def _add_range_row(acc: Dict[str, Any], row: Dict[str, Any]) -> None:
+    acc["doc_count"] += row["count"]
+    acc["token_sum"] += row["tokens"]
+    topic, domain = row["_id"].get("topic"), row["_id"].get("domain")
+    if topic:
+        k = _rollup_key(topic)
+        acc["topic_counts"][k] = acc["topic_counts"].get(k, 0) + row["count"]
+    if domain:
+        k = _rollup_key(domain)
+        acc["domain_counts"][k] = acc["domain_counts"].get(k, 0) + row["count"]
+
+
+def _fold_counts(into: Dict[str, Any], src: Dict[str, Any]) -> None:
+    into["doc_count"] += src.get("doc_count") or 0
+    into["token_sum"] += src.get("token_sum") or 0
+    for field in ("topic_counts", "domain_counts"):
+        for k, v in (src.get(field) or {}).items():
+            into[field][k] = into[field].get(k, 0) + v
+
+
+@app.post("/rollup/range")
+def rollup_range(body: RollupRangeIn) -> Dict[str, Any]:
+    """Counts, token sums, top topics and top domains per day/week/month bucket.
+
+    The range is widened to whole buckets. Day buckets reuse the incremental
+    day rollups; finished week/month buckets are cached in `daily_rollups`
+    (with a `granularity`) and kept current by later ingests. Everything
+    missing is computed with a single aggregation, and every finished day it
+    covers is stored as an incremental day rollup, so days ingested before
+    rollups were maintained (or marked stale) are only aggregated once.
+    """
+    gran = (body.granularity or "day").lower()
+    if gran not in ROLLUP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity must be day, week or month")
+    try:
+        first = datetime.fromisoformat(body.start)
+        last = datetime.fromisoformat(body.end)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid date format; expected YYYY-MM-DD")
+    if last < first:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    max_days = int(os.getenv("ROLLUP_RANGE_MAX_DAYS", "1100"))
+    if (last - first).days > max_days:
+        raise HTTPException(status_code=400, detail=f"range is limited to {max_days} days")
+    top_n = max(1, min(50, int(body.top_n or 8)))
+
+    starts: List[datetime] = []
+    b = _bucket_start(first, gran)
+    stop = _bucket_end(_bucket_start(last, gran), gran)
+    while b < stop:
+        starts.append(b)
+        b = _bucket_end(b, gran)
+    today = _bucket_start(datetime.utcnow(), "day")
+
+    buckets: Dict[datetime, Dict[str, Any]] = {}
+    cached: set = set()
+    if not body.rebuild:
+        filt: Dict[str, Any] = {"date": {"$in": starts}, "granularity": None if gran == "day" else gran,
+                                "stale": {"$ne": True}}
+        if gran == "day":
+            filt["incremental"] = True
+        proj = {"date": 1, "doc_count": 1, "token_sum": 1, "topic_counts": 1, "domain_counts": 1}
+        for doc in database.daily_rollups.find(filt, proj):
+            key = _bucket_start(doc["date"], gran)
+            buckets[key] = {k: doc.get(k) or v for k, v in _empty_bucket().items()}
+            cached.add(key)
+
+    missing = [st for st in starts if st not in cached]
+    if missing:
+        fresh = {st: _empty_bucket() for st in missing}
+        days = fresh if gran == "day" else {}
+        for row in _rollup_range_rows(database, missing[0], _bucket_end(missing[-1], gran)):
+            key = _bucket_start(row["_id"]["day"], gran)
+            acc = fresh.get(key)
+            if acc is None:
+                continue  # already served from cache
+            _add_range_row(acc, row)
+            if gran != "day":
+                _add_range_row(days.setdefault(_bucket_start(row["_id"]["day"], "day"), _empty_bucket()), row)
+        now = datetime.utcnow()
+        ops = []
+        for st, acc in fresh.items():
+            buckets[st] = acc
+            # only finished week/month buckets are cached
+            if gran != "day" and _bucket_end(st, gran) <= today:
+                ops.append(UpdateOne(
+                    {"date": st, "granularity": gran},
+                    {"$set": {**acc, "stale": False, "updated_at": now}},
+                    upsert=True,
+                ))
+        for st in missing:
+            day = st
+            while day < _bucket_end(st, gran):
+                acc = days.get(day) or _empty_bucket()
+                if acc["doc_count"] and day < today:
+                    # same shape as _rebuild_day_rollup; bullets are left for /rollup/day to fill in
+                    ops.append(UpdateOne(
+                        _rollup_day_filter(day),
+                        {"$set": {**acc, "stale": False, "incremental": True, "updated_at": now},
+                         "$unset": {"summary": "", "top_topics": ""}},
+                        upsert=True,
+                    ))
+                elif not acc["doc_count"] and day <= today:
+                    # days without documents never get a rollup from ingest; record them as empty
+                    # incremental rollups (later ingests $inc them) so they stop counting as missing
+                    ops.append(UpdateOne(
+                        _rollup_day_filter(day),
+                        {"$setOnInsert": {**_empty_bucket(), "bullets": [], "stale": False, "incremental": True,
+                                          "updated_at": now}},
+                        upsert=True,
+                    ))
+                day += timedelta(days=1)
+        if ops:
+            try:
+                database.daily_rollups.bulk_write(ops, ordered=False)
+            except PyMongoError:
+                pass
+
+    totals = _empty_bucket()
+    items = []
+    for st in starts:
+        acc = buckets.get(st) or _empty_bucket()
+        _fold_counts(totals, acc)
+        items.append({
+            "start": st,
+            "end": _bucket_end(st, gran),
+            "doc_count": acc["doc_count"],
+            "token_sum": acc["token_sum"],
+            "top_topics": _top_counts(acc["topic_counts"], "topic", top_n),
+            "top_domains": _top_counts(acc["domain_counts"], "domain", top_n),
+            "cached": st in cached,
+        })
+    return {
+        "granularity": gran,
+        "start": starts[0],
+        "end": _bucket_end(starts[-1], gran),
+        "buckets": items,
+        "totals": {
+            "doc_count": totals["doc_count"],
+            "token_sum": totals["token_sum"],
+            "top_topics": _top_counts(totals["topic_counts"], "topic", top_n),
+            "top_domains": _top_counts(totals["domain_counts"], "domain", top_n),
+        },
+    }
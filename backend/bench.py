@@ -0,0 +1,233 @@
+"""Micro-benchmarks for the backend.
+
+Run from the repo root with Mongo reachable (or a short server selection
+timeout, e.g. MONGODB_URI="mongodb://localhost:27017/?serverSelectionTimeoutMS=500"):
+
+    python backend/bench.py graph --runs 200
+    python backend/bench.py storage --dim 1536
+    python backend/bench.py ann --vectors 100000 --qdrant http://localhost:6333
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import app as notetaker  # noqa: E402
+
+
+def _timeit(fn: Callable[[], object], runs: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def _print_rows(rows: Dict[str, Dict[str, float]]):
+    width = max(len(k) for k in rows)
+    recall = any("recall" in r for r in rows.values())
+    print(f"{'':{width}}  {'mean':>9}  {'p50':>9}  {'p95':>9}" + (f"  {'recall':>7}" if recall else ""))
+    for name, r in rows.items():
+        line = f"{name:{width}}  {r['mean_ms']:8.3f}ms {r['p50_ms']:8.3f}ms {r['p95_ms']:8.3f}ms"
+        if "recall" in r:
+            line += f"  {r['recall']:7.3f}"
+        print(line)
+
+
+def bench_graph(args):
+    """Per-request cost of the ingest pipeline with persistence stubbed out.
+
+    Compares building+compiling the StateGraph on every call (the old
+    behaviour), invoking the graph compiled at import, and the sequential
+    fallback. Embeddings follow EMBEDDING_PROVIDER; leave it unset to
+    isolate orchestration overhead.
+    """
+    if not notetaker.HAVE_LANGGRAPH:
+        print("langgraph is not installed; only the sequential path can run")
+    notetaker.create_document_and_chunks = lambda db, payload: {"id": None, "chunk_count": len(payload.chunks)}
+    text = ("Notes on incremental indexing and retrieval. " * 24 + "\n\n") * max(1, args.text_kb)
+    state = {"text": text, "meta": {"source_url": "bench://graph"}, "chunk_size": 1000, "chunk_overlap": 150}
+
+    rows: Dict[str, Dict[str, float]] = {}
+    if notetaker.HAVE_LANGGRAPH:
+        rows["compile per request"] = _timeit(lambda: notetaker._build_ingest_graph().invoke(dict(state)), args.runs)
+        rows["compiled once"] = _timeit(lambda: notetaker.INGEST_GRAPH.invoke(dict(state)), args.runs)
+        rows["compile only"] = _timeit(notetaker._build_ingest_graph, args.runs)
+    rows["sequential fallback"] = _timeit(lambda: notetaker._run_pipeline_sequential(dict(state)), args.runs)
+    _print_rows(rows)
+
+
+def bench_storage(args):
+    """Bytes per stored chunk and encode/decode cost for each MONGO_VECTOR_STORAGE mode.
+
+    Sizes are the BSON encoding of a chunk document with ~1 KB of text, so
+    they include field names and the non-vector fields. With --live, also
+    reports doc_chunks collStats and the stored formats from Mongo.
+    """
+    import bson
+
+    rng = random.Random(7)
+    vecs = []
+    for _ in range(args.vectors):
+        v = [rng.gauss(0.0, 1.0) for _ in range(args.dim)]
+        norm = math.sqrt(sum(x * x for x in v))
+        vecs.append([x / norm for x in v])
+    now = notetaker.datetime.utcnow()
+    chunk = {
+        "_id": notetaker.ObjectId(), "doc_id": notetaker.ObjectId(), "idx": 0, "text": "x" * 1000, "tokens": 220,
+        "section": None, "char_start": 0, "char_end": 1000, "topics": None,
+        "captured_at": now, "captured_hour": now.hour, "day_bucket": now, "created_at": now,
+    }
+    base = len(bson.encode({**chunk, "embedding": None}))
+
+    def cos(a, b):
+        return sum(x * y for x, y in zip(a, b)) / math.sqrt(sum(x * x for x in a) * sum(y * y for y in b))
+
+    print(f"{args.vectors} vectors, dim {args.dim}; chunk without vector: {base} B")
+    print(f"{'mode':8}  {'B/chunk':>8}  {'vector B':>8}  {'vs full':>7}  {'encode':>9}  {'decode':>9}  {'min cos':>8}")
+    full_size = None
+    for mode in notetaker.VECTOR_STORAGE_MODES:
+        stored = [{**chunk, **notetaker._encode_embedding(v, mode)} for v in vecs]
+        size = statistics.fmean(len(bson.encode(d)) for d in stored)
+        full_size = full_size or size
+        enc = _timeit(lambda: notetaker._encode_embedding(vecs[0], mode), args.runs)["mean_ms"]
+        if mode == "ref":
+            dec, worst = "-", "-"  # read back from Qdrant, not decoded locally
+        else:
+            dec = f"{_timeit(lambda: notetaker._decode_embedding(stored[0]), args.runs)['mean_ms'] * 1000:.1f}us"
+            worst = f"{min(cos(v, notetaker._decode_embedding(d)) for v, d in zip(vecs, stored)):.5f}"
+        print(f"{mode:8}  {size:8.0f}  {size - base:8.0f}  {size / full_size:6.1%}  "
+              f"{enc * 1000:7.1f}us  {dec:>9}  {worst:>8}")
+
+    if args.live:
+        db = notetaker.database
+        st = db.command("collStats", "doc_chunks")
+        print(f"\ndoc_chunks: {st.get('count', 0)} docs, avgObjSize {st.get('avgObjSize', 0)} B, "
+              f"size {st.get('size', 0) / 1e6:.1f} MB, storageSize {st.get('storageSize', 0) / 1e6:.1f} MB")
+        formats = db.doc_chunks.aggregate([{"$group": {
+            "_id": {"$ifNull": ["$embedding_q.fmt", {"$cond": [{"$isArray": "$embedding"}, "full", "none"]}]},
+            "n": {"$sum": 1},
+        }}])
+        print("stored formats:", {r["_id"]: r["n"] for r in formats})
+
+
+def bench_ann(args):
+    """Query latency and recall@k of the local vector index, optionally against Qdrant.
+
+    Uses a clustered synthetic corpus of unit vectors; recall is measured
+    against an exact scan. The exact and IVF indexes are snapshotted into a
+    temp dir first, so their base rows are memory-mapped as in production.
+    With --qdrant (a URL or :memory:), the same vectors go into a scratch
+    collection that is dropped afterwards.
+    """
+    if not notetaker.HAVE_NUMPY:
+        sys.exit("numpy is not installed")
+    np = notetaker.np
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((args.clusters, args.dim)).astype(np.float32)
+    noise = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    mat = centers[rng.integers(0, args.clusters, args.vectors)] + 0.6 * noise
+    mat /= np.linalg.norm(mat, axis=1, keepdims=True)
+    queries = mat[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    ids = [str(i) for i in range(args.vectors)]
+    doc_ids = [str(i // 8) for i in range(args.vectors)]
+    days = [None] * args.vectors
+    k = args.top_k
+    print(f"{args.vectors} vectors, dim {args.dim}, {args.clusters} clusters, {args.queries} queries, recall@{k}")
+
+    def run(search) -> Dict[str, float]:
+        it = itertools.cycle(queries)
+        row = _timeit(lambda: search(next(it)), args.runs)
+        row["recall"] = statistics.fmean(len(set(search(q)) & truth[i]) / k for i, q in enumerate(queries))
+        return row
+
+    rows: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = notetaker.LocalVectorIndex(os.path.join(tmp, "exact"), ivf_min=args.vectors + 1)
+        exact.add(ids, doc_ids, days, mat)
+        truth = [{h["id"] for h in exact.search(q, k)} for q in queries]
+        rows["exact, in RAM"] = run(lambda q: [h["id"] for h in exact.search(q, k)])
+        exact.save()
+        rows["exact, mmap"] = run(lambda q: [h["id"] for h in exact.search(q, k)])
+
+        ivf = notetaker.LocalVectorIndex(os.path.join(tmp, "ivf"), ivf_min=0, nlist=args.nlist or None)
+        ivf.add(ids, doc_ids, days, mat)
+        t0 = time.perf_counter()
+        ivf.save()
+        lists = ivf.stats()["ivf_lists"]
+        print(f"IVF build (k-means + snapshot): {time.perf_counter() - t0:.2f}s, {lists} lists")
+        for nprobe in (int(x) for x in args.nprobe.split(",")):
+            ivf.nprobe = nprobe
+            rows[f"ivf nprobe={nprobe}"] = run(lambda q: [h["id"] for h in ivf.search(q, k)])
+
+    if args.qdrant:
+        from qdrant_client import QdrantClient
+        from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+        client = QdrantClient(location=args.qdrant)
+        col = f"bench_ann_{os.getpid()}"
+        client.create_collection(col, vectors_config=VectorParams(size=args.dim, distance=Distance.COSINE))
+        try:
+            t0 = time.perf_counter()
+            for s in range(0, args.vectors, 1000):
+                client.upsert(col, points=[
+                    PointStruct(id=i, vector=mat[i].tolist()) for i in range(s, min(args.vectors, s + 1000))
+                ], wait=True)
+            print(f"Qdrant upsert: {time.perf_counter() - t0:.2f}s")
+
+            def qsearch(q):
+                res = client.query_points(collection_name=col, query=q.tolist(), limit=k, with_payload=False)
+                return [str(p.id) for p in res.points]
+
+            rows["qdrant"] = run(qsearch)
+        finally:
+            client.delete_collection(col)
+    _print_rows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("graph", help="ingest graph orchestration overhead")
+    p.add_argument("--runs", type=int, default=200)
+    p.add_argument("--text-kb", type=int, default=4, help="approximate input size in KB")
+    p.set_defaults(func=bench_graph)
+    p = sub.add_parser("storage", help="Mongo bytes per chunk for each vector storage mode")
+    p.add_argument("--dim", type=int, default=1536)
+    p.add_argument("--vectors", type=int, default=200)
+    p.add_argument("--runs", type=int, default=200)
+    p.add_argument("--live", action="store_true", help="also report doc_chunks stats from Mongo")
+    p.set_defaults(func=bench_storage)
+    p = sub.add_parser("ann", help="local vector index (exact / IVF) vs Qdrant latency and recall")
+    p.add_argument("--dim", type=int, default=384)
+    p.add_argument("--vectors", type=int, default=50000)
+    p.add_argument("--clusters", type=int, default=200, help="Gaussian clusters in the synthetic corpus")
+    p.add_argument("--queries", type=int, default=100)
+    p.add_argument("--top-k", type=int, default=10)
+    p.add_argument("--runs", type=int, default=200)
+    p.add_argument("--nlist", type=int, default=0, help="IVF lists (default sqrt(vectors))")
+    p.add_argument("--nprobe", default="4,16,64", help="comma-separated nprobe values to try")
+    p.add_argument("--qdrant", help="Qdrant URL (or :memory:) to compare against")
+    p.set_defaults(func=bench_ann)
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -371,6 +371,7 @@ async function sendIngest(text) {
     lang: document.documentElement.lang || null,
     chunk_size: 1000,
     chunk_overlap: 150,
+    background: true,
   };
   const res = await fetch(AGENT_INGEST_TEXT, {
     method: 'POST',
@@ -403,10 +404,10 @@ async function smartSave(text, includeUrl = true) {
 async function scrapePageToDocs() {
   try {
     showToast('Agent ingesting page...');
-    const res = await fetch(AGENT_INGEST_URL, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ url: window.location.href, chunk_size: 1000, chunk_overlap: 150 }) });
+    const res = await fetch(AGENT_INGEST_URL, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ url: window.location.href, chunk_size: 1000, chunk_overlap: 150, background: true }) });
     const text = await res.text();
     if (!res.ok) throw new Error(text || 'Ingest failed');
-    showToast('Agent saved document');
+    showToast('Agent queued page for ingest');
   } catch (e) {
     showToast(e?.message || 'Scrape failed');
   }
@@ -414,7 +415,7 @@ async function scrapePageToDocs() {
 
 async function crawlSite(progressWrap, progressFill, progressText) {
   try {
-    const startRes = await fetch(`${BACKEND_BASE}/crawl-start`, {
+    const startRes = await fetch(`${BACKEND_BASE}/crawls`, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ url: window.location.href, maxDepth: 1, limit: 10 })
@@ -434,30 +435,25 @@ async function crawlSite(progressWrap, progressFill, progressText) {
     };
     setProgress(0, 0, 'starting');
 
-    // Poll status
-    let done = false; let attempts = 0;
-    while (!done && attempts < 240) { // ~8 minutes max
+    // The backend polls Firecrawl and stores pages as they arrive; we only watch progress
+    let sData = {}; let attempts = 0;
+    while (attempts < 240) { // ~8 minutes max
       attempts++;
       await new Promise(r => setTimeout(r, 2000));
-      const sRes = await fetch(`${BACKEND_BASE}/crawl-status/${crawlId}`);
+      const sRes = await fetch(`${BACKEND_BASE}/crawls/${crawlId}`);
       const sText = await sRes.text();
       if (!sRes.ok) throw new Error(sText || 'Status failed');
-      let sData = {}; try { sData = JSON.parse(sText); } catch {}
+      try { sData = JSON.parse(sText); } catch { sData = {}; }
       const status = sData.status || 'unknown';
-      const total = sData.total || 0;
-      const completed = sData.completed || 0;
-      setProgress(completed, total, status);
-      if (status === 'completed') done = true;
-      if (status === 'failed') throw new Error('Crawl failed');
+      const total = (sData.firecrawl || {}).total || 0;
+      setProgress(sData.pages_fetched || 0, total, status);
+      if (status === 'completed') break;
+      if (status === 'failed' || status === 'cancelled') throw new Error(sData.error || `Crawl ${status}`);
     }
 
-    // Save results
-    const saveRes = await fetch(`${BACKEND_BASE}/crawl-save/${crawlId}`, { method: 'POST' });
-    const saveText = await saveRes.text();
-    if (!saveRes.ok) throw new Error(saveText || 'Save failed');
-    let saveData = {}; try { saveData = JSON.parse(saveText); } catch {}
-    const n = saveData.inserted_count || 0;
-    showToast(`Crawl saved ${n} notes`);
+    const n = sData.pages_stored || 0;
+    const dup = sData.pages_duplicate || 0;
+    showToast(`Crawl stored ${n} pages${dup ? ` (${dup} already saved)` : ''}`);
   } catch (e) {
     showToast(e?.message || 'Crawl failed');
   } finally {
@@ -810,9 +806,25 @@ function showSemanticAnswerPalette(threaded){
     try{
       let answerText = '';
       if(useLlm && useLlm.checked){
-        const res = await fetch(`${BACKEND_BASE}/answer/compose`, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ query: q, scope: scopeEl.value, top_k: parseInt(kEl.value||'8',10), include_sources: true }) });
-        const out = await res.json();
-        answerText = out.answer || '';
+        const res = await fetch(`${BACKEND_BASE}/answer/compose/stream`, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ query: q, scope: scopeEl.value, top_k: parseInt(kEl.value||'8',10), include_sources: true }) });
+        if(!res.ok || !res.body) throw new Error(await res.text());
+        // render tokens as they arrive
+        const live = document.createElement('pre'); live.className='snippet'; view.innerHTML=''; view.appendChild(live);
+        const reader = res.body.getReader(); const decoder = new TextDecoder(); let buf = '';
+        for(;;){
+          const { value, done } = await reader.read(); if(done) break;
+          buf += decoder.decode(value, { stream: true });
+          let cut;
+          while((cut = buf.indexOf('\n\n')) >= 0){
+            const block = buf.slice(0, cut); buf = buf.slice(cut + 2);
+            const ev = (block.match(/^event: (.*)$/m)||[])[1]; const raw = (block.match(/^data: (.*)$/m)||[])[1];
+            let data = {}; try { data = JSON.parse(raw||'{}'); } catch {}
+            if(ev === 'sources'){ status.textContent = `Answering from ${(data.sources||[]).length} sources...`; }
+            else if(ev === 'token'){ answerText += data.delta || ''; live.textContent = answerText; }
+            else if(ev === 'error'){ status.textContent = data.detail || 'Answer interrupted'; }
+          }
+        }
+        answerText = answerText.trim();
       } else {
         const res = await fetch(SEMANTIC_SEARCH_ENDPOINT, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ query: q, scope: scopeEl.value, top_k: parseInt(kEl.value||'8',10) }) });
         const data = await res.json();
@@ -38,9 +38,10 @@
 
   const api = {
     base(){ return window.API_BASE; },
-    async list({q='', skip=0, limit=20}={}){
-      const params = new URLSearchParams({skip, limit});
+    async list({q='', skip=0, limit=20, after=''}={}){
+      const params = new URLSearchParams({skip, limit, count: 'estimated'});
       if(q) params.set('q', q);
+      else if(after) params.set('after', after);
       const res = await fetch(`${this.base()}/notes?${params.toString()}`);
       if(!res.ok) throw new Error('Failed to load notes');
       return res.json();
@@ -59,9 +60,10 @@
       if(!res.ok) throw new Error(await res.text());
       return res.json();
     },
-    async docs({q='', topic='', date='', skip=0, limit=20}={}){
-      const params = new URLSearchParams({skip, limit});
+    async docs({q='', topic='', date='', skip=0, limit=20, after=''}={}){
+      const params = new URLSearchParams({skip, limit, count: 'estimated'});
       if(q) params.set('q', q);
+      else if(after) params.set('after', after);
       if(topic) params.set('topic', topic);
       if(date) params.set('date', date);
       const res = await fetch(`${this.base()}/documents?${params.toString()}`);
@@ -148,7 +150,12 @@
       return res.json();
     },
     async renameTopic({from_topic, to_topic}){
-      const res = await fetch(`${this.base()}/topics/rename`, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ from_topic, to_topic })});
+      const res = await fetch(`${this.base()}/topics/rename`, { method:'POST', headers:{'Content-Type':'application/json'}, body: JSON.stringify({ from_topic, to_topic, background: true })});
+      if(!res.ok) throw new Error(await res.text());
+      return res.json();
+    },
+    async agentRun(id){
+      const res = await fetch(`${this.base()}/agent/runs/${id}`);
       if(!res.ok) throw new Error(await res.text());
       return res.json();
     }
@@ -159,10 +166,12 @@
   const pagerEl = document.getElementById('pager');
   const searchEl = document.getElementById('search');
   const refreshBtn = document.getElementById('refresh');
-  let state = {skip:0, limit:20, q:''};
+  // keyset paging: `after` is the cursor for this page, `trail` the cursors of earlier pages
+  let state = {skip:0, limit:20, q:'', after:'', trail:[], next:null};
 
   async function loadNotes(){
-    const {items, total} = await api.list(state);
+    const {items, total, next_after} = await api.list(state);
+    state.next = next_after || null;
     notesEl.innerHTML = '';
     items.forEach(addCard);
     renderPager(total);
@@ -186,17 +195,27 @@
   }
 
   function renderPager(total){
-    const pages = Math.ceil(total / state.limit) || 1;
-    const current = Math.floor(state.skip / state.limit) + 1;
+    const pages = Math.ceil((total||0) / state.limit) || 1;
+    const current = state.q ? Math.floor(state.skip / state.limit) + 1 : state.trail.length + 1;
     pagerEl.innerHTML = '';
     const mk = (label, on)=>{ const b=document.createElement('button'); b.className='btn'; b.textContent=label; b.onclick=on; return b; };
-    pagerEl.appendChild(mk('Prev', ()=>{ state.skip=Math.max(0, state.skip-state.limit); loadNotes(); }));
+    pagerEl.appendChild(mk('Prev', ()=>{
+      if(state.q) state.skip=Math.max(0, state.skip-state.limit);
+      else if(state.trail.length) state.after=state.trail.pop();
+      loadNotes();
+    }));
     const info = document.createElement('span'); info.style.padding='8px'; info.textContent = `${current}/${pages}`; pagerEl.appendChild(info);
-    pagerEl.appendChild(mk('Next', ()=>{ state.skip = Math.min((pages-1)*state.limit, state.skip+state.limit); loadNotes(); }));
+    pagerEl.appendChild(mk('Next', ()=>{
+      if(state.q) state.skip = Math.min((pages-1)*state.limit, state.skip+state.limit);
+      else if(state.next){ state.trail.push(state.after); state.after=state.next; }
+      else return;
+      loadNotes();
+    }));
   }
 
-  refreshBtn.addEventListener('click', ()=>{ state.skip=0; state.q=searchEl.value.trim(); loadNotes(); });
-  searchEl.addEventListener('keydown', (e)=>{ if(e.key==='Enter'){ state.skip=0; state.q=searchEl.value.trim(); loadNotes(); }});
+  const resetNotes = ()=>{ state.skip=0; state.after=''; state.trail=[]; state.q=searchEl.value.trim(); loadNotes(); };
+  refreshBtn.addEventListener('click', resetNotes);
+  searchEl.addEventListener('keydown', (e)=>{ if(e.key==='Enter'){ resetNotes(); }});
   loadNotes();
 
   // Scrape
@@ -264,7 +283,7 @@
   const docsEl = document.getElementById('docs');
   const dPager = document.getElementById('dpager');
   const docDetail = document.getElementById('docdetail');
-  const dstate = { q:'', topic:'', date:'', skip:0, limit:20 };
+  const dstate = { q:'', topic:'', date:'', skip:0, limit:20, after:'', trail:[], next:null };
   function docCard(d){
     const el = document.createElement('article'); el.className='card';
     const h = document.createElement('div'); h.className='card-head';
@@ -315,17 +334,28 @@
     if(!docsEl) return;
     docsEl.innerHTML='Loading...'; if(docDetail){ docDetail.style.display='none'; docDetail.innerHTML=''; }
     try{
-      const out = await api.docs({ q: dstate.q, topic: dstate.topic, date: dstate.date, skip: dstate.skip, limit: dstate.limit });
+      const out = await api.docs(dstate);
+      dstate.next = out.next_after || null;
       docsEl.innerHTML='';
       (out.items||[]).forEach(d=> docsEl.appendChild(docCard(d)) );
-      if(dPager){ dPager.innerHTML=''; const pages = Math.ceil((out.total||0)/dstate.limit)||1; const current = Math.floor(dstate.skip/dstate.limit)+1;
+      if(dPager){ dPager.innerHTML=''; const pages = Math.ceil((out.total||0)/dstate.limit)||1;
+      const current = dstate.q ? Math.floor(dstate.skip/dstate.limit)+1 : dstate.trail.length+1;
       const mk = (label, on)=>{ const b=document.createElement('button'); b.className='btn'; b.textContent=label; b.onclick=on; return b; };
-      dPager.appendChild(mk('Prev', ()=>{ dstate.skip=Math.max(0, dstate.skip-dstate.limit); loadDocs(); }));
+      dPager.appendChild(mk('Prev', ()=>{
+        if(dstate.q) dstate.skip=Math.max(0, dstate.skip-dstate.limit);
+        else if(dstate.trail.length) dstate.after=dstate.trail.pop();
+        loadDocs();
+      }));
       const info = document.createElement('span'); info.style.padding='8px'; info.textContent = `${current}/${pages}`; dPager.appendChild(info);
-      dPager.appendChild(mk('Next', ()=>{ dstate.skip=Math.min((pages-1)*dstate.limit, dstate.skip+dstate.limit); loadDocs(); })); }
+      dPager.appendChild(mk('Next', ()=>{
+        if(dstate.q) dstate.skip=Math.min((pages-1)*dstate.limit, dstate.skip+dstate.limit);
+        else if(dstate.next){ dstate.trail.push(dstate.after); dstate.after=dstate.next; }
+        else return;
+        loadDocs();
+      })); }
     }catch(e){ docsEl.textContent='Failed: '+e.message; }
   }
-  if(dRefresh){ dRefresh.addEventListener('click', ()=>{ dstate.skip=0; dstate.q=dqEl.value.trim(); dstate.topic=dtEl.value.trim(); dstate.date=ddEl.value; loadDocs(); }); }
+  if(dRefresh){ dRefresh.addEventListener('click', ()=>{ dstate.skip=0; dstate.after=''; dstate.trail=[]; dstate.q=dqEl.value.trim(); dstate.topic=dtEl.value.trim(); dstate.date=ddEl.value; loadDocs(); }); }
   if(dqEl){ dqEl.addEventListener('keydown', (e)=>{ if(e.key==='Enter'){ if(dRefresh) dRefresh.click(); }}); }
   if(dtEl){ dtEl.addEventListener('keydown', (e)=>{ if(e.key==='Enter'){ if(dRefresh) dRefresh.click(); }}); }
   if(ddEl){ ddEl.addEventListener('change', ()=> dRefresh && dRefresh.click()); }
@@ -592,7 +622,18 @@
   if(trename){ trename.addEventListener('click', async ()=>{
     const from = (tfrom.value||'').trim(); const to = (tto.value||'').trim(); if(!from || !to){ tstatus.textContent='Enter from/to'; return; }
     trename.disabled=true; tstatus.textContent='Renaming...';
-    try{ const out = await api.renameTopic({ from_topic: from, to_topic: to }); tstatus.textContent=`OK (modified ${out.modified})`; loadTopics(); }
+    try{
+      let out = await api.renameTopic({ from_topic: from, to_topic: to });
+      // renames run as a background job; follow it until it finishes
+      while(out.run_id || (out.status && !['completed','failed'].includes(out.status))){
+        await new Promise(r=>setTimeout(r, 1000));
+        out = await api.agentRun(out.id || out.run_id);
+        const p = out.progress || {};
+        tstatus.textContent = `Renaming... ${p.documents||0} docs, ${p.chunks||0} chunks`;
+      }
+      if(out.status === 'failed') throw new Error(out.error || 'rename failed');
+      const r = out.result || out; tstatus.textContent=`OK (modified ${r.modified})`; loadTopics();
+    }
     catch(e){ tstatus.textContent='Failed: '+e.message; }
     finally{ trename.disabled=false; }
   }); }